@@ -1,3 +1,122 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import (
+    ERROR_FLAG,
+    IGNORED_PARAMS,
+    PAGE_VAR,
+    SEARCH_VAR,
+)
 
-# Register your models here.
+from origin.admin import LargeTableAdminMixin
+from bonds import jobs
+from bonds.models import ArchivedBond, Bond, BondJob
+
+
+class DefaultShardAdminMixin:
+    """
+    Tells that changelists only show the rows of the default database, which
+    is the first shard, when bonds are sharded.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method == "GET" and len(settings.BONDS_SHARDS) > 1:
+            self.message_user(
+                request,
+                "Only the rows of the default database are listed, rows of "
+                "other shards aren't.",
+                messages.WARNING,
+            )
+        return super().changelist_view(request, extra_context)
+
+
+@admin.register(Bond)
+class BondAdmin(DefaultShardAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ["isin", "legal_name", "size", "currency", "maturity", "user"]
+    list_select_related = ["user"]
+    list_filter = [("maturity", admin.DateFieldListFilter)]
+    indexed_search_fields = ["isin", "user__username"]
+    raw_id_fields = ["user"]
+    readonly_fields = ["legal_name"]
+    actions = ["resolve_legal_names", "archive"]
+
+    def get_selection(self, request):
+        """
+        Returns the selection of bonds of an action for `jobs.enqueue`: the
+        selected ids, or the changelist's filters and search when all its
+        bonds are selected, applied to every shard.
+        """
+        if request.POST.get("select_across") != "1":
+            return {
+                "ids": [
+                    int(pk) for pk in request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+                ]
+            }
+        ignored = set(IGNORED_PARAMS) | {PAGE_VAR, ERROR_FLAG}
+        return {
+            "filters": {
+                name: value
+                for name, value in request.GET.items()
+                if name not in ignored
+            },
+            "search": self.get_search_lookups(request.GET.get(SEARCH_VAR, "")),
+        }
+
+    def _enqueue(self, request, queryset, action):
+        job = jobs.enqueue(action, self.get_selection(request), user=request.user)
+        self.message_user(
+            request,
+            f"Job {job.pk} started for the selected bonds of every shard, "
+            "follow its progress in bond jobs.",
+        )
+
+    def resolve_legal_names(self, request, queryset):
+        self._enqueue(request, queryset, BondJob.RESOLVE_LEGAL_NAMES)
+
+    resolve_legal_names.short_description = "Resolve legal names again"
+
+    def archive(self, request, queryset):
+        self._enqueue(request, queryset, BondJob.ARCHIVE)
+
+    archive.short_description = "Archive"
+
+
+@admin.register(ArchivedBond)
+class ArchivedBondAdmin(DefaultShardAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ["isin", "legal_name", "size", "currency", "maturity", "user"]
+    list_select_related = ["user"]
+    indexed_search_fields = ["user__username"]
+    raw_id_fields = ["user"]
+
+
+@admin.register(BondJob)
+class BondJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "action",
+        "status",
+        "processed",
+        "total",
+        "failed",
+        "created_by",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["status", "action"]
+    list_select_related = ["created_by"]
+    readonly_fields = [
+        "action",
+        "selection",
+        "status",
+        "total",
+        "processed",
+        "failed",
+        "error",
+        "created_by",
+        "created_at",
+        "started_at",
+        "finished_at",
+    ]
+
+    def has_add_permission(self, request):
+        return False
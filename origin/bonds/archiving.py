@@ -0,0 +1,55 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+
+from bonds.models import ArchivedBond, Bond
+
+ARCHIVED_FIELDS = ["isin", "size", "currency", "maturity", "lei", "legal_name"]
+
+
+def archive_bonds(bonds):
+    """
+    Moves bonds to the archive table of their shard within a transaction.
+
+    Returns the number of bonds archived.
+    """
+    using = bonds.db
+    with transaction.atomic(using=using):
+        bonds = list(bonds.select_for_update())
+        ArchivedBond.objects.using(using).bulk_create(
+            ArchivedBond(
+                user_id=bond.user_id,
+                **{field: getattr(bond, field) for field in ARCHIVED_FIELDS},
+            )
+            for bond in bonds
+        )
+        # deleting sends `post_delete` signals, logging the removals and
+        # invalidating cached lists
+        Bond.objects.using(using).filter(pk__in=[bond.pk for bond in bonds]).delete()
+    return len(bonds)
+
+
+def archive_matured_bonds(before=None, batch_size=None):
+    """
+    Archives bonds maturing before the `before` date (today by default).
+
+    Bonds are moved shard by shard, in batches of `batch_size`, each in its
+    own transaction, so the `Bond` table isn't locked for the whole run.
+    Returns the number of bonds archived.
+    """
+    before = before or date.today()
+    batch_size = batch_size or settings.BONDS_ARCHIVE_BATCH_SIZE
+    archived = 0
+    for shard in settings.BONDS_SHARDS:
+        bonds = Bond.objects.using(shard)
+        while True:
+            batch_ids = list(
+                bonds.filter(maturity__lt=before)
+                .order_by("maturity", "id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not batch_ids:
+                break
+            archived += archive_bonds(bonds.filter(pk__in=batch_ids))
+    return archived
@@ -0,0 +1,116 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from bonds import metrics
+
+# only these query parameters change the content of `GET /bonds/`, anything
+# else is left out of the cache key so it can't be used to grow the key space
+LIST_CACHE_PARAMS = (
+    "legal_name",
+    "ordering",
+    "search",
+    "fuzzy",
+    "include_archived",
+    "as_of",
+)
+
+LIST_CACHE_HITS = "list_cache_hits"
+LIST_CACHE_MISSES = "list_cache_misses"
+
+
+def _user_version_key(user_id):
+    return f"bonds:list:version:{user_id}"
+
+
+FX_RATES_VERSION_KEY = "bonds:fx:version"
+
+
+def _new_version():
+    # time based so that a version key evicted from the cache never comes back
+    # with a value matching entries rendered before it was evicted
+    return int(time.time() * 1000)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def get_user_version(user_id):
+    return _get_version(_user_version_key(user_id))
+
+
+def invalidate_user(user_id):
+    """Makes every cached entry derived from a user's bonds stale."""
+    _bump_version(_user_version_key(user_id))
+
+
+def get_fx_rates_version():
+    return _get_version(FX_RATES_VERSION_KEY)
+
+
+def invalidate_fx_rates():
+    """Makes every cached entry depending on FX rates stale."""
+    _bump_version(FX_RATES_VERSION_KEY)
+
+
+def user_cache_key(user_id, name, *parts):
+    """
+    Builds a cache key for data derived from a user's bonds.
+
+    The key embeds the user's current version, bumped whenever one of their
+    bonds changes, so entries are invalidated along with cached lists.
+    """
+    digest = hashlib.sha1("\n".join(str(part) for part in parts).encode()).hexdigest()
+    return f"bonds:{name}:{user_id}:{get_user_version(user_id)}:{digest}"
+
+
+def list_cache_key(user_id, query_params, media_type):
+    """
+    Builds the cache key of a user's rendered bonds list.
+
+    Only the parameters affecting the response content are part of the key,
+    as a fixed length digest.
+    """
+    parts = [media_type]
+    for name in LIST_CACHE_PARAMS:
+        if name in query_params:
+            parts.append(f"{name}={query_params[name]}")
+    if "ordering" in query_params:
+        # ordering by converted size depends on FX rates
+        parts.append(get_fx_rates_version())
+    return user_cache_key(user_id, "list", *parts)
+
+
+def get_list(key):
+    content = cache.get(key)
+    metrics.increment(LIST_CACHE_MISSES if content is None else LIST_CACHE_HITS)
+    return content
+
+
+def set_list(key, content):
+    cache.set(key, content, settings.BONDS_LIST_CACHE_TIMEOUT)
+
+
+def list_cache_stats():
+    hits = metrics.get_count(LIST_CACHE_HITS)
+    misses = metrics.get_count(LIST_CACHE_MISSES)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
@@ -0,0 +1,74 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from bonds.models import BondChange
+
+
+def _settled(changes):
+    """
+    Returns the changes logged at least `BONDS_CHANGES_SETTLE_TIME` seconds
+    ago, up to the first one which wasn't.
+
+    Ids are allocated when rows are inserted, not when they are committed, so
+    a change may become visible after one with a greater id was served and
+    the cursor moved past it.
+    """
+    if not settings.BONDS_CHANGES_SETTLE_TIME:
+        return changes
+    horizon = timezone.now() - timedelta(seconds=settings.BONDS_CHANGES_SETTLE_TIME)
+    for position, change in enumerate(changes):
+        if change.created_at > horizon:
+            return changes[:position]
+    return changes
+
+
+def get_changes(user, cursor, wait=0):
+    """
+    Returns the user's bond changes logged after `cursor`, and the cursor to
+    pass to the next call.
+
+    When there are none, waits up to `wait` seconds for new ones (long
+    polling), querying them again every `BONDS_CHANGES_POLL_INTERVAL`
+    seconds. The database is polled rather than a cache entry bumped by
+    writes, which with a per process cache backend wouldn't see writes made
+    by other processes.
+
+    A bond changed several times after `cursor` is only returned once, with
+    its latest change. Removed bonds are returned with a null `bond`.
+
+    Changes get new ids when their user is moved to another shard
+    (`bonds.sharding.move_user`), a cursor which isn't the id of one of the
+    user's changes is from before a move: changes are listed from the start.
+    """
+    deadline = time.monotonic() + wait
+    cursor_checked = not cursor
+    while True:
+        logged = list(
+            BondChange.objects.for_user(user)
+            .filter(id__gt=cursor)
+            .select_related("bond")
+            .order_by("id")[: settings.BONDS_CHANGES_PAGE_SIZE]
+        )
+        if not logged and not cursor_checked:
+            cursor_checked = True
+            if not BondChange.objects.for_user(user).filter(id=cursor).exists():
+                cursor = 0
+                continue
+        changes = _settled(logged)
+        if changes or time.monotonic() >= deadline:
+            break
+        # changes logged too recently to be served are waited for until settled
+        interval = (
+            settings.BONDS_CHANGES_SETTLE_TIME
+            if logged
+            else settings.BONDS_CHANGES_POLL_INTERVAL
+        )
+        time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+
+    if not changes:
+        return [], cursor
+    latest = {change.bond_id: change for change in changes}
+    return sorted(latest.values(), key=lambda change: change.id), changes[-1].id
@@ -0,0 +1,174 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from bonds import cache
+from bonds.hierarchy import annotate_ultimate_parent
+from bonds.models import FXRate
+
+
+class FXRatesFileError(Exception):
+    pass
+
+
+def annotate_base_size(bonds):
+    """
+    Annotates bonds with `fx_rate` and `base_size`, their size converted to
+    `settings.BONDS_BASE_CURRENCY`.
+
+    Conversion is done by the database, `base_size` is null for bonds whose
+    currency has no known rate.
+    """
+    rate = FXRate.objects.filter(currency=OuterRef("currency")).values("rate")[:1]
+    return bonds.annotate(
+        fx_rate=Case(
+            When(currency=settings.BONDS_BASE_CURRENCY, then=Value(1)),
+            default=Subquery(rate),
+            output_field=DecimalField(),
+        ),
+        base_size=ExpressionWrapper(
+            F("size") * F("fx_rate"), output_field=DecimalField()
+        ),
+    )
+
+
+def get_exposure(bonds):
+    """
+    Sums bond sizes per currency and converted to the base currency.
+
+    Currencies without a known rate are left out of the total and listed in
+    `missing_rates`.
+    """
+    rows = (
+        annotate_base_size(bonds)
+        .values("currency")
+        .annotate(total=Sum("size"), base_total=Sum("base_size"))
+        .order_by("currency")
+    )
+    total = Decimal(0)
+    currencies = []
+    missing_rates = []
+    for row in rows:
+        if row["base_total"] is None:
+            missing_rates.append(row["currency"])
+        else:
+            total += row["base_total"]
+        currencies.append(
+            {
+                "currency": row["currency"],
+                "total": row["total"],
+                "base_total": _format_amount(row["base_total"]),
+            }
+        )
+    return {
+        "base_currency": settings.BONDS_BASE_CURRENCY,
+        "total": _format_amount(total),
+        "currencies": currencies,
+        "missing_rates": missing_rates,
+    }
+
+
+def get_group_exposure(bonds):
+    """
+    Sums bond sizes converted to the base currency per ultimate parent of
+    their issuer, largest exposure first.
+
+    Bonds whose currency has no known rate are left out of the totals and
+    counted in `unconverted_bonds`.
+    """
+    rows = (
+        annotate_ultimate_parent(annotate_base_size(bonds))
+        .values("ultimate_parent_lei")
+        .annotate(
+            legal_name=Max("ultimate_parent_name"),
+            base_total=Sum("base_size"),
+            bonds=Count("id"),
+            unconverted_bonds=Count("id", filter=Q(fx_rate__isnull=True)),
+        )
+        .order_by(F("base_total").desc(nulls_last=True), "ultimate_parent_lei")
+    )
+    return {
+        "base_currency": settings.BONDS_BASE_CURRENCY,
+        "groups": [
+            {
+                "lei": row["ultimate_parent_lei"],
+                "legal_name": row["legal_name"],
+                "base_total": _format_amount(row["base_total"]),
+                "bonds": row["bonds"],
+                "unconverted_bonds": row["unconverted_bonds"],
+            }
+            for row in rows
+        ],
+    }
+
+
+def _format_amount(amount):
+    if amount is None:
+        return None
+    return str(Decimal(amount).quantize(Decimal("0.01")))
+
+
+def load_rates(rates_file):
+    """
+    Loads rates from a CSV file with `currency` and `rate` columns, replacing
+    the rates of currencies already known.
+
+    Returns the number of rates loaded.
+
+    Raises:
+      FXRatesFileError: when the file isn't correctly formatted, no rates are
+      loaded in that case.
+    """
+    rates = {}
+    reader = csv.DictReader(rates_file)
+    for line_number, row in enumerate(reader, start=2):
+        try:
+            currency = row["currency"].strip().upper()
+            rate = Decimal(row["rate"].strip())
+        except (KeyError, AttributeError, InvalidOperation):
+            raise FXRatesFileError(f"Invalid FX rate on line {line_number}")
+        if len(currency) != 3 or rate <= 0:
+            raise FXRatesFileError(f"Invalid FX rate on line {line_number}")
+        rates[currency] = rate
+
+    # rates are joined to bonds by the database, so each shard has a copy
+    for shard in settings.BONDS_SHARDS:
+        _save_rates(rates, shard)
+    cache.invalidate_fx_rates()
+    return len(rates)
+
+
+def _save_rates(rates, using):
+    with transaction.atomic(using=using):
+        fx_rates = FXRate.objects.using(using)
+        existing = {
+            fx_rate.currency: fx_rate
+            for fx_rate in fx_rates.filter(currency__in=rates.keys())
+        }
+        now = timezone.now()
+        for fx_rate in existing.values():
+            fx_rate.rate = rates[fx_rate.currency]
+            fx_rate.updated_at = now
+        fx_rates.bulk_update(existing.values(), ["rate", "updated_at"])
+        fx_rates.bulk_create(
+            FXRate(currency=currency, rate=rate)
+            for currency, rate in rates.items()
+            if currency not in existing
+        )
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the gleif.org LEI records API.
+
+Serves records from a JSON fixture file, with configurable latency and error
+rate, so the LEI lookup path can be benchmarked and load tested offline.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from django.conf import settings
+
+from origin import constants
+
+RECORDS_PATH = "/api/v2/leirecords"
+
+
+def load_records(path):
+    """
+    Reads a fixture file holding a list of records in the gleif.org format.
+
+    Returns records indexed by LEI.
+    """
+    with open(path) as fixture_file:
+        return {record["LEI"]["$"]: record for record in json.load(fixture_file)}
+
+
+def save_records(path, records):
+    with open(path, "w") as fixture_file:
+        json.dump(list(records.values()), fixture_file, indent=2)
+
+
+class GLEIFStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != RECORDS_PATH:
+            self.send_json(404, {"message": "Not found"})
+            return
+
+        self.server.simulate_latency()
+        if self.server.should_fail():
+            self.send_json(self.server.error_status, {"message": "Stub error"})
+            return
+
+        leis = []
+        for value in parse_qs(url.query).get("lei", []):
+            leis.extend(lei for lei in value.split(",") if lei)
+        try:
+            records = self.server.get_records(leis)
+        except (requests.RequestException, ValueError):
+            self.send_json(502, {"message": "Recording from gleif.org failed"})
+            return
+        self.send_json(200, records)
+
+    def send_json(self, status_code, data):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class GLEIFStubServer(ThreadingHTTPServer):
+    """
+    Serves gleif.org records lookups (`?lei=A` or `?lei=A,B` for batches).
+
+    Args:
+      records: records indexed by LEI, see `load_records`.
+      latency: seconds each response is delayed by.
+      jitter: maximum seconds randomly added to `latency`.
+      error_rate: share of requests (0 to 1) failing with `error_status`.
+      fixture_path: when set, LEIs missing from `records` are fetched from
+        gleif.org and saved to that file (recording mode).
+      seed: random generator seed, to reproduce jitter and errors.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        records,
+        latency=0,
+        jitter=0,
+        error_rate=0,
+        error_status=503,
+        fixture_path=None,
+        seed=None,
+        verbose=False,
+    ):
+        super().__init__(address, GLEIFStubHandler)
+        self.records = records
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fixture_path = fixture_path
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    @property
+    def url_format(self):
+        """Value of the `LEI_LOOKUP_URL_F` setting pointing to this server"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{RECORDS_PATH}?lei={{lei}}"
+
+    def simulate_latency(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def get_records(self, leis):
+        missing = [lei for lei in leis if lei not in self.records]
+        if missing and self.fixture_path:
+            self.record(missing)
+        return [self.records[lei] for lei in leis if lei in self.records]
+
+    def record(self, leis):
+        response = requests.get(
+            constants.LEI_LOOKUP_URL_F.format(lei=",".join(leis)),
+            timeout=settings.LEI_LOOKUP_TIMEOUT,
+        )
+        response.raise_for_status()
+        with self.lock:
+            for record in response.json():
+                self.records[record["LEI"]["$"]] = record
+            save_records(self.fixture_path, self.records)
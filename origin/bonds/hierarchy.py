@@ -0,0 +1,227 @@
+"""
+Legal entity hierarchy from GLEIF relationship records.
+
+Entities and their direct and ultimate parents are stored in `LegalEntity`,
+and the hierarchy is precomputed in the `LegalEntityAncestor` closure table,
+so the ultimate parent of a bond's issuer is a single indexed lookup the
+database runs as part of the query aggregating bonds, rather than a walk up
+the hierarchy per request.
+
+Loading relationship records only updates the closure rows of the entities
+whose parent changed, and of their descendants.
+"""
+
+import csv
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, When
+from django.db.models.functions import Coalesce
+
+from bonds.models import LegalEntity, LegalEntityAncestor
+from bonds.validators import is_valid_lei
+
+# LEIs per IN clause, below the SQLite limit on query parameters
+CHUNK_SIZE = 500
+
+
+class HierarchyFileError(Exception):
+    pass
+
+
+def annotate_ultimate_parent(bonds):
+    """
+    Annotates bonds with the `ultimate_parent_lei` and
+    `ultimate_parent_name` of their issuer.
+
+    Issuers without known parents are their own ultimate parent, named by
+    their bonds. Ultimate parents without a known name are named by their
+    LEI, rather than after one of their subsidiaries.
+    """
+    root = LegalEntityAncestor.objects.filter(lei=OuterRef("lei")).order_by("-depth")
+    bonds = bonds.annotate(
+        ultimate_parent_lei=Coalesce(Subquery(root.values("ancestor_lei")[:1]), "lei")
+    )
+    name = LegalEntity.objects.filter(lei=OuterRef("ultimate_parent_lei")).exclude(
+        legal_name=""
+    )
+    return bonds.annotate(
+        ultimate_parent_name=Coalesce(
+            Subquery(name.values("legal_name")[:1]),
+            Case(
+                When(ultimate_parent_lei=F("lei"), then=F("legal_name")),
+                default=F("ultimate_parent_lei"),
+            ),
+        )
+    )
+
+
+def parent_lei(lei, direct_parent_lei, ultimate_parent_lei):
+    """
+    Returns the parent an entity is attached to in the closure table.
+
+    Entities reporting an ultimate parent but no direct parent, when the
+    intermediate parents aren't known, are attached to the ultimate parent.
+    Direct parents without a record of their own are attached to the
+    ultimate parent by `_move`.
+    """
+    parent = direct_parent_lei or ultimate_parent_lei
+    return parent if parent != lei else ""
+
+
+def parse_entities(entities_file):
+    """
+    Reads a CSV file with `lei`, `legal_name`, `direct_parent_lei` and
+    `ultimate_parent_lei` columns, parents are left empty for entities
+    without one.
+
+    Returns a dict of `(legal_name, direct_parent_lei, ultimate_parent_lei)`
+    by LEI.
+    """
+    entities = {}
+    reader = csv.DictReader(entities_file)
+    for line_number, row in enumerate(reader, start=2):
+        try:
+            lei = row["lei"].strip().upper()
+            entity = (
+                row["legal_name"].strip(),
+                row["direct_parent_lei"].strip().upper(),
+                row["ultimate_parent_lei"].strip().upper(),
+            )
+        except (KeyError, AttributeError):
+            raise HierarchyFileError(f"Invalid legal entity on line {line_number}")
+        if not all(is_valid_lei(value) for value in (lei,) + entity[1:] if value):
+            raise HierarchyFileError(f"Invalid LEI on line {line_number}")
+        entities[lei] = entity
+    return entities
+
+
+def load_entities(entities_file):
+    """
+    Loads legal entities from a CSV file, see `parse_entities`, replacing the
+    entities already known. Entities missing from the file are left as they
+    are, so files may only hold the records changed since the last load.
+
+    Returns, per shard, a dict with the number of entities `created`,
+    `updated`, and whose parent changed (`moved`). Shards hold the same
+    entities, unless one was added after entities were loaded.
+
+    Raises:
+      HierarchyFileError: when the file isn't correctly formatted or its
+      parents would make a cycle, nothing is loaded in that case.
+    """
+    entities = parse_entities(entities_file)
+    # entities are joined to bonds by the database, so each shard has a copy,
+    # all shards are rolled back if one of them can't be updated
+    with ExitStack() as stack:
+        for shard in settings.BONDS_SHARDS:
+            stack.enter_context(transaction.atomic(using=shard))
+        return {
+            shard: _save_entities(entities, shard) for shard in settings.BONDS_SHARDS
+        }
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start : start + CHUNK_SIZE]
+
+
+def _save_entities(entities, using):
+    legal_entities = LegalEntity.objects.using(using)
+    existing = {}
+    for leis in _chunks(entities):
+        existing.update(
+            (entity.lei, entity) for entity in legal_entities.filter(lei__in=leis)
+        )
+
+    updated = []
+    moves = []
+    for entity in existing.values():
+        legal_name, direct_parent_lei, ultimate_parent_lei = entities[entity.lei]
+        parent = parent_lei(entity.lei, direct_parent_lei, ultimate_parent_lei)
+        if parent != parent_lei(
+            entity.lei, entity.direct_parent_lei, entity.ultimate_parent_lei
+        ):
+            moves.append((entity.lei, parent, ultimate_parent_lei))
+        entity.legal_name = legal_name
+        entity.direct_parent_lei = direct_parent_lei
+        entity.ultimate_parent_lei = ultimate_parent_lei
+        updated.append(entity)
+    legal_entities.bulk_update(
+        updated, ["legal_name", "direct_parent_lei", "ultimate_parent_lei"]
+    )
+
+    created = []
+    for lei, (legal_name, direct_parent_lei, ultimate_parent_lei) in entities.items():
+        if lei in existing:
+            continue
+        created.append(
+            LegalEntity(
+                lei=lei,
+                legal_name=legal_name,
+                direct_parent_lei=direct_parent_lei,
+                ultimate_parent_lei=ultimate_parent_lei,
+            )
+        )
+        parent = parent_lei(lei, direct_parent_lei, ultimate_parent_lei)
+        if parent:
+            moves.append((lei, parent, ultimate_parent_lei))
+    _create_entities(created, using)
+
+    for lei, parent, ultimate_parent_lei in moves:
+        _move(lei, parent, using, ultimate_parent_lei)
+    return {"created": len(created), "updated": len(updated), "moved": len(moves)}
+
+
+def _create_entities(entities, using):
+    LegalEntity.objects.using(using).bulk_create(entities)
+    LegalEntityAncestor.objects.using(using).bulk_create(
+        LegalEntityAncestor(lei=entity.lei, ancestor_lei=entity.lei, depth=0)
+        for entity in entities
+    )
+
+
+def _move(lei, parent, using, ultimate_parent_lei=""):
+    """
+    Attaches an entity and its descendants to a new parent, or makes it a
+    root when `parent` is empty, by only updating their closure rows.
+
+    Parents without a record are created under the entity's
+    `ultimate_parent_lei`, so the entity keeps its group until the missing
+    part of the chain is loaded.
+    """
+    ancestors = LegalEntityAncestor.objects.using(using)
+    subtree = dict(ancestors.filter(ancestor_lei=lei).values_list("lei", "depth"))
+    if parent in subtree:
+        raise HierarchyFileError(f"{parent} can't be the parent of {lei}: cycle")
+
+    # detach the subtree from the entity's former ancestors
+    former = list(
+        ancestors.filter(lei=lei, depth__gt=0).values_list("ancestor_lei", flat=True)
+    )
+    if former:
+        for leis in _chunks(subtree):
+            ancestors.filter(lei__in=leis, ancestor_lei__in=former).delete()
+    if not parent:
+        return
+
+    if not LegalEntity.objects.using(using).filter(lei=parent).exists():
+        # parents are known before their own record is loaded
+        _create_entities(
+            [LegalEntity(lei=parent, ultimate_parent_lei=ultimate_parent_lei)], using
+        )
+        if ultimate_parent_lei and ultimate_parent_lei not in (parent, lei):
+            _move(parent, ultimate_parent_lei, using)
+    ancestors.bulk_create(
+        LegalEntityAncestor(
+            lei=descendant_lei,
+            ancestor_lei=ancestor_lei,
+            depth=ancestor_depth + 1 + descendant_depth,
+        )
+        for ancestor_lei, ancestor_depth in ancestors.filter(lei=parent).values_list(
+            "ancestor_lei", "depth"
+        )
+        for descendant_lei, descendant_depth in subtree.items()
+    )
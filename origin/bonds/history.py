@@ -0,0 +1,156 @@
+"""
+Point in time listing of a user's bonds.
+
+Every bond creation, update and removal is recorded in `BondHistory` with only
+the fields which changed. `PortfolioSnapshot` rows hold the whole book after a
+given history entry, so the state as of a date is the latest snapshot taken
+before it plus the entries recorded since, whatever the length of the
+history:
+
+- snapshots are taken by the `snapshot_portfolios` management command, for
+  users with at least `settings.BONDS_HISTORY_SNAPSHOT_INTERVAL` entries
+  since their latest snapshot, which bounds the entries replayed per request.
+- snapshots are built from the previous snapshot and the entries recorded
+  since, rather than from the `Bond` table, except for the first snapshot of
+  a user which also captures bonds created before the history was recorded.
+"""
+
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from bonds.models import Bond, BondHistory, PortfolioSnapshot
+
+
+def _apply(state, entry):
+    if entry.action == BondHistory.REMOVED:
+        state.pop(entry.bond_id, None)
+    else:
+        state.setdefault(entry.bond_id, {}).update(json.loads(entry.changes))
+
+
+def _encode_state(state):
+    rows = [
+        [bond_id] + [fields.get(field) for field in BondHistory.FIELDS]
+        for bond_id, fields in sorted(state.items())
+    ]
+    return zlib.compress(
+        json.dumps(rows, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+    )
+
+
+def _decode_state(data):
+    return {
+        row[0]: dict(zip(BondHistory.FIELDS, row[1:]))
+        for row in json.loads(zlib.decompress(bytes(data)))
+    }
+
+
+def get_bonds_as_of(user, as_of):
+    """
+    Returns the user's bonds as of the `as_of` datetime, as unsaved `Bond`
+    instances ordered by id.
+
+    Bonds created before the history was recorded are only known from the
+    user's first snapshot on.
+    """
+    snapshot = (
+        PortfolioSnapshot.objects.for_user(user)
+        .filter(taken_at__lte=as_of)
+        .order_by("-taken_at")
+        .first()
+    )
+    state = {}
+    entries = BondHistory.objects.for_user(user).filter(recorded_at__lte=as_of)
+    if snapshot is not None:
+        state = _decode_state(snapshot.state)
+        entries = entries.filter(id__gt=snapshot.last_history_id)
+    for entry in entries.order_by("id"):
+        _apply(state, entry)
+    bonds = []
+    for bond_id, fields in sorted(state.items()):
+        # only updates are known of bonds created before the history
+        if len(fields) == len(BondHistory.FIELDS):
+            fields["maturity"] = parse_date(fields["maturity"])
+            bonds.append(Bond(id=bond_id, user=user, **fields))
+    return bonds
+
+
+def take_snapshot(user_id, using):
+    """
+    Snapshots the user's book as of their latest history entry.
+
+    Returns the snapshot, or None when nothing was recorded since the latest
+    one.
+    """
+    entries = BondHistory.objects.using(using).filter(user_id=user_id)
+    latest = (
+        PortfolioSnapshot.objects.using(using)
+        .filter(user_id=user_id)
+        .order_by("-last_history_id")
+        .first()
+    )
+    if latest is None:
+        # read before the bonds: entries recorded in between are replayed on
+        # top of the snapshot, which is harmless as they set field values
+        last_history_id = entries.aggregate(last=Max("id"))["last"] or 0
+        bonds = Bond.objects.using(using).filter(user_id=user_id)
+        state = {
+            bond["id"]: {field: bond[field] for field in BondHistory.FIELDS}
+            for bond in bonds.values("id", *BondHistory.FIELDS)
+        }
+        taken_at = timezone.now()
+    else:
+        new_entries = list(entries.filter(id__gt=latest.last_history_id).order_by("id"))
+        if not new_entries:
+            return None
+        state = _decode_state(latest.state)
+        for entry in new_entries:
+            _apply(state, entry)
+        last_history_id = new_entries[-1].id
+        # entries aren't always recorded in id order across transactions
+        taken_at = max([latest.taken_at] + [e.recorded_at for e in new_entries])
+    return PortfolioSnapshot.objects.using(using).create(
+        user_id=user_id,
+        last_history_id=last_history_id,
+        taken_at=taken_at,
+        bond_count=len(state),
+        state=_encode_state(state),
+    )
+
+
+def users_due_for_snapshot(using, interval=None):
+    """
+    Returns the ids of the users of a shard with at least `interval` history
+    entries since their latest snapshot, or without snapshot.
+    """
+    interval = interval or settings.BONDS_HISTORY_SNAPSHOT_INTERVAL
+    last_snapshot = (
+        PortfolioSnapshot.objects.using(using)
+        .filter(user_id=OuterRef("user_id"))
+        .order_by("-last_history_id")
+        .values("last_history_id")[:1]
+    )
+    due = set(
+        BondHistory.objects.using(using)
+        .annotate(last_snapshot=Coalesce(Subquery(last_snapshot), 0))
+        .filter(id__gt=F("last_snapshot"))
+        .values("user_id")
+        .annotate(count=Count("id"))
+        .filter(count__gte=interval)
+        .values_list("user_id", flat=True)
+    )
+    # users with bonds from before the history was recorded
+    due.update(
+        Bond.objects.using(using)
+        .exclude(user_id__in=PortfolioSnapshot.objects.using(using).values("user_id"))
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    return sorted(due)
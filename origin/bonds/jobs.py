@@ -0,0 +1,145 @@
+"""
+Bulk actions on bonds started from the admin.
+
+Admin actions only record a `BondJob` holding the selection of bonds, the
+`run_bond_jobs` management command runs it on every shard and processes the
+matching bonds in batches, each batch in its own transaction, recording
+progress as it goes. Admin requests stay fast whatever the number of bonds
+selected.
+"""
+
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.admin.utils import prepare_lookup_value
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from bonds.archiving import archive_bonds
+from bonds.models import Bond, BondJob
+from bonds.services import LEILookupError, get_legal_name
+
+
+def enqueue(action, selection, user=None):
+    """
+    Records a job running `action` on the bonds of `selection`, on every
+    shard.
+
+    `selection` is either `{"ids": [...]}`, the ids of the selected bonds,
+    or `{"filters": {...}, "search": [...]}`: the admin's changelist filters,
+    query parameters naming lookups on bond columns, and the
+    `(lookup, value)` pairs of its search (see
+    `LargeTableAdminMixin.get_search_lookups`), any of which bonds match.
+    """
+    return BondJob.objects.create(
+        action=action, selection=json.dumps(selection), created_by=user
+    )
+
+
+def _get_bonds(job, shard):
+    bonds = Bond.objects.using(shard)
+    selection = json.loads(job.selection)
+    if "ids" in selection:
+        return bonds.filter(pk__in=selection["ids"])
+    # as the admin changelist turns query parameters into lookups
+    bonds = bonds.filter(
+        **{
+            lookup: prepare_lookup_value(lookup, value)
+            for lookup, value in selection["filters"].items()
+        }
+    )
+    if selection["search"]:
+        query = Q()
+        for lookup, value in selection["search"]:
+            query |= Q(**{lookup: value})
+        bonds = bonds.filter(query)
+    return bonds
+
+
+def resolve_legal_names(bonds):
+    """
+    Looks the legal names of bonds up again, each LEI once.
+
+    Names are looked up before bonds are locked, so that slow gleif.org
+    requests don't hold locks, then bonds are saved in a short transaction.
+    Returns the number of bonds whose LEI couldn't be looked up.
+    """
+    leis = Counter(bonds.values_list("lei", flat=True))
+    legal_names = {}
+    failed = 0
+    for lei, count in leis.items():
+        try:
+            legal_names[lei] = get_legal_name(lei)
+        except LEILookupError:
+            failed += count
+    with transaction.atomic(using=bonds.db):
+        for bond in bonds.filter(lei__in=legal_names).select_for_update():
+            legal_name = legal_names[bond.lei]
+            if bond.legal_name != legal_name:
+                bond.legal_name = legal_name
+                # signals re-index the legal name and log the change
+                bond.save(resolve_legal_name=False)
+    return failed
+
+
+def _run_batch(job, bonds):
+    """Returns the number of bonds of the batch which failed."""
+    if job.action == BondJob.ARCHIVE:
+        archive_bonds(bonds)
+        return 0
+    return resolve_legal_names(bonds)
+
+
+def claim(job):
+    """Marks a pending job as running, returns False if another worker did."""
+    return bool(
+        BondJob.objects.filter(pk=job.pk, status=BondJob.PENDING).update(
+            status=BondJob.RUNNING, started_at=timezone.now()
+        )
+    )
+
+
+def run_job(job, batch_size=None):
+    batch_size = batch_size or settings.BONDS_JOB_BATCH_SIZE
+    status, error = BondJob.DONE, ""
+    try:
+        BondJob.objects.filter(pk=job.pk).update(
+            total=sum(_get_bonds(job, shard).count() for shard in settings.BONDS_SHARDS)
+        )
+        for shard in settings.BONDS_SHARDS:
+            last_id = 0
+            while True:
+                # archived bonds leave the table, batches follow ids
+                batch_ids = list(
+                    _get_bonds(job, shard)
+                    .filter(id__gt=last_id)
+                    .order_by("id")
+                    .values_list("id", flat=True)[:batch_size]
+                )
+                if not batch_ids:
+                    break
+                last_id = batch_ids[-1]
+                failed = _run_batch(
+                    job, Bond.objects.using(shard).filter(pk__in=batch_ids)
+                )
+                BondJob.objects.filter(pk=job.pk).update(
+                    processed=F("processed") + len(batch_ids),
+                    failed=F("failed") + failed,
+                )
+    except Exception as e:
+        status, error = BondJob.FAILED, str(e)
+    BondJob.objects.filter(pk=job.pk).update(
+        status=status, error=error, finished_at=timezone.now()
+    )
+
+
+def run_pending_jobs(batch_size=None):
+    """Runs pending jobs, oldest first. Returns the number of jobs run."""
+    count = 0
+    for job in BondJob.objects.filter(status=BondJob.PENDING).order_by("id"):
+        if claim(job):
+            run_job(job, batch_size)
+            count += 1
+    return count
@@ -0,0 +1,215 @@
+"""
+Load generator for the bonds API.
+
+Drives a mix of bond creations, lists and filtered lists against a running
+server at a target request rate, using asyncio and plain HTTP/1.1 connections
+so no external service or dependency is required.
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+CREATE = "create"
+LIST = "list"
+FILTER = "filter"
+DEFAULT_MIX = {CREATE: 1, LIST: 6, FILTER: 3}
+
+BOND = {
+    "isin": "FR0000131104",
+    "size": 100000000,
+    "currency": "EUR",
+    "maturity": "2025-03-27",
+    "lei": "R0MUWSFPU8MPRO8K5P83",
+}
+
+
+def provision_users(count, prefix="loadtest"):
+    """
+    Creates (or reuses) `count` load test users.
+
+    Returns their API tokens, created along with users by `users.models`.
+    """
+    User = get_user_model()
+    users = [
+        User.objects.get_or_create(username=f"{prefix}-{index}")[0]
+        for index in range(count)
+    ]
+    return list(Token.objects.filter(user__in=users).values_list("key", flat=True))
+
+
+def parse_mix(value):
+    """Parses a traffic mix such as `create=1,list=6,filter=3`."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown operation {name}")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise ValueError("At least one operation must have a positive weight")
+    return mix
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of `values`."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class LoadTestResult:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.duration = 0
+
+    def record(self, operation, latency, success):
+        self.latencies[operation].append(latency)
+        if not success:
+            self.errors[operation] += 1
+
+    def report(self):
+        """Returns latency percentiles (ms), throughput and error rate per operation."""
+        operations = {}
+        all_latencies = []
+        for operation, latencies in sorted(self.latencies.items()):
+            all_latencies.extend(latencies)
+            operations[operation] = self._summary(latencies, self.errors[operation])
+        return {
+            "duration": round(self.duration, 3),
+            "total": self._summary(all_latencies, sum(self.errors.values())),
+            "operations": operations,
+        }
+
+    def _summary(self, latencies, errors):
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "error_rate": errors / len(latencies) if latencies else 0,
+            "throughput": len(latencies) / self.duration if self.duration else 0,
+            **{
+                f"p{percent}_ms": self._ms(percentile(latencies, percent))
+                for percent in (50, 90, 99)
+            },
+            "max_ms": self._ms(max(latencies, default=None)),
+        }
+
+    @staticmethod
+    def _ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def http_request(url, method, path, token, body=None, timeout=30):
+    """
+    Sends a single HTTP/1.1 request and returns its status code.
+
+    Raises:
+      OSError, asyncio.TimeoutError: when the server can't be reached in time.
+    """
+    host = url.hostname
+    port = url.port or 80
+    payload = json.dumps(body).encode() if body is not None else b""
+    headers = [
+        f"{method} {path} HTTP/1.1",
+        f"Host: {host}:{port}",
+        f"Authorization: Token {token}",
+        "Connection: close",
+        f"Content-Length: {len(payload)}",
+    ]
+    if body is not None:
+        headers.append("Content-Type: application/json")
+    request = ("\r\n".join(headers) + "\r\n\r\n").encode() + payload
+
+    async def send():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
+
+    return await asyncio.wait_for(send(), timeout)
+
+
+class LoadGenerator:
+    """
+    Sends requests at `rate` per second for `duration` seconds (open loop),
+    with at most `concurrency` requests in flight.
+    """
+
+    def __init__(self, base_url, tokens, rate, duration, concurrency, mix, seed=None):
+        self.url = urlparse(base_url)
+        self.tokens = tokens
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.mix = mix
+        self.random = random.Random(seed)
+
+    def next_request(self):
+        operation = self.random.choices(
+            list(self.mix.keys()), weights=list(self.mix.values())
+        )[0]
+        token = self.random.choice(self.tokens)
+        if operation == CREATE:
+            return operation, "POST", "/bonds/", token, BOND
+        if operation == FILTER:
+            return operation, "GET", "/bonds/?search=bnp", token, None
+        return operation, "GET", "/bonds/", token, None
+
+    async def send(
+        self, semaphore, result, scheduled, operation, method, path, token, body
+    ):
+        async with semaphore:
+            try:
+                status_code = await http_request(self.url, method, path, token, body)
+                success = status_code < 400
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError):
+                success = False
+        # measured from the time the request was due rather than sent, so
+        # waiting for the semaphore or a late schedule counts in the latency
+        # (no coordinated omission)
+        result.record(operation, time.monotonic() - scheduled, success)
+
+    async def run(self):
+        result = LoadTestResult()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+        tasks = []
+        for index in range(int(self.rate * self.duration)):
+            # requests are scheduled at a fixed rate whatever response times
+            # are, so a slow server doesn't lower the load it receives
+            scheduled = started + index / self.rate
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(
+                asyncio.ensure_future(
+                    self.send(semaphore, result, scheduled, *self.next_request())
+                )
+            )
+        await asyncio.gather(*tasks)
+        result.duration = time.monotonic() - started
+        return result
+
+
+def run_load_test(
+    base_url, tokens, rate, duration, concurrency=100, mix=None, seed=None
+):
+    generator = LoadGenerator(
+        base_url, tokens, rate, duration, concurrency, mix or DEFAULT_MIX, seed
+    )
+    return asyncio.run(generator.run()).report()
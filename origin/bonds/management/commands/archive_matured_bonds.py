@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bonds.archiving import archive_matured_bonds
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value}, expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Moves bonds which reached maturity to the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before",
+            help="archive bonds maturing before this date (YYYY-MM-DD), "
+            "defaults to today",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BONDS_ARCHIVE_BATCH_SIZE,
+            help="number of bonds moved per transaction",
+        )
+
+    def handle(self, *args, **options):
+        before = parse_date(options["before"]) if options["before"] else None
+        count = archive_matured_bonds(before, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {count} bonds."))
@@ -0,0 +1,74 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bonds.gleif_stub import GLEIFStubServer, load_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local gleif.org stand-in server serving LEI records from a "
+        "fixture file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixture", help="JSON file of gleif.org LEI records")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--latency-ms", type=float, default=0, help="delay of each response"
+        )
+        parser.add_argument(
+            "--jitter-ms",
+            type=float,
+            default=0,
+            help="maximum random delay added to --latency-ms",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="share of requests failing, from 0 to 1",
+        )
+        parser.add_argument(
+            "--error-status", type=int, default=503, help="status of failed requests"
+        )
+        parser.add_argument(
+            "--record",
+            action="store_true",
+            help="fetch LEIs missing from the fixture from gleif.org and save them",
+        )
+        parser.add_argument("--seed", type=int, help="seed of random delays and errors")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["error_rate"] <= 1:
+            raise CommandError("--error-rate must be between 0 and 1")
+        if options["record"] and not os.path.exists(options["fixture"]):
+            records = {}
+        else:
+            try:
+                records = load_records(options["fixture"])
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Invalid fixture file: {e}")
+
+        server = GLEIFStubServer(
+            (options["host"], options["port"]),
+            records,
+            latency=options["latency_ms"] / 1000,
+            jitter=options["jitter_ms"] / 1000,
+            error_rate=options["error_rate"],
+            error_status=options["error_status"],
+            fixture_path=options["fixture"] if options["record"] else None,
+            seed=options["seed"],
+            verbose=options["verbosity"] > 1,
+        )
+        self.stdout.write(
+            f"Serving {len(records)} LEI records, point the app to this server with:\n"
+            f"LEI_LOOKUP_URL_F='{server.url_format}'"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from origin.importtime import profile_startup, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports the time a worker takes to start and the time spent "
+        "importing modules, grouped by package"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="packages listed")
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            help="fail when starting takes longer than this many milliseconds",
+        )
+
+    def handle(self, *args, **options):
+        startup_ms, lazy_modules, imports = profile_startup()
+        summary = summarize(imports, options["top"])
+
+        self.stdout.write(f"Started in {startup_ms:.1f}ms")
+        self.stdout.write(
+            f"Imported {summary['modules']} modules in {summary['imports_ms']}ms"
+        )
+        for package in summary["packages"]:
+            self.stdout.write(f"{package['ms']:>10.1f}ms  {package['package']}")
+
+        if lazy_modules:
+            raise CommandError(
+                f"{', '.join(lazy_modules)} must not be imported at start up"
+            )
+        if options["budget_ms"] and startup_ms > options["budget_ms"]:
+            raise CommandError(
+                f"Starting took {startup_ms:.1f}ms, "
+                f"budget is {options['budget_ms']}ms"
+            )
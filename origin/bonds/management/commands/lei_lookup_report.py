@@ -0,0 +1,65 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bonds import telemetry
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:.0f}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints a summary of the recorded gleif.org LEI lookups: outcomes, "
+        "durations, and lookups per endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--json", action="store_true", help="print the raw report as JSON"
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="clear the recorded data once printed, to report per period",
+        )
+
+    def handle(self, *args, **options):
+        report = telemetry.get_report()
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_summary(report)
+        if options["reset"]:
+            telemetry.reset()
+
+    def write_summary(self, report):
+        lookups = report["lookups"]
+        self.stdout.write(
+            f"gleif.org requests: {lookups}, "
+            f"coalesced lookups: {report['coalesced']}"
+        )
+        self.stdout.write("Outcomes:")
+        for outcome, count in report["outcomes"].items():
+            if count:
+                share = 100 * count / lookups if lookups else 0
+                self.stdout.write(f"  {outcome:<24}{count:>8}{share:>8.1f}%")
+
+        duration = report["duration_ms"]
+        self.stdout.write(
+            f"Duration (ms): p50 {_ms(duration['p50'])}, "
+            f"p90 {_ms(duration['p90'])}, p99 {_ms(duration['p99'])}, "
+            f"mean {_ms(duration['mean'])}"
+        )
+        previous = 0
+        for bound, count in duration["buckets"]:
+            label = f"<= {bound}" if bound != "+Inf" else "slower"
+            self.stdout.write(f"  {label:<24}{count - previous:>8}")
+            previous = count
+
+        self.stdout.write("Lookups by endpoint:")
+        for endpoint, count in sorted(
+            report["calls_by_endpoint"].items(), key=lambda item: -item[1]
+        ):
+            self.stdout.write(f"  {endpoint:<24}{count:>8}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bonds.fx import FXRatesFileError, load_rates
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads FX rates to the base currency from a CSV file "
+        "with `currency` and `rate` columns"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file path")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], newline="") as rates_file:
+                count = load_rates(rates_file)
+        except (OSError, FXRatesFileError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Loaded {count} FX rates."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bonds.hierarchy import HierarchyFileError, load_entities
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads legal entities and their parents from a CSV file with `lei`, "
+        "`legal_name`, `direct_parent_lei` and `ultimate_parent_lei` columns"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file path")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], newline="") as entities_file:
+                counts = load_entities(entities_file)
+        except (OSError, HierarchyFileError) as e:
+            raise CommandError(str(e))
+        for shard, shard_counts in counts.items():
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{shard}: loaded {shard_counts['created']} new and "
+                    f"{shard_counts['updated']} known legal entities, "
+                    f"{shard_counts['moved']} changed parent."
+                )
+            )
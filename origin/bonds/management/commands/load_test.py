@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bonds.load_testing import DEFAULT_MIX, parse_mix, provision_users, run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives mixed create/list/filter traffic against a running server and "
+        "reports latency percentiles, throughput and error rates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--users", type=int, default=10, help="number of load test users"
+        )
+        parser.add_argument(
+            "--rate", type=float, default=20, help="requests per second"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30, help="test duration in seconds"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=100, help="max requests in flight"
+        )
+        parser.add_argument(
+            "--mix",
+            default=",".join(
+                f"{name}={weight}" for name, weight in DEFAULT_MIX.items()
+            ),
+            help="operations weights",
+        )
+        parser.add_argument("--seed", type=int, help="seed of the operations mix")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options["rate"] <= 0 or options["duration"] <= 0 or options["users"] <= 0:
+            raise CommandError("--users, --rate and --duration must be positive")
+
+        # users are created in the database the target server uses
+        tokens = provision_users(options["users"])
+        report = run_load_test(
+            options["url"],
+            tokens,
+            options["rate"],
+            options["duration"],
+            options["concurrency"],
+            mix,
+            options["seed"],
+        )
+        self.stdout.write(json.dumps(report, indent=2))
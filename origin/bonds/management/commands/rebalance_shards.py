@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bonds.sharding import get_shard, move_user, plan_rebalance, shard_loads
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves users' bonds between shards, either a single user with --user "
+        "and --to, or the users evening out the number of bonds per shard"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="id of the user to move")
+        parser.add_argument("--to", help="shard the user is moved to")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BONDS_SHARD_MOVE_BATCH_SIZE,
+            help="number of rows copied per transaction",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="only list the moves"
+        )
+
+    def handle(self, *args, **options):
+        if (options["user"] is None) != (options["to"] is None):
+            raise CommandError("--user and --to must be used together")
+        if options["to"] and options["to"] not in settings.BONDS_SHARDS:
+            raise CommandError(
+                f"Unknown shard {options['to']}, shards are {settings.BONDS_SHARDS}"
+            )
+
+        if options["user"] is not None:
+            moves = [(options["user"], get_shard(options["user"]), options["to"])]
+        else:
+            moves = plan_rebalance(shard_loads())
+
+        for user_id, source, target in moves:
+            self.stdout.write(f"User {user_id}: {source} -> {target}")
+            if not options["dry_run"]:
+                moved = move_user(user_id, target, options["batch_size"])
+                self.stdout.write(
+                    ", ".join(f"{count} {name}" for name, count in moved.items())
+                    or "Already on this shard"
+                )
+        done = "to move" if options["dry_run"] else "moved"
+        self.stdout.write(self.style.SUCCESS(f"{len(moves)} users {done}."))
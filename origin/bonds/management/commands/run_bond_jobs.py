@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bonds.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Runs the bulk actions on bonds started from the admin"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BONDS_JOB_BATCH_SIZE,
+            help="number of bonds processed per transaction",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep running, checking for new jobs every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=settings.BONDS_JOB_POLL_INTERVAL
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending_jobs(options["batch_size"])
+            if count:
+                self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs."))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
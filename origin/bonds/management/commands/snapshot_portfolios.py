@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bonds.history import take_snapshot, users_due_for_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshots the books of users with many history entries since their "
+        "latest snapshot, or of every user whose book changed with --all"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=settings.BONDS_HISTORY_SNAPSHOT_INTERVAL,
+            help="history entries since the latest snapshot making one due",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="snapshot every user with a history entry since their latest "
+            "snapshot, e.g. at month end",
+        )
+
+    def handle(self, *args, **options):
+        interval = 1 if options["all"] else options["interval"]
+        count = 0
+        for shard in settings.BONDS_SHARDS:
+            for user_id in users_due_for_snapshot(shard, interval):
+                if take_snapshot(user_id, shard) is not None:
+                    count += 1
+        self.stdout.write(self.style.SUCCESS(f"Took {count} snapshots."))
@@ -0,0 +1,36 @@
+from django.core.cache import caches
+
+METRICS_KEY_PREFIX = "bonds:metrics:"
+# cache alias of the counters, see `CACHES` in settings
+CACHE_ALIAS = "metrics"
+
+
+def get_cache():
+    """Returns the cache holding counters."""
+    return caches[CACHE_ALIAS]
+
+
+def increment(name, delta=1):
+    """
+    Increments the counter `name` by `delta`.
+
+    Counters are kept in the cache framework so they are shared by every
+    process using the same cache backend, and they never expire on their own.
+    """
+    cache = get_cache()
+    key = METRICS_KEY_PREFIX + name
+    if cache.add(key, delta, timeout=None):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # counter got evicted between add() and incr()
+        cache.set(key, delta, timeout=None)
+
+
+def get_count(name):
+    return get_cache().get(METRICS_KEY_PREFIX + name, 0)
+
+
+def reset(*names):
+    get_cache().delete_many([METRICS_KEY_PREFIX + name for name in names])
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.13 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bonds", "0002_bondchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FXRate",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("currency", models.CharField(max_length=3, unique=True)),
+                ("rate", models.DecimalField(decimal_places=10, max_digits=20)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.13 on 2026-10-19 14:58
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def flag_latest_bonds(apps, schema_editor):
+    # ISINs a user already holds several times upsert to their latest bond
+    Bond = apps.get_model("bonds", "Bond")
+    bonds = Bond.objects.using(schema_editor.connection.alias)
+    latest_ids = (
+        bonds.values("user_id", "isin")
+        .annotate(latest_id=Max("id"))
+        .values_list("latest_id", flat=True)
+    )
+    bonds.filter(id__in=latest_ids).update(unique_isin=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bonds", "0003_fxrate"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bond",
+            index=models.Index(
+                fields=["user", "isin"], name="bonds_bond_user_id_03e624_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="bond",
+            name="unique_isin",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        # bonds are sharded, see `bonds.sharding.ShardRouter.allow_migrate`
+        migrations.RunPython(
+            flag_latest_bonds, migrations.RunPython.noop, hints={"model_name": "bond"}
+        ),
+        migrations.AddConstraint(
+            model_name="bond",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(unique_isin=True),
+                fields=("user", "isin"),
+                name="unique_bond_isin_per_user",
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 2.2.13 on 2026-10-19 15:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from bonds.normalization import tokenize
+
+
+def index_legal_names(apps, schema_editor):
+    Bond = apps.get_model("bonds", "Bond")
+    LegalNameToken = apps.get_model("bonds", "LegalNameToken")
+    for bond in Bond.objects.iterator():
+        LegalNameToken.objects.bulk_create(
+            LegalNameToken(bond=bond, user_id=bond.user_id, token=token)
+            for token in tokenize(bond.legal_name)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("bonds", "0004_bond_user_isin_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LegalNameToken",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=100)),
+                (
+                    "bond",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="legal_name_tokens",
+                        to="bonds.Bond",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="legalnametoken",
+            index=models.Index(
+                fields=["user", "token"], name="bonds_legal_user_id_da1006_idx"
+            ),
+        ),
+        migrations.RunPython(index_legal_names, migrations.RunPython.noop),
+    ]
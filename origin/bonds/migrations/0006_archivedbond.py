@@ -0,0 +1,50 @@
+# Generated by Django 2.2.13 on 2026-10-19 15:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("bonds", "0005_legalnametoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedBond",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("isin", models.CharField(max_length=20)),
+                ("size", models.IntegerField()),
+                ("currency", models.CharField(max_length=3)),
+                ("maturity", models.DateField()),
+                ("lei", models.CharField(max_length=40)),
+                ("legal_name", models.CharField(max_length=100)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="bond",
+            index=models.Index(
+                fields=["maturity"], name="bonds_bond_maturit_a0539b_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedbond",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 2.2.13 on 2026-10-19 15:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("bonds", "0007_sharding"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BondJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("resolve_legal_names", "Resolve legal names"),
+                            ("archive", "Archive"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=7,
+                    ),
+                ),
+                ("selection", models.TextField()),
+                ("total", models.IntegerField(null=True)),
+                ("processed", models.IntegerField(default=0)),
+                ("failed", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(null=True)),
+                ("finished_at", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="bond",
+            index=models.Index(fields=["isin"], name="bonds_bond_isin_6ebd71_idx"),
+        ),
+        migrations.AddField(
+            model_name="bondjob",
+            name="created_by",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bondjob",
+            index=models.Index(
+                fields=["status", "id"], name="bonds_bondj_status_88cd54_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 2.2.13 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bonds", "0008_admin_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LegalEntity",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lei", models.CharField(max_length=20, unique=True)),
+                ("legal_name", models.CharField(blank=True, max_length=255)),
+                ("direct_parent_lei", models.CharField(blank=True, max_length=20)),
+                ("ultimate_parent_lei", models.CharField(blank=True, max_length=20)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LegalEntityAncestor",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lei", models.CharField(max_length=20)),
+                ("ancestor_lei", models.CharField(max_length=20)),
+                ("depth", models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="legalentityancestor",
+            index=models.Index(
+                fields=["ancestor_lei"], name="bonds_legal_ancesto_a848fd_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="legalentityancestor",
+            constraint=models.UniqueConstraint(
+                fields=("lei", "ancestor_lei"), name="unique_entity_ancestor"
+            ),
+        ),
+    ]
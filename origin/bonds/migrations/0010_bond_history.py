@@ -0,0 +1,74 @@
+# Generated by Django 2.2.13 on 2026-10-19 15:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("bonds", "0009_legal_entity_hierarchy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PortfolioSnapshot",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("last_history_id", models.BigIntegerField()),
+                ("taken_at", models.DateTimeField()),
+                ("bond_count", models.PositiveIntegerField()),
+                ("state", models.BinaryField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BondHistory",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("bond_id", models.BigIntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("removed", "Removed"),
+                        ],
+                        max_length=7,
+                    ),
+                ),
+                ("changes", models.TextField(blank=True)),
+                ("recorded_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="portfoliosnapshot",
+            index=models.Index(
+                fields=["user", "taken_at"], name="bonds_portf_user_id_e4874d_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bondhistory",
+            index=models.Index(
+                fields=["user", "id"], name="bonds_bondh_user_id_a32d2c_idx"
+            ),
+        ),
+    ]
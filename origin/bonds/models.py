@@ -1,18 +1,445 @@
+import json
+
 from django.conf import settings
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
 
+from bonds import cache
+from bonds.normalization import tokenize
 from bonds.services import get_legal_name
 
 
+class UserQuerySet(models.QuerySet):
+    """Queryset of a model sharded by user, see `bonds.sharding`."""
+
+    def for_user(self, user):
+        """Filters the user's rows, on the shard holding them."""
+        # imported here as bonds.sharding uses the models
+        from bonds.sharding import get_shard
+
+        return self.using(get_shard(user.pk)).filter(user=user)
+
+
+def user_foreign_key():
+    # users live on the default database, so sharded rows reference them
+    # without a database constraint
+    return models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False
+    )
+
+
 class Bond(models.Model):
+    # ids are unique across shards and kept when moved to another shard, see
+    # `bonds.sharding.allocate_bond_id`
+    id = models.BigAutoField(primary_key=True)
     isin = models.CharField(max_length=20)
     size = models.IntegerField()
     currency = models.CharField(max_length=3)
     maturity = models.DateField()
     lei = models.CharField(max_length=40)
     legal_name = models.CharField(max_length=100)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = user_foreign_key()
+    # the bond updated by creations with its ISIN when
+    # `settings.BONDS_UNIQUE_ISIN_PER_USER` is enabled, at most one per user
+    # and ISIN
+    unique_isin = models.BooleanField(default=False, editable=False)
+
+    objects = UserQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "isin"]),
+            # admin searches across users
+            models.Index(fields=["isin"]),
+            # matured bonds lookups by the archiving job
+            models.Index(fields=["maturity"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "isin"],
+                condition=models.Q(unique_isin=True),
+                name="unique_bond_isin_per_user",
+            )
+        ]
 
-    def save(self, *args, **kwargs):
-        self.legal_name = get_legal_name(self.lei)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # values as loaded, so the history only records changed fields
+        instance._loaded_values = dict(zip(field_names, values))
+        # legal name the stored search tokens were built from
+        instance._indexed_legal_name = instance._loaded_values.get("legal_name")
+        return instance
+
+    def save(self, *args, resolve_legal_name=True, **kwargs):
+        if resolve_legal_name:
+            self.legal_name = get_legal_name(self.lei)
+        if self.pk is None:
+            # imported here as bonds.sharding uses the models
+            from bonds.sharding import allocate_bond_id
+
+            using = kwargs.get("using") or router.db_for_write(Bond, instance=self)
+            self.pk = allocate_bond_id(using)
         return super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Bond)
+@receiver(post_delete, sender=Bond)
+def invalidate_bonds_list_cache(sender, instance=None, using=None, **kwargs):
+    # once committed: a list cached under the new version before the commit
+    # would be the list as it was
+    user_id = instance.user_id
+    transaction.on_commit(lambda: cache.invalidate_user(user_id), using=using)
+
+
+def leaves_book(bond, using):
+    """
+    Returns whether deleting a bond from `using` removes it from its user's
+    book, rather than a copy left on another shard by a move
+    (`bonds.sharding.move_user`).
+    """
+    # imported here as bonds.sharding uses the models
+    from bonds.sharding import get_shard
+
+    return get_shard(bond.user_id) == using
+
+
+class ArchivedBond(models.Model):
+    """
+    Matured bond moved out of the `Bond` table by the archiving job.
+
+    Keeping matured bonds apart keeps queries and indexes on `Bond`
+    proportional to live positions.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    isin = models.CharField(max_length=20)
+    size = models.IntegerField()
+    currency = models.CharField(max_length=3)
+    maturity = models.DateField()
+    lei = models.CharField(max_length=40)
+    legal_name = models.CharField(max_length=100)
+    user = user_foreign_key()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = UserQuerySet.as_manager()
+
+
+class BondChange(models.Model):
+    """
+    Append-only log of bond creations, updates and removals.
+
+    Entries are ordered by their primary key which is used as the cursor of
+    the changes feed (`GET /bonds/changes/`).
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    REMOVED = "removed"
+    ACTION_CHOICES = [(CREATED, "Created"), (UPDATED, "Updated"), (REMOVED, "Removed")]
+
+    id = models.BigAutoField(primary_key=True)
+    # entries outlive the bond so that feed clients learn of its removal, the
+    # bond is null once removed
+    bond = models.ForeignKey(
+        Bond,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="changes",
+    )
+    user = user_foreign_key()
+    action = models.CharField(max_length=7, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = UserQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "id"])]
+
+
+@receiver(post_save, sender=Bond)
+def log_bond_change(
+    sender, instance=None, created=False, raw=False, using=None, **kwargs
+):
+    if raw:
+        return
+    BondChange.objects.using(using).create(
+        bond=instance,
+        user_id=instance.user_id,
+        action=BondChange.CREATED if created else BondChange.UPDATED,
+    )
+
+
+@receiver(post_delete, sender=Bond)
+def log_bond_removal(sender, instance=None, using=None, **kwargs):
+    # archived or deleted, from the admin or by the archiving job
+    if leaves_book(instance, using):
+        BondChange.objects.using(using).create(
+            bond_id=instance.pk, user_id=instance.user_id, action=BondChange.REMOVED
+        )
+
+
+class BondHistory(models.Model):
+    """
+    Append-only history of the user's book, replayed to list bonds as of a
+    past date, see `bonds.history`.
+
+    Entries only hold the fields which changed, as a JSON object.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    REMOVED = "removed"
+    ACTION_CHOICES = [(CREATED, "Created"), (UPDATED, "Updated"), (REMOVED, "Removed")]
+
+    # bond fields recorded
+    FIELDS = ["isin", "size", "currency", "maturity", "lei", "legal_name"]
+
+    id = models.BigAutoField(primary_key=True)
+    # not a foreign key, entries outlive the bond
+    bond_id = models.BigIntegerField()
+    user = user_foreign_key()
+    action = models.CharField(max_length=7, choices=ACTION_CHOICES)
+    changes = models.TextField(blank=True)
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    objects = UserQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "id"])]
+
+
+@receiver(post_save, sender=Bond)
+def record_bond_history(
+    sender, instance=None, created=False, raw=False, using=None, **kwargs
+):
+    if raw:
+        return
+    values = {field: getattr(instance, field) for field in BondHistory.FIELDS}
+    loaded = getattr(instance, "_loaded_values", None)
+    changes = values
+    if not created and loaded is not None:
+        changes = {
+            field: value
+            for field, value in values.items()
+            if field not in loaded or loaded[field] != value
+        }
+        if not changes:
+            return
+    BondHistory.objects.using(using).create(
+        bond_id=instance.pk,
+        user_id=instance.user_id,
+        action=BondHistory.CREATED if created else BondHistory.UPDATED,
+        changes=json.dumps(changes, cls=DjangoJSONEncoder, separators=(",", ":")),
+    )
+    instance._loaded_values = values
+
+
+@receiver(post_delete, sender=Bond)
+def record_bond_removal(sender, instance=None, using=None, **kwargs):
+    if leaves_book(instance, using):
+        BondHistory.objects.using(using).create(
+            bond_id=instance.pk, user_id=instance.user_id, action=BondHistory.REMOVED
+        )
+
+
+class PortfolioSnapshot(models.Model):
+    """
+    State of a user's book after a `BondHistory` entry, so listing bonds as
+    of a date only replays the entries recorded since the latest snapshot.
+
+    `state` is zlib compressed JSON, see `bonds.history`.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    user = user_foreign_key()
+    last_history_id = models.BigIntegerField()
+    # no entry included in the snapshot was recorded after this
+    taken_at = models.DateTimeField()
+    bond_count = models.PositiveIntegerField()
+    state = models.BinaryField()
+
+    objects = UserQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "taken_at"])]
+
+
+class FXRate(models.Model):
+    """
+    Conversion rate from a currency to `settings.BONDS_BASE_CURRENCY`.
+
+    `rate` is the amount of base currency one unit of `currency` is worth.
+    """
+
+    currency = models.CharField(max_length=3, unique=True)
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class LegalEntity(models.Model):
+    """
+    Legal entity of the GLEIF relationship data, see `bonds.hierarchy`.
+
+    Reference data joined to bonds by the database, copied on each shard.
+    """
+
+    lei = models.CharField(max_length=20, unique=True)
+    legal_name = models.CharField(max_length=255, blank=True)
+    direct_parent_lei = models.CharField(max_length=20, blank=True)
+    ultimate_parent_lei = models.CharField(max_length=20, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class LegalEntityAncestor(models.Model):
+    """
+    Closure table of the legal entity hierarchy: a row per entity and each of
+    its ancestors, `depth` levels up, including the entity itself at depth 0.
+    """
+
+    lei = models.CharField(max_length=20)
+    ancestor_lei = models.CharField(max_length=20)
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lei", "ancestor_lei"], name="unique_entity_ancestor"
+            )
+        ]
+        indexes = [models.Index(fields=["ancestor_lei"])]
+
+
+class LegalNameToken(models.Model):
+    """
+    Normalized word of a bond's legal name, indexed for searches.
+
+    `user` duplicates `bond.user` so that searches and fuzzy matching
+    candidates only go through the user's tokens.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    bond = models.ForeignKey(
+        Bond, on_delete=models.CASCADE, related_name="legal_name_tokens"
+    )
+    user = user_foreign_key()
+    token = models.CharField(max_length=100)
+
+    objects = UserQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "token"])]
+
+
+@receiver(post_save, sender=Bond)
+def index_legal_name(
+    sender, instance=None, created=False, raw=False, using=None, **kwargs
+):
+    if raw:
+        return
+    if not created:
+        if instance.legal_name == getattr(instance, "_indexed_legal_name", None):
+            return
+        instance.legal_name_tokens.all().delete()
+    LegalNameToken.objects.using(using).bulk_create(
+        LegalNameToken(bond=instance, user_id=instance.user_id, token=token)
+        for token in tokenize(instance.legal_name)
+    )
+    instance._indexed_legal_name = instance.legal_name
+
+
+class BondJob(models.Model):
+    """
+    Bulk action on bonds started from the admin, run in batches by the
+    `run_bond_jobs` management command.
+    """
+
+    RESOLVE_LEGAL_NAMES = "resolve_legal_names"
+    ARCHIVE = "archive"
+    ACTION_CHOICES = [
+        (RESOLVE_LEGAL_NAMES, "Resolve legal names"),
+        (ARCHIVE, "Archive"),
+    ]
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=PENDING)
+    # JSON selection of bonds, run on every shard, see `bonds.jobs.enqueue`
+    selection = models.TextField()
+    # counted when the job starts
+    total = models.IntegerField(null=True)
+    processed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"])]
+
+
+class UserShard(models.Model):
+    """
+    Directory of the shard (database alias) holding a user's bonds data.
+
+    Lives on the default database, users without an entry are on the first
+    shard, see `bonds.sharding`.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="shard"
+    )
+    shard = models.CharField(max_length=100)
+    # set while `bonds.sharding.move_user` moves the user's rows
+    moving = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_sharded_bonds(sender, instance=None, using=None, **kwargs):
+    # deleting a user only cascades on the database it is deleted from
+    from bonds.sharding import get_shard
+
+    shard = instance._bonds_shard = get_shard(instance.pk)
+    if shard != using:
+        for model in (
+            LegalNameToken,
+            BondChange,
+            ArchivedBond,
+            Bond,
+            BondHistory,
+            PortfolioSnapshot,
+        ):
+            model.objects.using(shard).filter(user_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_removal_entries(sender, instance=None, **kwargs):
+    # logged as the user's bonds were deleted, after their other entries
+    for model in (BondChange, BondHistory):
+        model.objects.using(instance._bonds_shard).filter(user_id=instance.pk).delete()
+
+
+@receiver(post_migrate)
+def reserve_shard_id_range(sender, using=None, **kwargs):
+    if sender.name == "bonds":
+        from bonds.sharding import reserve_id_range
+
+        reserve_id_range(using)
@@ -0,0 +1,18 @@
+import re
+import unicodedata
+
+TOKEN_SEPARATOR_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    """Lowercases text and strips accents, "Société" becomes "societe"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    ).lower()
+
+
+def tokenize(text):
+    """Returns the distinct normalized words of text, in order of appearance."""
+    tokens = TOKEN_SEPARATOR_RE.split(normalize(text))
+    return list(dict.fromkeys(token for token in tokens if token))
@@ -0,0 +1,108 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db.models import Case, CharField, Count, Sum, Value, When
+from django.db.models.functions import ExtractYear
+
+from bonds import cache
+from bonds.models import Bond
+
+MATURED_BUCKET = "matured"
+
+
+def _add_years(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # 29th of February on a non leap year
+        return day.replace(year=day.year + years, day=28)
+
+
+def ladder_buckets(today):
+    """
+    Returns `(label, upper bound)` pairs of the maturity ladder buckets.
+
+    Bounds are exclusive maturity dates, the last bucket has no upper bound.
+    """
+    buckets = [(MATURED_BUCKET, today)]
+    lower = 0
+    for years in settings.BONDS_LADDER_BUCKET_YEARS:
+        buckets.append((f"{lower}-{years}y", _add_years(today, years)))
+        lower = years
+    buckets.append((f"{lower}y+", None))
+    return buckets
+
+
+def maturity_ladder(bonds, today):
+    """
+    Sums bond sizes per currency and remaining time to maturity.
+
+    Buckets are computed by the database in a single grouped query, every
+    bucket is listed for each currency, including empty ones.
+    """
+    buckets = ladder_buckets(today)
+    bucket_expression = Case(
+        *[
+            When(maturity__lt=upper, then=Value(label))
+            for label, upper in buckets
+            if upper is not None
+        ],
+        default=Value(buckets[-1][0]),
+        output_field=CharField(),
+    )
+    rows = (
+        bonds.annotate(bucket=bucket_expression)
+        .values("currency", "bucket")
+        .annotate(total=Sum("size"), count=Count("id"))
+        .order_by()
+    )
+    totals = {(row["currency"], row["bucket"]): row for row in rows}
+    currencies = sorted({currency for currency, _ in totals})
+    return {
+        currency: [
+            {
+                "bucket": label,
+                "total": totals.get((currency, label), {}).get("total", 0),
+                "count": totals.get((currency, label), {}).get("count", 0),
+            }
+            for label, _ in buckets
+        ]
+        for currency in currencies
+    }
+
+
+def repayment_schedule(bonds):
+    """Sums principal repaid per currency and maturity year."""
+    rows = (
+        bonds.annotate(year=ExtractYear("maturity"))
+        .values("currency", "year")
+        .annotate(total=Sum("size"), count=Count("id"))
+        .order_by("currency", "year")
+    )
+    schedule = {}
+    for row in rows:
+        schedule.setdefault(row["currency"], []).append(
+            {"year": row["year"], "total": row["total"], "count": row["count"]}
+        )
+    return schedule
+
+
+def get_projection(user, today=None):
+    """
+    Returns the maturity ladder and repayment schedule of a user's bonds.
+
+    Results are cached until one of the user's bonds changes or the day ends.
+    """
+    today = today or date.today()
+    key = cache.user_cache_key(user.pk, "projection", today.isoformat())
+    projection = django_cache.get(key)
+    if projection is None:
+        bonds = Bond.objects.for_user(user)
+        projection = {
+            "as_of": today.isoformat(),
+            "ladder": maturity_ladder(bonds, today),
+            "repayments": repayment_schedule(bonds),
+        }
+        django_cache.set(key, projection, settings.BONDS_PROJECTION_CACHE_TIMEOUT)
+    return projection
@@ -0,0 +1,47 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from bonds import telemetry
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Renders lists of objects with field names listed once:
+    ```
+    {
+        "columns": ["isin", "size", ...],
+        "rows": [["FR0000131104", 100000000, ...], ...]
+    }
+    ```
+
+    Selected with `Accept: application/vnd.origin.columnar+json` or the
+    `format=columnar` query parameter. Other data is rendered as plain JSON.
+    """
+
+    media_type = "application/vnd.origin.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list) and all(isinstance(row, dict) for row in data):
+            columns = list(data[0].keys()) if data else []
+            data = {
+                "columns": columns,
+                "rows": [[row.get(column) for column in columns] for row in data],
+            }
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class PrometheusRenderer(BaseRenderer):
+    """
+    Renders `bonds.telemetry` reports in the Prometheus text format, errors
+    as plain text.
+    """
+
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None and response.exception:
+            return str(data.get("detail", data))
+        return telemetry.to_prometheus(data)
@@ -0,0 +1,57 @@
+import difflib
+
+from django.conf import settings
+
+from bonds.models import LegalNameToken
+from bonds.normalization import tokenize
+
+# upper bound of all tokens starting with a given prefix
+PREFIX_RANGE_END = "\uffff"
+
+
+def _prefix_range(prefix):
+    # a range rather than LIKE so the (user, token) index is used on every
+    # database, whatever its collation
+    return {"token__gte": prefix, "token__lt": prefix + PREFIX_RANGE_END}
+
+
+def fuzzy_matches(user, query_token):
+    """
+    Returns the user's tokens similar to `query_token`.
+
+    Candidates are the distinct tokens starting with the same letter, read
+    from the index, so their number depends on the vocabulary of legal names
+    rather than on the number of bonds.
+    """
+    candidates = (
+        LegalNameToken.objects.for_user(user)
+        .filter(**_prefix_range(query_token[0]))
+        .values_list("token", flat=True)
+        .distinct()
+    )
+    return [
+        candidate
+        for candidate in candidates
+        if candidate.startswith(query_token)
+        or difflib.SequenceMatcher(None, query_token, candidate).ratio()
+        >= settings.BONDS_SEARCH_FUZZY_THRESHOLD
+    ]
+
+
+def search_legal_name(bonds, user, query, fuzzy=False):
+    """
+    Filters bonds whose legal name matches every word of `query`.
+
+    Matching is case and accent insensitive, and query words match legal name
+    words they are a prefix of ("bnp par" matches "BNP PARIBAS").
+    With `fuzzy`, words with a typo match too ("parbas" matches "PARIBAS").
+    """
+    for query_token in tokenize(query):
+        # matching bonds are selected from the (user, token) index
+        tokens = LegalNameToken.objects.for_user(user)
+        if fuzzy:
+            tokens = tokens.filter(token__in=fuzzy_matches(user, query_token))
+        else:
+            tokens = tokens.filter(**_prefix_range(query_token))
+        bonds = bonds.filter(pk__in=tokens.values("bond_id"))
+    return bonds
@@ -1,5 +1,12 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import serializers
-from bonds.models import Bond
+from bonds.models import ArchivedBond, Bond, BondChange
+from bonds.sharding import get_shard
+from bonds.validators import validate_isin, validate_lei
 
 
 class BondSerializer(serializers.ModelSerializer):
@@ -8,7 +15,99 @@ class BondSerializer(serializers.ModelSerializer):
     legal_name = serializers.ReadOnlyField()
     maturity = serializers.DateField(input_formats=["%Y-%m-%d"])
     currency = serializers.CharField(min_length=3, max_length=3)
+    # identifiers are checked before saving to avoid needless LEI lookups
+    isin = serializers.CharField(max_length=20, validators=[validate_isin])
+    lei = serializers.CharField(max_length=40, validators=[validate_lei])
 
     class Meta:
         model = Bond
-        exclude = ["user", "id"]
+        exclude = ["user", "id", "unique_isin"]
+
+    # the legal name is passed to `save`, looked up by the view before the
+    # bond's transaction
+
+    def create(self, validated_data):
+        bond = Bond(**validated_data)
+        # on the shard of the bond's user, see `bonds.sharding`
+        bond.save(
+            force_insert=True,
+            using=get_shard(validated_data["user"].pk),
+            resolve_legal_name=False,
+        )
+        return bond
+
+    def update(self, instance, validated_data):
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.save(resolve_legal_name=False)
+        return instance
+
+
+class ArchivedBondSerializer(BondSerializer):
+    class Meta:
+        model = ArchivedBond
+        exclude = ["user", "id", "archived_at"]
+
+
+class BondChangeSerializer(serializers.ModelSerializer):
+
+    # null once the bond is removed
+    bond = BondSerializer(allow_null=True)
+
+    class Meta:
+        model = BondChange
+        fields = ["id", "bond_id", "action", "created_at", "bond"]
+
+
+class BondChangesQuerySerializer(serializers.Serializer):
+    """Validates the query parameters of the changes feed"""
+
+    cursor = serializers.IntegerField(min_value=0, default=0)
+    wait = serializers.IntegerField(
+        min_value=0, max_value=settings.BONDS_CHANGES_MAX_WAIT, default=0
+    )
+
+
+class BondBatchQuerySerializer(serializers.Serializer):
+    """Validates batch lookups, by bond ids or ISINs"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.BONDS_BATCH_MAX_SIZE,
+        required=False,
+    )
+    isins = serializers.ListField(
+        child=serializers.CharField(max_length=20),
+        max_length=settings.BONDS_BATCH_MAX_SIZE,
+        required=False,
+    )
+
+    def validate(self, data):
+        if ("ids" in data) == ("isins" in data):
+            raise serializers.ValidationError("Either ids or isins is required.")
+        return data
+
+
+class BondAsOfQuerySerializer(serializers.Serializer):
+    """
+    Validates the `as_of` parameter of the bonds list, a datetime or a date
+    meaning the end of that day.
+    """
+
+    as_of = serializers.CharField()
+
+    def validate_as_of(self, value):
+        try:
+            as_of = parse_datetime(value)
+            if as_of is None:
+                day = parse_date(value)
+                as_of = day and datetime.combine(day, time.max)
+        except ValueError:
+            as_of = None
+        if as_of is None:
+            raise serializers.ValidationError(
+                "Enter a date (YYYY-MM-DD) or an ISO 8601 datetime."
+            )
+        if timezone.is_naive(as_of):
+            as_of = timezone.make_aware(as_of)
+        return as_of
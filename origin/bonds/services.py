@@ -1,15 +1,145 @@
 import json
+import threading
+import time
 
-import requests
+from django.conf import settings
+from django.core.cache import cache
 
+from bonds import metrics
+from bonds import telemetry
+from bonds.telemetry import LEI_LOOKUPS, LEI_LOOKUPS_COALESCED
 from origin import constants
 
 
 class LEILookupError(Exception):
-    pass
+    def __init__(self, message, outcome=constants.LEI_LOOKUP_FAILED):
+        super().__init__(message)
+        # one of the `LEI_LOOKUP_*` outcomes of `origin.constants`
+        self.outcome = outcome
+
+
+class _InFlightLookup:
+    """Result of a lookup shared by the threads waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
 
 
 def get_legal_name(lei):
+    """
+    Looks up the legal name of a LEI.
+
+    Concurrent lookups of the same LEI are coalesced: only the first one
+    queries gleif.org, other threads wait for its result (or error).
+    With `LEI_LOOKUP_COALESCE_ACROSS_PROCESSES`, lookups are also coalesced
+    across processes sharing the same cache backend.
+
+    Raises:
+      LEILookupError: when LEI data could not be fetched successfully.
+    """
+    telemetry.record_call()
+    with _in_flight_lock:
+        lookup = _in_flight.get(lei)
+        is_leader = lookup is None
+        if is_leader:
+            lookup = _in_flight[lei] = _InFlightLookup()
+
+    if not is_leader:
+        metrics.increment(LEI_LOOKUPS_COALESCED)
+        # requests time out, this only guards against a stuck leader
+        if not lookup.done.wait(settings.LEI_LOOKUP_COALESCE_TIMEOUT):
+            raise LEILookupError(
+                constants.ERR_LEI_LOOKUP_TIMEOUT, constants.LEI_LOOKUP_TIMEOUT
+            )
+        if lookup.error is not None:
+            raise lookup.error
+        return lookup.result
+
+    try:
+        if settings.LEI_LOOKUP_COALESCE_ACROSS_PROCESSES:
+            lookup.result = _get_legal_name_across_processes(lei)
+        else:
+            lookup.result = _lookup_legal_name(lei)
+        return lookup.result
+    except Exception as e:
+        lookup.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[lei]
+        lookup.done.set()
+
+
+def _get_legal_name_across_processes(lei):
+    """
+    Coalesces lookups across processes with a cache lock.
+
+    The process holding the lock publishes its result in the cache for a few
+    seconds, others poll for it. If the lock holder dies or is too slow, the
+    waiting process looks the LEI up itself.
+    """
+    lock_key = f"bonds:lei:lock:{lei}"
+    result_key = f"bonds:lei:result:{lei}"
+    timeout = settings.LEI_LOOKUP_COALESCE_TIMEOUT
+
+    if cache.add(lock_key, 1, timeout=timeout):
+        # drop any result published by a previous round of lookups
+        cache.delete(result_key)
+    else:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            published = cache.get(result_key)
+            if published is not None:
+                metrics.increment(LEI_LOOKUPS_COALESCED)
+                legal_name, error = published
+                if error is not None:
+                    raise LEILookupError(error)
+                return legal_name
+            if cache.get(lock_key) is None:
+                break
+            time.sleep(settings.LEI_LOOKUP_COALESCE_POLL_INTERVAL)
+
+    try:
+        legal_name = _lookup_legal_name(lei)
+    except LEILookupError as e:
+        cache.set(result_key, (None, str(e)), timeout=timeout)
+        raise
+    else:
+        cache.set(result_key, (legal_name, None), timeout=timeout)
+        return legal_name
+    finally:
+        cache.delete(lock_key)
+
+
+def _lookup_legal_name(lei):
+    """
+    Fetches the legal name of a LEI from gleif.org, recording the duration and
+    outcome of the request, see `bonds.telemetry`.
+
+    Raises:
+      LEILookupError: when LEI data could not be fetched successfully.
+    """
+    metrics.increment(LEI_LOOKUPS)
+    outcome = constants.LEI_LOOKUP_FAILED
+    started = time.perf_counter()
+    try:
+        legal_name = _fetch_legal_name(lei)
+        outcome = constants.LEI_LOOKUP_OK
+        return legal_name
+    except LEILookupError as e:
+        outcome = e.outcome
+        raise
+    finally:
+        telemetry.record_lookup(lei, outcome, time.perf_counter() - started)
+
+
+def _fetch_legal_name(lei):
     """
     Fetches a record by LEI to get a matching legal name.
 
@@ -34,28 +164,50 @@ def get_legal_name(lei):
     Raises:
       LEILookupError: when LEI data could not be fetched successfully.
     """
-    url = constants.LEI_LOOKUP_URL_F.format(lei=lei)
+    # imported on first use as it is only needed when creating bonds, this
+    # keeps it out of workers start up time
+    import requests
+
+    url = settings.LEI_LOOKUP_URL_F.format(lei=lei)
     try:
-        response = requests.get(url)
+        response = requests.get(url, timeout=settings.LEI_LOOKUP_TIMEOUT)
         if not response.status_code == requests.codes.ok:
             raise LEILookupError(
                 constants.ERR_LEI_LOOKUP_ERROR_F.format(
                     status_code=response.status_code
-                )
+                ),
+                constants.LEI_LOOKUP_SERVER_ERROR,
             )
         try:
             lei_data = response.json()
             assert isinstance(lei_data, list)
         except (ValueError, AssertionError):
             # server didn't return valid response (not JSON, or incorrectly formatted)
-            raise LEILookupError(constants.ERR_LEI_LOOKUP_INVALID_JSON_RESPONSE)
+            raise LEILookupError(
+                constants.ERR_LEI_LOOKUP_INVALID_JSON_RESPONSE,
+                constants.LEI_LOOKUP_INVALID_JSON_RESPONSE,
+            )
         if len(lei_data) == 0:
-            raise LEILookupError(constants.ERR_LEI_LOOKUP_NO_MATCH)
+            raise LEILookupError(
+                constants.ERR_LEI_LOOKUP_NO_MATCH, constants.LEI_LOOKUP_NO_MATCH
+            )
         if len(lei_data) > 1:
-            raise LEILookupError(constants.ERR_LEI_LOOKUP_MULTIPLE_MATCHES)
+            raise LEILookupError(
+                constants.ERR_LEI_LOOKUP_MULTIPLE_MATCHES,
+                constants.LEI_LOOKUP_MULTIPLE_MATCHES,
+            )
         try:
             return lei_data[0]["Entity"]["LegalName"]["$"]
         except (IndexError, KeyError):
-            raise LEILookupError(constants.ERR_LEI_LOOKUP_NO_LEGAL_NAME)
+            raise LEILookupError(
+                constants.ERR_LEI_LOOKUP_NO_LEGAL_NAME,
+                constants.LEI_LOOKUP_NO_LEGAL_NAME,
+            )
+    except requests.exceptions.Timeout:
+        raise LEILookupError(
+            constants.ERR_LEI_LOOKUP_TIMEOUT, constants.LEI_LOOKUP_TIMEOUT
+        )
     except requests.exceptions.ConnectionError:
-        raise LEILookupError(constants.ERR_LEI_LOOKUP_UNREACHABLE)
+        raise LEILookupError(
+            constants.ERR_LEI_LOOKUP_UNREACHABLE, constants.LEI_LOOKUP_UNREACHABLE
+        )
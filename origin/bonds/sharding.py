@@ -0,0 +1,432 @@
+"""
+Spreads bonds data by user across the databases of `settings.BONDS_SHARDS`.
+
+Every query of the bonds API is scoped to a user, so each user's rows
+(`SHARDED_MODELS`) live on a single shard:
+
+- the shard of a user is read from the `UserShard` directory, users without
+  an entry are on the first shard, where all data was before sharding.
+- users are placed on a shard by hashing their id when they first write
+  bonds, unless they already have bonds on the first shard.
+- `move_user` moves a user's rows to another shard. Ids are unique across
+  shards as each shard allocates them from its own range, moved rows get new
+  ids from the range of their new shard, except bonds: their ids are public,
+  every shard allocates them from the sequence of the default database so
+  that bonds keep them.
+"""
+
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count
+
+from bonds import cache as bonds_cache
+from bonds.models import (
+    ArchivedBond,
+    Bond,
+    BondChange,
+    BondHistory,
+    FXRate,
+    LegalEntity,
+    LegalEntityAncestor,
+    LegalNameToken,
+    PortfolioSnapshot,
+    UserShard,
+)
+
+# in the order rows are copied, parents first
+SHARDED_MODELS = (
+    Bond,
+    ArchivedBond,
+    BondChange,
+    LegalNameToken,
+    BondHistory,
+    PortfolioSnapshot,
+)
+SHARDED_MODEL_NAMES = {model._meta.label_lower for model in SHARDED_MODELS}
+# reference data joined to sharded rows by the database, copied on each shard
+REPLICATED_MODEL_NAMES = {
+    model._meta.label_lower for model in (FXRate, LegalEntity, LegalEntityAncestor)
+}
+
+
+class UserMovingError(Exception):
+    """Raised when writing bonds of a user being moved to another shard."""
+
+
+def _shard_cache_key(user_id):
+    return f"bonds:shard:{user_id}"
+
+
+def hash_shard(user_id):
+    shards = settings.BONDS_SHARDS
+    digest = hashlib.sha1(str(user_id).encode()).hexdigest()
+    return shards[int(digest, 16) % len(shards)]
+
+
+def _lookup_shard(user_id):
+    """
+    Returns the shard of a user, whether it is in the directory and whether
+    the user is being moved.
+    """
+    cached = cache.get(_shard_cache_key(user_id))
+    if cached is None:
+        entry = (
+            UserShard.objects.filter(user_id=user_id)
+            .values_list("shard", "moving")
+            .first()
+        )
+        cached = (
+            (entry[0], True, entry[1])
+            if entry
+            else (settings.BONDS_SHARDS[0], False, False)
+        )
+        cache.set(
+            _shard_cache_key(user_id),
+            cached,
+            timeout=settings.BONDS_SHARD_CACHE_TIMEOUT,
+        )
+    return cached
+
+
+def get_shard(user_id):
+    """Returns the alias of the database holding a user's bonds."""
+    if len(settings.BONDS_SHARDS) == 1:
+        return settings.BONDS_SHARDS[0]
+    return _lookup_shard(user_id)[0]
+
+
+def assign_shard(user_id):
+    """
+    Returns the shard a user's new bonds are written to, placing users
+    writing bonds for the first time.
+
+    Raises:
+      UserMovingError: when the user's rows are being moved, see `move_user`.
+    """
+    if len(settings.BONDS_SHARDS) == 1:
+        return settings.BONDS_SHARDS[0]
+    shard, assigned, moving = _lookup_shard(user_id)
+    if moving:
+        raise UserMovingError("Bonds are being moved, try again later")
+    if not assigned:
+        # users with bonds from before sharding stay where they are
+        if not any(
+            model.objects.using(shard).filter(user_id=user_id).exists()
+            for model in (Bond, ArchivedBond)
+        ):
+            shard = hash_shard(user_id)
+        set_shard(user_id, shard)
+    return shard
+
+
+def set_shard(user_id, shard, moving=False):
+    UserShard.objects.update_or_create(
+        user_id=user_id, defaults={"shard": shard, "moving": moving}
+    )
+    cache.set(
+        _shard_cache_key(user_id),
+        (shard, True, moving),
+        timeout=settings.BONDS_SHARD_CACHE_TIMEOUT,
+    )
+
+
+def shard_number(alias):
+    return 0 if alias == "default" else int(alias.rpartition("_")[2])
+
+
+def _id_range(alias):
+    start = shard_number(alias) * settings.BONDS_SHARD_ID_RANGE
+    return start, start + settings.BONDS_SHARD_ID_RANGE
+
+
+def reserve_id_range(using):
+    """
+    Starts ids of the sharded tables of database `using` at the beginning of
+    its range, unless rows were already created in that range.
+    """
+    start, end = _id_range(using)
+    if not start:
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in SHARDED_MODELS:
+            table = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE id >= %s AND id < %s",
+                [start, end],
+            )
+            if cursor.fetchone()[0]:
+                continue
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    "DELETE FROM sqlite_sequence WHERE name = %s",
+                    [model._meta.db_table],
+                )
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [model._meta.db_table, start - 1],
+                )
+            elif connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, false)",
+                    [model._meta.db_table, start],
+                )
+
+
+def _allocate_ids(model, using, count):
+    """Returns `count` new ids of `model` taken from the sequence of `using`."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [table, count],
+            )
+            return [row[0] for row in cursor.fetchall()]
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s",
+                [count, table],
+            )
+            if not cursor.rowcount:
+                # nothing was ever inserted, start at the range of `using`
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)",
+                    [table, max(_id_range(using)[0] - 1, 0) + count],
+                )
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+            last = cursor.fetchone()[0]
+            return list(range(last - count + 1, last + 1))
+    raise NotImplementedError(f"Shards on {connection.vendor} aren't supported")
+
+
+def allocate_bond_id(using):
+    """
+    Returns the id of a new bond saved on `using`, or None when the database
+    allocates it.
+
+    Bond ids of every shard are taken from the sequence of the default
+    database, so bonds keep them when moved to another shard (`move_user`).
+    """
+    if using == "default":
+        return None
+    with transaction.atomic(using="default"):
+        return _allocate_ids(Bond, "default", 1)[0]
+
+
+def _copy_rows(model, user_id, source, target, batch_size, renumber=None):
+    """
+    Copies a user's rows of `model` from `source` to `target`, in batches of
+    `batch_size` rows per transaction, and returns the ids of the rows copied.
+
+    With `renumber`, rows get new ids from the range of `target`, in the same
+    order, and `renumber` is called with each row and its previous id.
+    """
+    copied = []
+    last_id = 0
+    while True:
+        rows = list(
+            model.objects.using(source)
+            .filter(user_id=user_id, id__gt=last_id)
+            .order_by("id")[:batch_size]
+        )
+        if not rows:
+            return copied
+        last_id = rows[-1].id
+        copied += [row.id for row in rows]
+        with transaction.atomic(using=target):
+            if renumber is not None:
+                new_ids = _allocate_ids(model, target, len(rows))
+                for row, new_id in zip(rows, new_ids):
+                    previous_id, row.id = row.id, new_id
+                    renumber(row, previous_id)
+            model.objects.using(target).bulk_create(rows)
+
+
+def _delete_rows(model, shard, batch_size, user_id=None, ids=None):
+    """
+    Deletes the rows of `model` of a user, or those with the given `ids`, in
+    batches of `batch_size` rows per transaction.
+    """
+    rows = model.objects.using(shard)
+    if ids is None:
+        while True:
+            batch = list(
+                rows.filter(user_id=user_id).values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                return
+            with transaction.atomic(using=shard):
+                rows.filter(id__in=batch).delete()
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic(using=shard):
+            rows.filter(id__in=ids[start : start + batch_size]).delete()
+
+
+def move_user(user_id, target, batch_size=None):
+    """
+    Moves a user's rows to the `target` shard, in batches of `batch_size`
+    rows per transaction.
+
+    The user is flagged as moving first, `assign_shard` then rejects their
+    new bonds. Once processes caching the user's shard saw the flag (after
+    `BONDS_SHARD_CACHE_TIMEOUT` seconds), rows are copied to `target`, the
+    directory is switched to it, and the copied rows are deleted from the
+    previous shard once processes saw the switch. The flag is then cleared.
+
+    The move isn't atomic across databases. An interrupted move leaves the
+    user flagged, running it again first deletes the rows left on shards
+    other than the user's shard before copying them again.
+
+    Bonds keep their ids, see `allocate_bond_id`. Other rows get new ids
+    from the range of `target`: ids of rows from another range would make the
+    next ids of `target` collide with that range (on SQLite), and changes and
+    history entries logged after the move have to sort after the copied ones.
+
+    Returns the number of rows moved per model.
+    """
+    if target not in settings.BONDS_SHARDS:
+        raise ValueError(f"Unknown shard {target}")
+    batch_size = batch_size or settings.BONDS_SHARD_MOVE_BATCH_SIZE
+    cache.delete(_shard_cache_key(user_id))
+    source, _, moving = _lookup_shard(user_id)
+    if source == target and not moving:
+        return {}
+    set_shard(user_id, source, moving=True)
+    time.sleep(settings.BONDS_SHARD_CACHE_TIMEOUT)
+    # rows copied by an interrupted move
+    for shard in settings.BONDS_SHARDS:
+        if shard != source:
+            for model in reversed(SHARDED_MODELS):
+                _delete_rows(model, shard, batch_size, user_id=user_id)
+    moved = {}
+    if source != target:
+        snapshot_history_ids = set(
+            PortfolioSnapshot.objects.using(source)
+            .filter(user_id=user_id)
+            .values_list("last_history_id", flat=True)
+        )
+        history_ids = {0: 0}
+
+        def renumber_history(entry, previous_id):
+            if previous_id in snapshot_history_ids:
+                history_ids[previous_id] = entry.id
+
+        def renumber_snapshot(snapshot, previous_id):
+            snapshot.last_history_id = history_ids[snapshot.last_history_id]
+
+        renumber = {
+            Bond: None,
+            ArchivedBond: lambda row, previous_id: None,
+            BondChange: lambda row, previous_id: None,
+            LegalNameToken: lambda row, previous_id: None,
+            BondHistory: renumber_history,
+            PortfolioSnapshot: renumber_snapshot,
+        }
+        copied = {
+            model: _copy_rows(
+                model, user_id, source, target, batch_size, renumber[model]
+            )
+            for model in SHARDED_MODELS
+        }
+        set_shard(user_id, target, moving=True)
+        bonds_cache.invalidate_user(user_id)
+        time.sleep(settings.BONDS_SHARD_CACHE_TIMEOUT)
+        for model in reversed(SHARDED_MODELS):
+            _delete_rows(model, source, batch_size, ids=copied[model])
+        moved = {model._meta.object_name: len(ids) for model, ids in copied.items()}
+    set_shard(user_id, target)
+    return moved
+
+
+def shard_loads():
+    """Returns the number of bonds per user, per shard."""
+    return {
+        alias: Counter(
+            dict(
+                Bond.objects.using(alias)
+                .values("user_id")
+                .annotate(count=Count("id"))
+                .values_list("user_id", "count")
+            )
+        )
+        for alias in settings.BONDS_SHARDS
+    }
+
+
+def plan_rebalance(loads):
+    """
+    Returns `(user id, source, target)` moves evening out the number of bonds
+    per shard, given the result of `shard_loads`.
+
+    Each move takes a user from the most to the least loaded shard, picking
+    the user whose bonds count is the closest to half of the difference.
+    """
+    loads = {alias: Counter(users) for alias, users in loads.items()}
+    totals = {alias: sum(users.values()) for alias, users in loads.items()}
+    moves = []
+    while True:
+        source = max(totals, key=totals.get)
+        target = min(totals, key=totals.get)
+        gap = totals[source] - totals[target]
+        # moving fewer bonds than the gap makes shards more even
+        candidates = [
+            (user_id, count)
+            for user_id, count in loads[source].items()
+            if 0 < count < gap
+        ]
+        if not candidates:
+            return moves
+        user_id, count = min(candidates, key=lambda item: abs(gap - 2 * item[1]))
+        del loads[source][user_id]
+        loads[target][user_id] = count
+        totals[source] -= count
+        totals[target] += count
+        moves.append((user_id, source, target))
+
+
+class ShardRouter:
+    """
+    Routes sharded models to the shard of the user they belong to, and
+    everything else to the default database.
+
+    Querysets are routed with `UserQuerySet.for_user`, rows being saved by
+    the `user_id` they hold.
+    """
+
+    def _db(self, model, instance=None, **hints):
+        if model._meta.label_lower not in SHARDED_MODEL_NAMES:
+            return "default"
+        if instance is None:
+            return None
+        # bonds get the user they are created for assigned before being saved
+        if isinstance(instance, get_user_model()):
+            return get_shard(instance.pk)
+        if instance._state.db:
+            return instance._state.db
+        user_id = getattr(instance, "user_id", None)
+        return get_shard(user_id) if user_id is not None else None
+
+    db_for_read = _db
+    db_for_write = _db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = [obj._meta.label_lower in SHARDED_MODEL_NAMES for obj in (obj1, obj2)]
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        # sharded rows reference users on the default database
+        return True if any(sharded) else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == "default":
+            return None
+        label = f"{app_label}.{model_name}"
+        return label in SHARDED_MODEL_NAMES or label in REPLICATED_MODEL_NAMES
@@ -0,0 +1,246 @@
+"""
+Telemetry of gleif.org LEI lookups.
+
+Every request to gleif.org records its outcome (one of the `LEI_LOOKUP_*`
+outcomes of `origin.constants`) and its duration in a histogram with
+`settings.LEI_LOOKUP_DURATION_BUCKETS` buckets, and every `get_legal_name`
+call is counted per endpoint (`EndpointMiddleware`). Data is kept in
+`bonds.metrics` counters, shared by the processes using the same metrics
+cache backend, and read by `get_report`:
+
+- `GET /metrics/` exports it in the Prometheus text format, or as JSON.
+- the `lei_lookup_report` management command prints a summary.
+
+Each request is also logged on the `bonds.telemetry` logger at INFO level,
+with the lookup details as `extra` attributes for structured log handlers.
+"""
+
+import contextvars
+import json
+import logging
+import math
+
+from django.conf import settings
+
+from bonds import metrics
+from origin import constants
+
+logger = logging.getLogger(__name__)
+
+LEI_LOOKUPS = "lei_lookups"
+LEI_LOOKUPS_COALESCED = "lei_lookups_coalesced"
+LEI_LOOKUP_OUTCOME_F = "lei_lookup_outcome:{outcome}"
+LEI_LOOKUP_DURATION_BUCKET_F = "lei_lookup_duration_ms:le:{bound}"
+LEI_LOOKUP_DURATION_SUM = "lei_lookup_duration_us:sum"
+LEI_LOOKUP_CALLS_F = "lei_lookup_calls:{endpoint}"
+
+LEI_LOOKUP_OUTCOMES = [
+    constants.LEI_LOOKUP_OK,
+    constants.LEI_LOOKUP_UNREACHABLE,
+    constants.LEI_LOOKUP_TIMEOUT,
+    constants.LEI_LOOKUP_SERVER_ERROR,
+    constants.LEI_LOOKUP_INVALID_JSON_RESPONSE,
+    constants.LEI_LOOKUP_NO_MATCH,
+    constants.LEI_LOOKUP_MULTIPLE_MATCHES,
+    constants.LEI_LOOKUP_NO_LEGAL_NAME,
+    constants.LEI_LOOKUP_FAILED,
+]
+
+# lookups outside of requests, from management commands
+BACKGROUND = "background"
+
+# endpoints having made lookups, so their counters can be listed, kept with
+# the counters
+ENDPOINTS_KEY = "bonds:telemetry:endpoints"
+
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class EndpointMiddleware:
+    """Makes the request being handled known to lookups it triggers."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+
+def current_endpoint():
+    """Returns the method and URL name of the request being handled."""
+    request = _current_request.get()
+    if request is None:
+        return BACKGROUND
+    match = request.resolver_match
+    return f"{request.method} {match.view_name if match else request.path_info}"
+
+
+def _bounds():
+    return [str(bound) for bound in settings.LEI_LOOKUP_DURATION_BUCKETS] + ["inf"]
+
+
+def _calls_key(endpoint):
+    # cache keys can't hold spaces with memcached
+    return LEI_LOOKUP_CALLS_F.format(endpoint=endpoint.replace(" ", ":"))
+
+
+def _register_endpoint(endpoint):
+    cache = metrics.get_cache()
+    endpoints = cache.get(ENDPOINTS_KEY, ())
+    if endpoint not in endpoints:
+        # concurrent first lookups of two endpoints may drop one of them, it
+        # is registered again by its next lookup
+        cache.set(ENDPOINTS_KEY, sorted(set(endpoints) | {endpoint}), timeout=None)
+
+
+def record_call():
+    """Counts a legal name lookup, coalesced or not, for the current endpoint."""
+    endpoint = current_endpoint()
+    _register_endpoint(endpoint)
+    metrics.increment(_calls_key(endpoint))
+
+
+def record_lookup(lei, outcome, duration):
+    """Records a gleif.org request taking `duration` seconds."""
+    duration_ms = duration * 1000
+    bound = next(
+        (
+            str(bound)
+            for bound in settings.LEI_LOOKUP_DURATION_BUCKETS
+            if duration_ms <= bound
+        ),
+        "inf",
+    )
+    metrics.increment(LEI_LOOKUP_OUTCOME_F.format(outcome=outcome))
+    metrics.increment(LEI_LOOKUP_DURATION_BUCKET_F.format(bound=bound))
+    metrics.increment(LEI_LOOKUP_DURATION_SUM, round(duration * 1000000))
+    endpoint = current_endpoint()
+    logger.info(
+        "LEI lookup %s: %s in %.1f ms (%s)",
+        lei,
+        outcome,
+        duration_ms,
+        endpoint,
+        extra={
+            "lei": lei,
+            "outcome": outcome,
+            "duration_ms": duration_ms,
+            "endpoint": endpoint,
+        },
+    )
+
+
+def estimate_percentile(buckets, percentile):
+    """
+    Estimates a percentile of a histogram from its cumulative `buckets`, a
+    list of `(upper_bound, count)`, interpolating within the bucket.
+
+    Values in the last (infinite) bucket are reported as its lower bound.
+    """
+    total = buckets[-1][1] if buckets else 0
+    if not total:
+        return None
+    rank = total * percentile / 100
+    lower_bound, lower_count = 0, 0
+    for bound, count in buckets:
+        if count >= rank:
+            if math.isinf(bound):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (
+                count - lower_count
+            )
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+def get_report():
+    """Returns the recorded LEI lookups telemetry."""
+    buckets = []
+    count = 0
+    for bound in _bounds():
+        count += metrics.get_count(LEI_LOOKUP_DURATION_BUCKET_F.format(bound=bound))
+        buckets.append((float(bound), count))
+    duration_sum = metrics.get_count(LEI_LOOKUP_DURATION_SUM) / 1000
+    return {
+        "lookups": metrics.get_count(LEI_LOOKUPS),
+        "coalesced": metrics.get_count(LEI_LOOKUPS_COALESCED),
+        "outcomes": {
+            outcome: metrics.get_count(LEI_LOOKUP_OUTCOME_F.format(outcome=outcome))
+            for outcome in LEI_LOOKUP_OUTCOMES
+        },
+        "duration_ms": {
+            # cumulative counts, JSON has no infinity
+            "buckets": [
+                ["+Inf" if math.isinf(bound) else bound, count]
+                for bound, count in buckets
+            ],
+            "count": count,
+            "sum": round(duration_sum, 3),
+            "mean": round(duration_sum / count, 3) if count else None,
+            "p50": estimate_percentile(buckets, 50),
+            "p90": estimate_percentile(buckets, 90),
+            "p99": estimate_percentile(buckets, 99),
+        },
+        "calls_by_endpoint": {
+            endpoint: metrics.get_count(_calls_key(endpoint))
+            for endpoint in metrics.get_cache().get(ENDPOINTS_KEY, ())
+        },
+    }
+
+
+def reset():
+    """Clears the recorded LEI lookups telemetry."""
+    cache = metrics.get_cache()
+    metrics.reset(
+        LEI_LOOKUPS,
+        LEI_LOOKUPS_COALESCED,
+        LEI_LOOKUP_DURATION_SUM,
+        *(LEI_LOOKUP_OUTCOME_F.format(outcome=o) for o in LEI_LOOKUP_OUTCOMES),
+        *(LEI_LOOKUP_DURATION_BUCKET_F.format(bound=b) for b in _bounds()),
+        *(_calls_key(endpoint) for endpoint in cache.get(ENDPOINTS_KEY, ())),
+    )
+    cache.delete(ENDPOINTS_KEY)
+
+
+def _label(value):
+    return json.dumps(str(value))
+
+
+def to_prometheus(report):
+    """Formats a `get_report` report in the Prometheus text format."""
+    lines = [
+        "# HELP bonds_lei_lookups_total gleif.org requests by outcome",
+        "# TYPE bonds_lei_lookups_total counter",
+    ]
+    for outcome, count in report["outcomes"].items():
+        lines.append(f"bonds_lei_lookups_total{{outcome={_label(outcome)}}} {count}")
+    lines += [
+        "# HELP bonds_lei_lookups_coalesced_total lookups served by another one",
+        "# TYPE bonds_lei_lookups_coalesced_total counter",
+        f"bonds_lei_lookups_coalesced_total {report['coalesced']}",
+        "# HELP bonds_lei_lookup_duration_seconds gleif.org requests duration",
+        "# TYPE bonds_lei_lookup_duration_seconds histogram",
+    ]
+    duration = report["duration_ms"]
+    for bound, count in duration["buckets"]:
+        le = bound if bound == "+Inf" else f"{bound / 1000:g}"
+        lines.append(
+            f"bonds_lei_lookup_duration_seconds_bucket{{le={_label(le)}}} {count}"
+        )
+    lines += [
+        f"bonds_lei_lookup_duration_seconds_sum {duration['sum'] / 1000:g}",
+        f"bonds_lei_lookup_duration_seconds_count {duration['count']}",
+        "# HELP bonds_lei_lookup_calls_total legal name lookups by endpoint",
+        "# TYPE bonds_lei_lookup_calls_total counter",
+    ]
+    for endpoint, count in report["calls_by_endpoint"].items():
+        lines.append(
+            f"bonds_lei_lookup_calls_total{{endpoint={_label(endpoint)}}} {count}"
+        )
+    return "\n".join(lines) + "\n"
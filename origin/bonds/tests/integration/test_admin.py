@@ -0,0 +1,321 @@
+import io
+import json
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+
+from origin.admin import EstimatedCountPaginator, estimate_count
+from origin.testing import QueryBudgetMixin
+from bonds import jobs
+from bonds.models import ArchivedBond, Bond, BondChange, BondHistory, BondJob
+from bonds.services import LEILookupError
+from bonds.tests.utilities import CacheMixin, create_bond
+
+SHARDS = ["default", "shard_1"]
+
+
+class TestBondAdmin(QueryBudgetMixin, CacheMixin, TestCase):
+    databases = set(SHARDS)
+    query_budgets = {
+        # session, user, row count statistics, bonds count, bonds with their users
+        "GET /admin/bonds/bond/": 5,
+        # session, user, job, savepoints
+        "POST /admin/bonds/bond/": 7,
+    }
+
+    def setUp(self):
+        super().setUp()
+        User = get_user_model()
+        self.admin = User.objects.create_superuser("admin", "admin@test.com", "pw")
+        self.client.force_login(self.admin)
+        self.users = [User.objects.create_user(username=f"rob{i}") for i in range(5)]
+
+    def test_changelist(self):
+        for user in self.users:
+            create_bond(user)
+            create_bond(user, isin="US0378331005")
+
+        response = self.client.get("/admin/bonds/bond/")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context["cl"].result_count, 10)
+        # filtered lists don't count all rows
+        self.assertIsNone(response.context["cl"].full_result_count)
+
+    def test_search(self):
+        create_bond(self.users[0])
+        create_bond(self.users[1], isin="US0378331005")
+
+        response = self.client.get("/admin/bonds/bond/?q=US0378331005")
+        self.assertEquals(response.context["cl"].result_count, 1)
+
+        response = self.client.get("/admin/bonds/bond/?q=rob0")
+        self.assertEquals(
+            [bond.user for bond in response.context["cl"].result_list],
+            [self.users[0]],
+        )
+
+        # not a substring search, which would scan the table
+        response = self.client.get("/admin/bonds/bond/?q=0378")
+        self.assertEquals(response.context["cl"].result_count, 0)
+
+    def test_actions_start_jobs(self):
+        bonds = [create_bond(user) for user in self.users]
+
+        response = self.client.post(
+            "/admin/bonds/bond/",
+            {"action": "archive", "_selected_action": [bond.pk for bond in bonds]},
+        )
+
+        self.assertEquals(response.status_code, 302)
+        job = BondJob.objects.get()
+        self.assertEquals(job.action, BondJob.ARCHIVE)
+        self.assertEquals(job.status, BondJob.PENDING)
+        self.assertEquals(
+            json.loads(job.selection), {"ids": [bond.pk for bond in bonds]}
+        )
+        # bonds are counted when the job starts
+        self.assertIsNone(job.total)
+        self.assertEquals(job.created_by, self.admin)
+        # nothing is archived until the job runs
+        self.assertEquals(Bond.objects.count(), 5)
+
+        jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEquals((job.total, job.processed), (5, 5))
+        self.assertFalse(Bond.objects.exists())
+
+    @override_settings(BONDS_SHARDS=SHARDS)
+    def test_actions_run_on_every_shard(self):
+        create_bond(self.users[0])
+        create_bond(self.users[0], using="shard_1")
+        create_bond(self.users[1], using="shard_1")
+
+        self.client.post(
+            "/admin/bonds/bond/?q=rob0",
+            {"action": "archive", "select_across": "1", "_selected_action": ["0"]},
+        )
+        jobs.run_pending_jobs()
+
+        job = BondJob.objects.get()
+        # users are looked up by the admin, shards have no users table
+        self.assertEquals(
+            json.loads(job.selection),
+            {
+                "filters": {},
+                "search": [["isin", "rob0"], ["user_id__in", [self.users[0].pk]]],
+            },
+        )
+        self.assertEquals(job.processed, 2)
+        self.assertFalse(Bond.objects.exists())
+        self.assertEquals(
+            list(Bond.objects.using("shard_1").values_list("user", flat=True)),
+            [self.users[1].pk],
+        )
+
+    @override_settings(BONDS_SHARDS=SHARDS)
+    def test_actions_apply_filters(self):
+        create_bond(self.users[0], maturity=date(2020, 1, 1))
+        create_bond(self.users[0], using="shard_1", maturity=date(2020, 6, 1))
+        create_bond(self.users[1], using="shard_1", maturity=date(2030, 1, 1))
+
+        self.client.post(
+            "/admin/bonds/bond/?maturity__lt=2021-01-01&p=2&o=1",
+            {"action": "archive", "select_across": "1", "_selected_action": ["0"]},
+        )
+        jobs.run_pending_jobs()
+
+        self.assertEquals(
+            json.loads(BondJob.objects.get().selection),
+            {"filters": {"maturity__lt": "2021-01-01"}, "search": []},
+        )
+        self.assertEquals(ArchivedBond.objects.using("default").count(), 1)
+        self.assertEquals(
+            list(Bond.objects.using("shard_1").values_list("user", flat=True)),
+            [self.users[1].pk],
+        )
+
+    @override_settings(BONDS_SHARDS=SHARDS)
+    def test_changelist_tells_other_shards_are_not_listed(self):
+        response = self.client.get("/admin/bonds/bond/")
+
+        self.assertIn(
+            "Only the rows of the default database are listed",
+            [str(message) for message in response.context["messages"]][0],
+        )
+
+
+class TestBondAdminDeletion(CacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin", "admin@test.com", "pw"
+        )
+        self.client.force_login(self.admin)
+
+    def test_delete_logs_removal(self):
+        bond = create_bond(self.admin)
+
+        response = self.client.post(
+            f"/admin/bonds/bond/{bond.pk}/delete/", {"post": "yes"}
+        )
+
+        self.assertEquals(response.status_code, 302)
+        self.assertEquals(
+            list(bond.changes.values_list("action", flat=True)),
+            [BondChange.CREATED, BondChange.REMOVED],
+        )
+        self.assertEquals(BondHistory.objects.latest("id").action, BondHistory.REMOVED)
+
+
+class TestEstimatedCount(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username="rob")
+        for _ in range(3):
+            create_bond(user)
+
+    def test_no_statistics(self):
+        self.assertIsNone(estimate_count(Bond, "default"))
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=2)
+    def test_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        create_bond(get_user_model().objects.get())
+
+        self.assertEquals(estimate_count(Bond, "default"), 3)
+        self.assertEquals(
+            EstimatedCountPaginator(Bond.objects.order_by("id"), 10).count, 3
+        )
+        # filtered lists are counted
+        self.assertEquals(
+            EstimatedCountPaginator(
+                Bond.objects.filter(size=100).order_by("id"), 10
+            ).count,
+            4,
+        )
+
+    def test_small_tables_counted(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        create_bond(get_user_model().objects.get())
+
+        self.assertEquals(
+            EstimatedCountPaginator(Bond.objects.order_by("id"), 10).count, 4
+        )
+
+
+class TestBondJobs(CacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="rob")
+
+    @mock.patch("bonds.jobs.get_legal_name")
+    def test_resolve_legal_names(self, lei_lookup_mock):
+        lei_lookup_mock.side_effect = lambda lei: {
+            "R0MUWSFPU8MPRO8K5P83": "BNP PARIBAS SA",
+            "HWUPKR0MPOU8FGXBT394": "APPLE INC.",
+        }[lei]
+        bonds = [create_bond(self.user) for _ in range(3)]
+        bonds.append(create_bond(self.user, lei="HWUPKR0MPOU8FGXBT394"))
+        job = jobs.enqueue(
+            BondJob.RESOLVE_LEGAL_NAMES,
+            {"ids": [bond.pk for bond in bonds]},
+        )
+
+        self.assertEquals(jobs.run_pending_jobs(batch_size=2), 1)
+
+        job.refresh_from_db()
+        self.assertEquals(job.status, BondJob.DONE)
+        self.assertEquals((job.processed, job.failed), (4, 0))
+        self.assertIsNotNone(job.finished_at)
+        # each LEI of a batch is looked up once
+        self.assertEquals(lei_lookup_mock.call_count, 3)
+        self.assertEquals(
+            sorted(Bond.objects.values_list("legal_name", flat=True)),
+            ["APPLE INC.", "BNP PARIBAS SA", "BNP PARIBAS SA", "BNP PARIBAS SA"],
+        )
+        # legal names are indexed again
+        self.assertEquals(
+            Bond.objects.for_user(self.user)
+            .filter(legal_name_tokens__token="sa")
+            .count(),
+            3,
+        )
+
+    def test_resolve_legal_names_outside_transactions(self):
+        job = jobs.enqueue(
+            BondJob.RESOLVE_LEGAL_NAMES,
+            {"ids": [create_bond(self.user).pk]},
+        )
+        events = []
+        atomic = transaction.atomic
+
+        def lookup(lei):
+            events.append("lookup")
+            return "BNP PARIBAS SA"
+
+        def record_atomic(*args, **kwargs):
+            events.append("atomic")
+            return atomic(*args, **kwargs)
+
+        with mock.patch("bonds.jobs.get_legal_name", side_effect=lookup):
+            with mock.patch.object(transaction, "atomic", record_atomic):
+                jobs.run_job(job)
+
+        self.assertEquals(events[:2], ["lookup", "atomic"])
+        self.assertEquals(Bond.objects.get().legal_name, "BNP PARIBAS SA")
+
+    @mock.patch("bonds.jobs.get_legal_name", side_effect=LEILookupError("Down"))
+    def test_resolve_legal_names_lookup_errors(self, lei_lookup_mock):
+        bond = create_bond(self.user)
+        job = jobs.enqueue(BondJob.RESOLVE_LEGAL_NAMES, {"ids": [bond.pk]})
+
+        jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEquals(job.status, BondJob.DONE)
+        self.assertEquals((job.processed, job.failed), (1, 1))
+        self.assertEquals(Bond.objects.get().legal_name, "BNP PARIBAS")
+
+    def test_archive(self):
+        bonds = [create_bond(self.user) for _ in range(3)]
+        job = jobs.enqueue(BondJob.ARCHIVE, {"ids": [bond.pk for bond in bonds[:2]]})
+
+        jobs.run_pending_jobs(batch_size=1)
+
+        job.refresh_from_db()
+        self.assertEquals(job.processed, 2)
+        self.assertEquals(list(Bond.objects.all()), bonds[2:])
+        self.assertEquals(ArchivedBond.objects.count(), 2)
+
+    @mock.patch("bonds.jobs.archive_bonds", side_effect=ValueError("Broken"))
+    def test_failed_job(self, archive_mock):
+        job = jobs.enqueue(BondJob.ARCHIVE, {"ids": [create_bond(self.user).pk]})
+
+        jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEquals(job.status, BondJob.FAILED)
+        self.assertEquals(job.error, "Broken")
+
+    def test_jobs_run_once(self):
+        job = jobs.enqueue(BondJob.ARCHIVE, {"ids": [create_bond(self.user).pk]})
+        self.assertTrue(jobs.claim(job))
+
+        self.assertFalse(jobs.claim(job))
+        self.assertEquals(jobs.run_pending_jobs(), 0)
+
+    def test_run_bond_jobs_command(self):
+        jobs.enqueue(BondJob.ARCHIVE, {"ids": [create_bond(self.user).pk]})
+        out = io.StringIO()
+
+        call_command("run_bond_jobs", stdout=out)
+
+        self.assertIn("Ran 1 jobs.", out.getvalue())
+        self.assertEquals(BondJob.objects.get().status, BondJob.DONE)
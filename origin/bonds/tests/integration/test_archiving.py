@@ -0,0 +1,135 @@
+import io
+from datetime import date
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds import archiving
+from bonds.archiving import archive_matured_bonds
+from bonds.models import ArchivedBond, Bond
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+class TestArchiving(CacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="rob")
+
+    def test_archive_matured_bonds(self):
+        create_bond(self.user, maturity=date(2020, 1, 1))
+        create_bond(self.user, maturity=date(2020, 6, 14))
+        live = create_bond(self.user, maturity=date(2020, 6, 15))
+
+        count = archive_matured_bonds(before=date(2020, 6, 15))
+
+        self.assertEquals(count, 2)
+        self.assertEquals(list(Bond.objects.all()), [live])
+        self.assertEquals(
+            list(ArchivedBond.objects.values_list("maturity", "legal_name", "user")),
+            [
+                (date(2020, 1, 1), "BNP PARIBAS", self.user.pk),
+                (date(2020, 6, 14), "BNP PARIBAS", self.user.pk),
+            ],
+        )
+
+    def test_archive_in_batches(self):
+        for day in range(1, 6):
+            create_bond(self.user, maturity=date(2020, 1, day))
+
+        with mock.patch(
+            "bonds.archiving.archive_bonds", wraps=archiving.archive_bonds
+        ) as archive_mock:
+            count = archive_matured_bonds(before=date(2021, 1, 1), batch_size=2)
+
+        self.assertEquals(count, 5)
+        self.assertEquals(archive_mock.call_count, 3)
+        self.assertFalse(Bond.objects.exists())
+
+    def test_archive_command(self):
+        create_bond(self.user, maturity=date(2020, 1, 1))
+        out = io.StringIO()
+
+        call_command("archive_matured_bonds", "--before", "2021-01-01", stdout=out)
+
+        self.assertEquals(ArchivedBond.objects.count(), 1)
+        self.assertIn("Archived 1 bonds.", out.getvalue())
+
+    def test_archive_command_invalid_date(self):
+        with self.assertRaises(CommandError):
+            call_command("archive_matured_bonds", "--before", "01/01/2021")
+
+
+class TestListArchivedBonds(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def setUp(self):
+        super().setUp()
+        create_bond(self.user, maturity=date(2020, 1, 1), legal_name="MATURED")
+        create_bond(self.user, maturity=date(2030, 1, 1), legal_name="LIVE")
+
+    def test_list_excludes_archived(self):
+        self.client.get("/bonds/")
+        archive_matured_bonds(before=date(2021, 1, 1))
+
+        response = self.client.get("/bonds/")
+
+        self.assertEquals([bond["legal_name"] for bond in response.json()], ["LIVE"])
+
+    def test_list_include_archived(self):
+        archive_matured_bonds(before=date(2021, 1, 1))
+
+        response = self.client.get("/bonds/?include_archived=1")
+
+        self.assertEquals(
+            response.json(),
+            [
+                {
+                    "isin": "FR0000131104",
+                    "size": 100,
+                    "currency": "EUR",
+                    "maturity": maturity,
+                    "lei": "R0MUWSFPU8MPRO8K5P83",
+                    "legal_name": legal_name,
+                }
+                for maturity, legal_name in [
+                    ("2030-01-01", "LIVE"),
+                    ("2020-01-01", "MATURED"),
+                ]
+            ],
+        )
+
+    def test_list_include_archived_ordered(self):
+        create_bond(self.user, maturity=date(2010, 1, 1), legal_name="OLDEST")
+        create_bond(self.user, maturity=date(2040, 1, 1), legal_name="LATEST")
+        archive_matured_bonds(before=date(2021, 1, 1))
+
+        response = self.client.get("/bonds/?include_archived=1&ordering=-maturity")
+
+        self.assertEquals(
+            [bond["legal_name"] for bond in response.json()],
+            ["LATEST", "LIVE", "MATURED", "OLDEST"],
+        )
+
+    def test_list_include_archived_filtered(self):
+        archive_matured_bonds(before=date(2021, 1, 1))
+
+        response = self.client.get("/bonds/?include_archived=1&legal_name=MATURED")
+
+        self.assertEquals([bond["legal_name"] for bond in response.json()], ["MATURED"])
+
+    def test_list_include_archived_search_unsupported(self):
+        response = self.client.get("/bonds/?include_archived=1&search=live")
+
+        self.assertEquals(response.status_code, 400)
+        self.assertTrue("search" in response.json())
@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    create_bond,
+)
+
+
+class TestBatchLookup(QueryBudgetMixin, AuthenticatedClientMixin, APITestCase):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def setUp(self):
+        super().setUp()
+        self.bond_fr = create_bond(self.user, isin="FR0000131104", size=1)
+        self.bond_us = create_bond(self.user, isin="US0378331005", size=2)
+
+    def test_batch_by_ids(self):
+        response = self.client.post(
+            "/bonds/batch/",
+            {"ids": [self.bond_us.pk, 999, self.bond_fr.pk]},
+            format="json",
+        )
+        results = response.json()["results"]
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            [(result["id"], result["found"]) for result in results],
+            [(self.bond_us.pk, True), (999, False), (self.bond_fr.pk, True)],
+        )
+        self.assertEquals(results[0]["bond"]["size"], 2)
+        self.assertIsNone(results[1]["bond"])
+
+    def test_batch_by_isins(self):
+        duplicate = create_bond(self.user, isin="FR0000131104", size=3)
+
+        response = self.client.post(
+            "/bonds/batch/",
+            {"isins": ["GB0002634946", "FR0000131104"]},
+            format="json",
+        )
+
+        self.assertEquals(
+            response.json()["results"],
+            [
+                {"isin": "GB0002634946", "found": False, "bonds": []},
+                {
+                    "isin": "FR0000131104",
+                    "found": True,
+                    "bonds": [
+                        {
+                            "isin": "FR0000131104",
+                            "size": size,
+                            "currency": "EUR",
+                            "maturity": "2025-03-27",
+                            "lei": "R0MUWSFPU8MPRO8K5P83",
+                            "legal_name": "BNP PARIBAS",
+                        }
+                        for size in (1, 3)
+                    ],
+                },
+            ],
+        )
+
+    def test_batch_only_user_entries(self):
+        user2 = get_user_model().objects.create_user(username="pat")
+        other = create_bond(user2, isin="FR0000131104")
+
+        response = self.client.post("/bonds/batch/", {"ids": [other.pk]}, format="json")
+
+        self.assertEquals(response.json()["results"][0]["found"], False)
+
+    def test_batch_requires_ids_or_isins(self):
+        for data in [{}, {"ids": [1], "isins": ["FR0000131104"]}]:
+            response = self.client.post("/bonds/batch/", data, format="json")
+            self.assertEquals(response.status_code, 400)
+            self.assertEquals(
+                response.json(),
+                {"non_field_errors": ["Either ids or isins is required."]},
+            )
+
+    def test_batch_many_ids_single_query(self):
+        ids = list(range(1, 3001))
+
+        response = self.client.post("/bonds/batch/", {"ids": ids}, format="json")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(response.json()["results"]), 3000)
+
+    def test_batch_too_many_ids(self):
+        response = self.client.post(
+            "/bonds/batch/", {"ids": list(range(1, 5002))}, format="json"
+        )
+
+        self.assertEquals(response.status_code, 400)
+        self.assertTrue("ids" in response.json())
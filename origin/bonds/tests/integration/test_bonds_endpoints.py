@@ -1,6 +1,8 @@
 from unittest import mock
 
-from django.test import TestCase
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 
 from rest_framework.authtoken.models import Token
@@ -8,14 +10,25 @@ from rest_framework.test import APITestCase
 
 
 from origin import constants
+from origin.testing import QueryBudgetMixin
+from bonds.models import Bond
 from bonds.serializers import BondSerializer
 from bonds.services import LEILookupError
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
 
 
-class TestAuthToken(APITestCase):
+class TestAuthToken(QueryBudgetMixin, CacheMixin, APITestCase):
     """Ensures api tokens can be passed via headers as well as query parameters"""
 
+    query_budgets = BONDS_QUERY_BUDGETS
+
     def setUp(self):
+        super().setUp()
         self.user = get_user_model().objects.create_user(username="rob")
 
     def tearDown(self):
@@ -42,24 +55,24 @@ class TestAuthToken(APITestCase):
         self.assertEquals(response.status_code, 401)
 
 
-class TestCreateBonds(APITestCase):
+class TestCreateBonds(QueryBudgetMixin, AuthenticatedClientMixin, APITestCase):
+    query_budgets = BONDS_QUERY_BUDGETS
+
     def setUp(self):
+        super().setUp()
         self.bond_data = {
             "isin": "FR0000131104",
             "size": 100000000,
             "currency": "EUR",
             "maturity": "2025-03-27",
-            "lei": "R0M123",
+            "lei": "R0MUWSFPU8MPRO8K5P83",
         }
-        self.user = get_user_model().objects.create_user(username="rob")
-        token = Token.objects.get(user=self.user)
-        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
 
     def tearDown(self):
         self.user.delete()
         super().tearDown()
 
-    @mock.patch("bonds.models.get_legal_name")
+    @mock.patch("bonds.views.get_legal_name")
     def test_create_success(self, lei_lookup_mock):
         lei_lookup_mock.return_value = "BNP PARIBAS"
 
@@ -68,7 +81,7 @@ class TestCreateBonds(APITestCase):
         lei_lookup_mock.assert_called_once()
         self.assertEquals(response.status_code, 201)
 
-    @mock.patch("bonds.models.get_legal_name")
+    @mock.patch("bonds.views.get_legal_name")
     def test_lei_lookup_service_error(self, lei_lookup_mock):
         """Ensures error messages generated while using the LEI lookup service are shown to the end user"""
         lei_lookup_mock.side_effect = LEILookupError(constants.ERR_LEI_LOOKUP_NO_MATCH)
@@ -82,6 +95,25 @@ class TestCreateBonds(APITestCase):
             response.json()["lei_lookup_error"], constants.ERR_LEI_LOOKUP_NO_MATCH
         )
 
+    def test_lei_looked_up_outside_transaction(self):
+        events = []
+        atomic = transaction.atomic
+
+        def lookup(lei):
+            events.append("lookup")
+            return "BNP PARIBAS"
+
+        def record_atomic(*args, **kwargs):
+            events.append("atomic")
+            return atomic(*args, **kwargs)
+
+        with mock.patch("bonds.views.get_legal_name", side_effect=lookup):
+            with mock.patch.object(transaction, "atomic", record_atomic):
+                response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 201)
+        self.assertEquals(events[:2], ["lookup", "atomic"])
+
     def test_serializer_mandatory_fields(self):
         """Ensures missing mandatory fields are shown to the API user"""
         expected_mandatory_fields = set(["isin", "size", "currency", "maturity", "lei"])
@@ -108,25 +140,135 @@ class TestCreateBonds(APITestCase):
             ["Ensure this field has no more than 3 characters."],
         )
 
+    @mock.patch("bonds.views.get_legal_name")
+    def test_invalid_identifiers_not_looked_up(self, lei_lookup_mock):
+        """Ensures malformed ISIN and LEI are rejected before any LEI lookup"""
+        self.bond_data["isin"] = "FR0000131105"
+        self.bond_data["lei"] = "R0M123"
+
+        response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        lei_lookup_mock.assert_not_called()
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(
+            response.json(),
+            {
+                "isin": [constants.ERR_INVALID_ISIN],
+                "lei": [constants.ERR_INVALID_LEI],
+            },
+        )
+
+    @mock.patch("bonds.views.get_legal_name")
+    def test_duplicate_isin_allowed_by_default(self, lei_lookup_mock):
+        lei_lookup_mock.return_value = "BNP PARIBAS"
+
+        self.client.post("/bonds/", self.bond_data, format="json")
+        response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 201)
+        self.assertEquals(Bond.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(BONDS_UNIQUE_ISIN_PER_USER=True)
+    @mock.patch("bonds.views.get_legal_name")
+    def test_unique_isin_upsert(self, lei_lookup_mock):
+        """Ensures a known ISIN updates the user's bond when uniqueness is enabled"""
+        lei_lookup_mock.return_value = "BNP PARIBAS"
+        self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.bond_data["size"] = 5
+        response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.json()["size"], 5)
+        self.assertEquals(
+            list(Bond.objects.filter(user=self.user).values_list("size", flat=True)),
+            [5],
+        )
+
+    @override_settings(BONDS_UNIQUE_ISIN_PER_USER=True)
+    @mock.patch("bonds.views.get_legal_name")
+    def test_unique_isin_upsert_updates_latest_duplicate(self, lei_lookup_mock):
+        """Ensures ISINs held several times before upserts update one bond"""
+        lei_lookup_mock.return_value = "BNP PARIBAS"
+        create_bond(self.user)
+        latest = create_bond(self.user)
+
+        self.bond_data["size"] = 5
+        response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            list(Bond.objects.order_by("id").values_list("size", "unique_isin")),
+            [(100, False), (5, True)],
+        )
+        self.assertEquals(Bond.objects.get(unique_isin=True).pk, latest.pk)
+
+    @override_settings(BONDS_UNIQUE_ISIN_PER_USER=True)
+    @mock.patch("bonds.views.get_legal_name")
+    def test_unique_isin_concurrent_creation(self, lei_lookup_mock):
+        """Ensures a bond created by a concurrent request is updated"""
+        lei_lookup_mock.return_value = "BNP PARIBAS"
+        create_bond(self.user, unique_isin=True)
+        first = QuerySet.first
+        lookups = []
+
+        def first_missed_once(queryset):
+            # the concurrent request's bond isn't seen by the first lookup
+            lookups.append(queryset)
+            return None if len(lookups) == 1 else first(queryset)
+
+        self.bond_data["size"] = 5
+        # the rejected insert and its retry
+        self.query_budgets = {**BONDS_QUERY_BUDGETS, "POST /bonds/": 13}
+        with mock.patch.object(QuerySet, "first", first_missed_once):
+            response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(lookups), 2)
+        self.assertEquals(list(Bond.objects.values_list("size", flat=True)), [5])
+
+    def test_unique_isin_constraint(self):
+        create_bond(self.user, unique_isin=True)
+        create_bond(self.user)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_bond(self.user, unique_isin=True)
+
+    @override_settings(BONDS_UNIQUE_ISIN_PER_USER=True)
+    @mock.patch("bonds.views.get_legal_name")
+    def test_unique_isin_scoped_to_user(self, lei_lookup_mock):
+        lei_lookup_mock.return_value = "BNP PARIBAS"
+        user2 = get_user_model().objects.create_user(username="pat")
+        self.client.post("/bonds/", self.bond_data, format="json")
+
+        token2 = Token.objects.get(user=user2)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token2.key}")
+        response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 201)
+        self.assertEquals(Bond.objects.count(), 2)
+
+
+class TestListBonds(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
 
-class TestListBonds(APITestCase):
     def setUp(self):
+        super().setUp()
         self.bond_data = {
             "isin": "FR0000131104",
             "size": 100000000,
             "currency": "EUR",
             "maturity": "2025-03-27",
-            "lei": "R0M123",
+            "lei": "R0MUWSFPU8MPRO8K5P83",
         }
-        self.user = get_user_model().objects.create_user(username="rob")
-        token = Token.objects.get(user=self.user)
-        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
 
     def tearDown(self):
         self.user.delete()
         super().tearDown()
 
-    @mock.patch("bonds.models.get_legal_name")
+    @mock.patch("bonds.views.get_legal_name")
     def test_list_success(self, lei_lookup_mock):
         lei_lookup_mock.return_value = "BNP PARIBAS"
         self.client.post("/bonds/", self.bond_data, format="json")
@@ -143,12 +285,12 @@ class TestListBonds(APITestCase):
                     "currency": "EUR",
                     "isin": "FR0000131104",
                     "size": 100000000,
-                    "lei": "R0M123",
+                    "lei": "R0MUWSFPU8MPRO8K5P83",
                 }
             ],
         )
 
-    @mock.patch("bonds.models.get_legal_name")
+    @mock.patch("bonds.views.get_legal_name")
     def test_list_multiple(self, lei_lookup_mock):
         """Ensures all entries are listed if multiple are created"""
 
@@ -165,7 +307,7 @@ class TestListBonds(APITestCase):
         self.assertEquals(response_json[0]["legal_name"], "BNP PARIBAS")
         self.assertEquals(response_json[1]["legal_name"], "BNP PARIBAS 2")
 
-    @mock.patch("bonds.models.get_legal_name")
+    @mock.patch("bonds.views.get_legal_name")
     def test_list_filter_exact_legal_name(self, lei_lookup_mock):
         """Ensures `legal_name` query parameter is supported and returns strict exact matches only"""
         lei_lookup_mock.return_value = "BNP"
@@ -186,7 +328,7 @@ class TestListBonds(APITestCase):
         self.assertEquals(response.status_code, 200)
         self.assertEquals(len(response.json()), 1)
 
-    @mock.patch("bonds.models.get_legal_name")
+    @mock.patch("bonds.views.get_legal_name")
     def test_list_only_user_created_entries(self, lei_lookup_mock):
         """Ensures the list endpoint only shows Bonds created by the authenticated user"""
         lei_lookup_mock.return_value = "BNP PARIBAS"
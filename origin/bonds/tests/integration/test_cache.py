@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds import cache
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+class TestListCache(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def setUp(self):
+        super().setUp()
+        self.bond_data = {
+            "isin": "FR0000131104",
+            "size": 100000000,
+            "currency": "EUR",
+            "maturity": "2025-03-27",
+            "lei": "R0MUWSFPU8MPRO8K5P83",
+        }
+
+    def tearDown(self):
+        self.user.delete()
+        super().tearDown()
+
+    def test_list_served_from_cache(self):
+        """Ensures a repeated list call does not query the database"""
+        create_bond(self.user)
+        self.client.get("/bonds/")
+
+        with self.assertNumQueries(1):  # token authentication only
+            response = self.client.get("/bonds/")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(response.json()), 1)
+        self.assertEquals(cache.list_cache_stats()["hits"], 1)
+        self.assertEquals(cache.list_cache_stats()["misses"], 1)
+
+    @override_settings(
+        CACHES={
+            **settings.CACHES,
+            # the whole cache is culled once it holds 2 entries
+            "default": {
+                **settings.CACHES["default"],
+                "OPTIONS": {"MAX_ENTRIES": 2, "CULL_FREQUENCY": 1},
+            },
+        }
+    )
+    def test_stats_kept_when_lists_culled(self):
+        for currency in ["EUR", "USD", "JPY"]:
+            self.client.get(f"/bonds/?legal_name={currency}")
+
+        self.assertEquals(cache.list_cache_stats()["misses"], 3)
+
+    def test_cache_invalidated_on_save(self):
+        self.client.get("/bonds/")
+        create_bond(self.user)
+
+        response = self.client.get("/bonds/")
+
+        self.assertEquals(len(response.json()), 1)
+        self.assertEquals(cache.list_cache_stats()["hits"], 0)
+
+    def test_cache_invalidated_once_committed(self):
+        version = cache.get_user_version(self.user.pk)
+        with mock.patch("django.db.transaction.on_commit") as on_commit_mock:
+            create_bond(self.user)
+
+        # lists cached until the commit are from before the change
+        self.assertEquals(cache.get_user_version(self.user.pk), version)
+        on_commit_mock.call_args[0][0]()
+        self.assertNotEquals(cache.get_user_version(self.user.pk), version)
+
+    def test_cache_invalidated_on_delete(self):
+        bond = create_bond(self.user)
+        self.client.get("/bonds/")
+        bond.delete()
+
+        response = self.client.get("/bonds/")
+
+        self.assertEquals(response.json(), [])
+
+    def test_cache_keyed_by_filters(self):
+        create_bond(self.user, "BNP")
+        create_bond(self.user, "BNP2")
+        self.client.get("/bonds/")
+
+        response = self.client.get("/bonds/?legal_name=BNP")
+
+        self.assertEquals(len(response.json()), 1)
+        self.assertEquals(cache.list_cache_stats()["hits"], 0)
+
+    def test_cache_ignores_unknown_parameters(self):
+        self.client.get("/bonds/")
+        self.client.get("/bonds/?unknown=1")
+
+        self.assertEquals(cache.list_cache_stats()["hits"], 1)
+
+    def test_cache_scoped_to_user(self):
+        create_bond(self.user)
+        self.client.get("/bonds/")
+
+        user2 = get_user_model().objects.create_user(username="pat")
+        token2 = Token.objects.get(user=user2)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token2.key}")
+        response = self.client.get("/bonds/")
+
+        self.assertEquals(response.json(), [])
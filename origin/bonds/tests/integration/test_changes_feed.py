@@ -0,0 +1,150 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds.archiving import archive_matured_bonds
+from bonds.feed import get_changes
+from bonds.models import Bond, BondChange
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+class TestChangesFeed(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def tearDown(self):
+        self.user.delete()
+        super().tearDown()
+
+    def test_changes_logged_on_save(self):
+        bond = create_bond(self.user)
+        with mock.patch("bonds.models.get_legal_name", return_value="BNP"):
+            bond.save()
+
+        self.assertEquals(
+            list(BondChange.objects.values_list("action", flat=True)),
+            [BondChange.CREATED, BondChange.UPDATED],
+        )
+
+    def test_changes_since_cursor(self):
+        create_bond(self.user, "BNP")
+        response = self.client.get("/bonds/changes/")
+        cursor = response.json()["cursor"]
+        create_bond(self.user, "BNP2")
+
+        response = self.client.get(f"/bonds/changes/?cursor={cursor}")
+        response_json = response.json()
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(len(response_json["changes"]), 1)
+        self.assertEquals(response_json["changes"][0]["action"], "created")
+        self.assertEquals(response_json["changes"][0]["bond"]["legal_name"], "BNP2")
+        self.assertGreater(response_json["cursor"], cursor)
+
+    def test_no_changes_keeps_cursor(self):
+        create_bond(self.user)
+        cursor = self.client.get("/bonds/changes/").json()["cursor"]
+
+        response = self.client.get(f"/bonds/changes/?cursor={cursor}")
+
+        self.assertEquals(response.json(), {"cursor": cursor, "changes": []})
+
+    def test_bond_changed_twice_listed_once(self):
+        bond = create_bond(self.user)
+        with mock.patch("bonds.models.get_legal_name", return_value="BNP"):
+            bond.save()
+
+        changes = self.client.get("/bonds/changes/").json()["changes"]
+
+        self.assertEquals(len(changes), 1)
+        self.assertEquals(changes[0]["action"], "updated")
+        self.assertEquals(changes[0]["bond"]["legal_name"], "BNP")
+
+    def test_changes_only_user_entries(self):
+        user2 = get_user_model().objects.create_user(username="pat")
+        create_bond(user2)
+
+        response = self.client.get("/bonds/changes/")
+
+        self.assertEquals(response.json()["changes"], [])
+
+    def test_removed_bond_listed(self):
+        create_bond(self.user)
+        cursor = self.client.get("/bonds/changes/").json()["cursor"]
+        bond = Bond.objects.get()
+
+        archive_matured_bonds(before=date(2030, 1, 1))
+        response = self.client.get(f"/bonds/changes/?cursor={cursor}")
+
+        changes = response.json()["changes"]
+        self.assertEquals(
+            [
+                (change["bond_id"], change["action"], change["bond"])
+                for change in changes
+            ],
+            [(bond.pk, "removed", None)],
+        )
+        # entries outlive the bond
+        self.assertEquals(BondChange.objects.count(), 2)
+
+    @override_settings(BONDS_CHANGES_SETTLE_TIME=5)
+    def test_recent_changes_held_back(self):
+        create_bond(self.user, "BNP")
+        BondChange.objects.update(created_at=timezone.now() - timedelta(seconds=10))
+        create_bond(self.user, "BNP2")
+
+        response = self.client.get("/bonds/changes/")
+
+        # the second change could commit before one with a lower id
+        changes = response.json()["changes"]
+        self.assertEquals([change["bond"]["legal_name"] for change in changes], ["BNP"])
+        self.assertEquals(response.json()["cursor"], changes[0]["id"])
+
+    @override_settings(BONDS_CHANGES_PAGE_SIZE=1)
+    def test_changes_paginated_by_cursor(self):
+        create_bond(self.user, "BNP")
+        create_bond(self.user, "BNP2")
+
+        first = self.client.get("/bonds/changes/").json()
+        second = self.client.get(f"/bonds/changes/?cursor={first['cursor']}").json()
+
+        self.assertEquals(first["changes"][0]["bond"]["legal_name"], "BNP")
+        self.assertEquals(second["changes"][0]["bond"]["legal_name"], "BNP2")
+
+    @override_settings(BONDS_CHANGES_POLL_INTERVAL=0.01)
+    def test_wait_times_out_without_changes(self):
+        with mock.patch("bonds.feed.time.monotonic", side_effect=[0, 0, 0, 2, 2]):
+            response = self.client.get("/bonds/changes/?wait=1")
+
+        self.assertEquals(response.json(), {"cursor": 0, "changes": []})
+
+    def test_wait_sees_changes_of_other_processes(self):
+        def write(seconds):
+            self.assertEquals(seconds, settings.BONDS_CHANGES_POLL_INTERVAL)
+            # written by another process, whose cache this one doesn't share
+            with mock.patch("bonds.models.cache.invalidate_user"):
+                create_bond(self.user, "BNP")
+
+        with mock.patch("bonds.feed.time.sleep", side_effect=write):
+            changes, cursor = get_changes(self.user, 0, wait=5)
+
+        self.assertEquals([change.bond.legal_name for change in changes], ["BNP"])
+        self.assertEquals(cursor, changes[0].id)
+
+    def test_invalid_query_parameters(self):
+        response = self.client.get("/bonds/changes/?cursor=-1&wait=3600")
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(set(response.json().keys()), {"cursor", "wait"})
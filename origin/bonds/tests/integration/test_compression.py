@@ -0,0 +1,109 @@
+import gzip
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+@override_settings(API_COMPRESSION_MIN_SIZE=500)
+class TestListPayload(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def create_bonds(self, count):
+        for _ in range(count):
+            create_bond(self.user)
+
+    def test_large_list_gzipped(self):
+        self.create_bonds(20)
+
+        response = self.client.get("/bonds/", HTTP_ACCEPT_ENCODING="gzip, br")
+
+        self.assertEquals(response["Content-Encoding"], "gzip")
+        self.assertEquals(response["Vary"], "Accept, Accept-Encoding")
+        self.assertEquals(len(json.loads(gzip.decompress(response.content))), 20)
+
+    def test_small_list_not_compressed(self):
+        self.create_bonds(1)
+
+        response = self.client.get("/bonds/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEquals(len(response.json()), 1)
+
+    @mock.patch("origin.middleware.get_brotli")
+    def test_large_list_brotli(self, get_brotli_mock):
+        get_brotli_mock.return_value.compress.return_value = b"compressed"
+        self.create_bonds(20)
+
+        response = self.client.get("/bonds/", HTTP_ACCEPT_ENCODING="gzip, br")
+
+        self.assertEquals(response["Content-Encoding"], "br")
+        self.assertEquals(response.content, b"compressed")
+
+    def test_list_not_compressed_when_not_accepted(self):
+        self.create_bonds(20)
+
+        response = self.client.get("/bonds/")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_columnar_list_query_parameter(self):
+        self.create_bonds(2)
+
+        response = self.client.get("/bonds/?format=columnar")
+        response_json = json.loads(response.content)
+
+        self.assertEquals(
+            response["Content-Type"], "application/vnd.origin.columnar+json"
+        )
+        self.assertEquals(
+            [dict(zip(response_json["columns"], row)) for row in response_json["rows"]],
+            [
+                {
+                    "isin": "FR0000131104",
+                    "size": 100,
+                    "currency": "EUR",
+                    "maturity": "2025-03-27",
+                    "lei": "R0MUWSFPU8MPRO8K5P83",
+                    "legal_name": "BNP PARIBAS",
+                }
+            ]
+            * 2,
+        )
+
+    def test_columnar_list_accept_header(self):
+        self.create_bonds(1)
+        self.client.get("/bonds/")
+
+        response = self.client.get(
+            "/bonds/", HTTP_ACCEPT="application/vnd.origin.columnar+json"
+        )
+
+        response_json = json.loads(response.content)
+        self.assertEquals(
+            dict(zip(response_json["columns"], response_json["rows"][0]))["size"], 100
+        )
+
+
+@override_settings(API_COMPRESSION_MIN_SIZE=0)
+class TestPagesNotCompressed(TestCase):
+    """Ensures HTML pages holding CSRF tokens aren't compressed (BREACH)"""
+
+    def test_pages_not_compressed(self):
+        for path in ["/admin/login/", "/sign_up"]:
+            response = self.client.get(path, HTTP_ACCEPT_ENCODING="gzip, br")
+
+            self.assertEquals(response.status_code, 200)
+            self.assertIn(b"csrfmiddlewaretoken", response.content)
+            self.assertFalse(response.has_header("Content-Encoding"))
@@ -0,0 +1,137 @@
+import io
+import os
+import tempfile
+from decimal import Decimal
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds import fx
+from bonds.models import Bond, FXRate
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+class TestLoadRates(CacheMixin, TestCase):
+    def test_load_rates(self):
+        FXRate.objects.create(currency="EUR", rate=Decimal("1.1"))
+
+        count = fx.load_rates(io.StringIO("currency,rate\neur,1.2\nGBP, 1.3\n"))
+
+        self.assertEquals(count, 2)
+        self.assertEquals(
+            dict(FXRate.objects.values_list("currency", "rate")),
+            {"EUR": Decimal("1.2"), "GBP": Decimal("1.3")},
+        )
+
+    def test_load_rates_invalid_file(self):
+        with self.assertRaises(fx.FXRatesFileError) as e_ctx:
+            fx.load_rates(io.StringIO("currency,rate\nEUR,1.2\nGBP,abc\n"))
+
+        self.assertEquals(str(e_ctx.exception), "Invalid FX rate on line 3")
+        self.assertFalse(FXRate.objects.exists())
+
+    def test_load_fx_rates_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("currency,rate\nEUR,1.2\n")
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+
+        call_command("load_fx_rates", f.name, stdout=out)
+
+        self.assertEquals(FXRate.objects.get().currency, "EUR")
+        self.assertIn("Loaded 1 FX rates.", out.getvalue())
+
+    def test_load_fx_rates_command_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command("load_fx_rates", "/does/not/exist.csv")
+
+
+class TestExposure(QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def setUp(self):
+        super().setUp()
+        FXRate.objects.create(currency="EUR", rate=Decimal("1.5"))
+
+    def test_annotate_base_size(self):
+        create_bond(self.user, size=100, currency="EUR")
+        create_bond(self.user, size=100, currency="USD")
+        create_bond(self.user, size=100, currency="JPY")
+
+        base_sizes = {
+            bond.currency: bond.base_size
+            for bond in fx.annotate_base_size(Bond.objects.all())
+        }
+
+        self.assertEquals(base_sizes, {"EUR": 150, "USD": 100, "JPY": None})
+
+    def test_exposure(self):
+        create_bond(self.user, size=100, currency="EUR")
+        create_bond(self.user, size=200, currency="EUR")
+        create_bond(self.user, size=100, currency="USD")
+        create_bond(self.user, size=100, currency="JPY")
+
+        with self.assertNumQueries(2):  # token authentication, exposure
+            response = self.client.get("/bonds/exposure/")
+
+        self.assertEquals(
+            response.json(),
+            {
+                "base_currency": "USD",
+                "total": "550.00",
+                "currencies": [
+                    {"currency": "EUR", "total": 300, "base_total": "450.00"},
+                    {"currency": "JPY", "total": 100, "base_total": None},
+                    {"currency": "USD", "total": 100, "base_total": "100.00"},
+                ],
+                "missing_rates": ["JPY"],
+            },
+        )
+
+    def test_list_ordering_by_base_size(self):
+        create_bond(self.user, size=120, currency="USD")
+        create_bond(self.user, size=100, currency="EUR")
+        create_bond(self.user, size=110, currency="USD")
+
+        response = self.client.get("/bonds/?ordering=-base_size")
+
+        self.assertEquals(
+            [(bond["currency"], bond["size"]) for bond in response.json()],
+            [("EUR", 100), ("USD", 120), ("USD", 110)],
+        )
+
+    def test_list_ordering_unknown_rate_last(self):
+        create_bond(self.user, size=100, currency="JPY")
+        create_bond(self.user, size=120, currency="USD")
+
+        for ordering in ("base_size", "-base_size"):
+            response = self.client.get(f"/bonds/?ordering={ordering}")
+
+            self.assertEquals(
+                [bond["currency"] for bond in response.json()], ["USD", "JPY"]
+            )
+
+    def test_list_ordering_follows_rates_updates(self):
+        create_bond(self.user, size=120, currency="USD")
+        create_bond(self.user, size=100, currency="EUR")
+        self.client.get("/bonds/?ordering=base_size")
+
+        fx.load_rates(io.StringIO("currency,rate\nEUR,1.1\n"))
+        response = self.client.get("/bonds/?ordering=base_size")
+
+        self.assertEquals(
+            [bond["currency"] for bond in response.json()], ["EUR", "USD"]
+        )
+
+    def test_list_invalid_ordering(self):
+        response = self.client.get("/bonds/?ordering=legal_name")
+
+        self.assertEquals(response.status_code, 400)
+        self.assertTrue("ordering" in response.json())
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+import requests
+
+from origin import constants
+from bonds.gleif_stub import GLEIFStubServer, load_records
+from bonds.services import LEILookupError, get_legal_name
+
+
+def make_record(lei, legal_name):
+    return {"LEI": {"$": lei}, "Entity": {"LegalName": {"$": legal_name}}}
+
+
+RECORDS = {
+    "R0MUWSFPU8MPRO8K5P83": make_record("R0MUWSFPU8MPRO8K5P83", "BNP PARIBAS"),
+    "353800279ADEFGKNTV65": make_record("353800279ADEFGKNTV65", "AAA BANK"),
+}
+
+
+class TestGLEIFStubServer(TestCase):
+    def start_server(self, **kwargs):
+        server = GLEIFStubServer(("127.0.0.1", 0), dict(RECORDS), **kwargs)
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,))
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        self.addCleanup(stop)
+        return server
+
+    def test_lookup_through_stub(self):
+        server = self.start_server()
+
+        with override_settings(LEI_LOOKUP_URL_F=server.url_format):
+            self.assertEquals(get_legal_name("R0MUWSFPU8MPRO8K5P83"), "BNP PARIBAS")
+
+    def test_lookup_unknown_lei(self):
+        server = self.start_server()
+
+        with override_settings(LEI_LOOKUP_URL_F=server.url_format):
+            with self.assertRaises(LEILookupError) as e_ctx:
+                get_legal_name("UNKNOWN")
+        self.assertEquals(str(e_ctx.exception), constants.ERR_LEI_LOOKUP_NO_MATCH)
+
+    def test_batch_lookup(self):
+        server = self.start_server()
+
+        response = requests.get(
+            server.url_format.format(
+                lei="R0MUWSFPU8MPRO8K5P83,UNKNOWN,353800279ADEFGKNTV65"
+            )
+        )
+
+        self.assertEquals(
+            [record["LEI"]["$"] for record in response.json()],
+            ["R0MUWSFPU8MPRO8K5P83", "353800279ADEFGKNTV65"],
+        )
+
+    def test_error_rate(self):
+        server = self.start_server(error_rate=1, error_status=500)
+
+        with override_settings(LEI_LOOKUP_URL_F=server.url_format):
+            with self.assertRaises(LEILookupError) as e_ctx:
+                get_legal_name("R0MUWSFPU8MPRO8K5P83")
+        self.assertEquals(
+            str(e_ctx.exception),
+            constants.ERR_LEI_LOOKUP_ERROR_F.format(status_code=500),
+        )
+
+    def test_seeded_errors_reproducible(self):
+        def failures(server):
+            return [server.should_fail() for _ in range(20)]
+
+        self.assertEquals(
+            failures(GLEIFStubServer(("127.0.0.1", 0), {}, error_rate=0.5, seed=1)),
+            failures(GLEIFStubServer(("127.0.0.1", 0), {}, error_rate=0.5, seed=1)),
+        )
+
+    @mock.patch("bonds.gleif_stub.time.sleep")
+    def test_latency(self, sleep_mock):
+        server = GLEIFStubServer(("127.0.0.1", 0), {}, latency=0.05)
+        self.addCleanup(server.server_close)
+
+        server.simulate_latency()
+
+        sleep_mock.assert_called_once_with(0.05)
+
+    def test_recording_mode(self):
+        fixture_path = os.path.join(tempfile.mkdtemp(), "records.json")
+        self.addCleanup(os.remove, fixture_path)
+        server = GLEIFStubServer(("127.0.0.1", 0), {}, fixture_path=fixture_path)
+        self.addCleanup(server.server_close)
+        upstream_response = mock.Mock()
+        upstream_response.json.return_value = [RECORDS["R0MUWSFPU8MPRO8K5P83"]]
+
+        with mock.patch(
+            "bonds.gleif_stub.requests.get", return_value=upstream_response
+        ) as get_mock:
+            records = server.get_records(["R0MUWSFPU8MPRO8K5P83"])
+            server.get_records(["R0MUWSFPU8MPRO8K5P83"])
+
+        get_mock.assert_called_once_with(
+            constants.LEI_LOOKUP_URL_F.format(lei="R0MUWSFPU8MPRO8K5P83"),
+            timeout=settings.LEI_LOOKUP_TIMEOUT,
+        )
+        self.assertEquals(records, [RECORDS["R0MUWSFPU8MPRO8K5P83"]])
+        self.assertEquals(
+            load_records(fixture_path),
+            {"R0MUWSFPU8MPRO8K5P83": RECORDS["R0MUWSFPU8MPRO8K5P83"]},
+        )
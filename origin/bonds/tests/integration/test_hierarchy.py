@@ -0,0 +1,274 @@
+import io
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds import hierarchy
+from bonds.models import FXRate, LegalEntity, LegalEntityAncestor
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+PARENT = "529900PARENT00000112"
+CHILD = "529900CHILD000000187"
+GRANDCHILD = "529900GRANDCHILD0120"
+OTHER = "529900OTHER000000123"
+# direct parent without a record of its own
+MISSING = "529900MISSING0000004"
+
+HEADER = "lei,legal_name,direct_parent_lei,ultimate_parent_lei\n"
+
+
+def load(*rows):
+    return hierarchy.load_entities(io.StringIO(HEADER + "".join(rows)))
+
+
+def closure(using="default"):
+    return set(
+        LegalEntityAncestor.objects.using(using).values_list(
+            "lei", "ancestor_lei", "depth"
+        )
+    )
+
+
+class TestLoadEntities(TestCase):
+    def test_load_builds_closure(self):
+        counts = load(
+            f"{PARENT},Parent,,\n",
+            f"{CHILD},Child,{PARENT},{PARENT}\n",
+            f"{GRANDCHILD},Grandchild,{CHILD},{PARENT}\n",
+        )
+
+        self.assertEquals(counts["default"], {"created": 3, "updated": 0, "moved": 2})
+        self.assertEquals(
+            closure(),
+            {
+                (PARENT, PARENT, 0),
+                (CHILD, CHILD, 0),
+                (CHILD, PARENT, 1),
+                (GRANDCHILD, GRANDCHILD, 0),
+                (GRANDCHILD, CHILD, 1),
+                (GRANDCHILD, PARENT, 2),
+            },
+        )
+
+    def test_child_loaded_before_parent(self):
+        load(f"{CHILD},Child,{PARENT},{PARENT}\n")
+
+        self.assertEquals(LegalEntity.objects.get(lei=PARENT).legal_name, "")
+
+        counts = load(f"{PARENT},Parent,,\n")
+
+        self.assertEquals(counts["default"], {"created": 0, "updated": 1, "moved": 0})
+        self.assertEquals(LegalEntity.objects.get(lei=PARENT).legal_name, "Parent")
+        self.assertIn((CHILD, PARENT, 1), closure())
+
+    def test_incremental_load_moves_subtree(self):
+        load(
+            f"{PARENT},Parent,,\n",
+            f"{OTHER},Other,,\n",
+            f"{CHILD},Child,{PARENT},{PARENT}\n",
+            f"{GRANDCHILD},Grandchild,{CHILD},{PARENT}\n",
+        )
+
+        # only the changed record is loaded, its descendants follow it
+        counts = load(f"{CHILD},Child,{OTHER},{OTHER}\n")
+
+        self.assertEquals(counts["default"], {"created": 0, "updated": 1, "moved": 1})
+        self.assertEquals(
+            closure(),
+            {
+                (PARENT, PARENT, 0),
+                (OTHER, OTHER, 0),
+                (CHILD, CHILD, 0),
+                (CHILD, OTHER, 1),
+                (GRANDCHILD, GRANDCHILD, 0),
+                (GRANDCHILD, CHILD, 1),
+                (GRANDCHILD, OTHER, 2),
+            },
+        )
+
+    def test_parent_removed(self):
+        load(f"{PARENT},Parent,,\n", f"{CHILD},Child,{PARENT},{PARENT}\n")
+
+        load(f"{CHILD},Child,,\n")
+
+        self.assertEquals(closure(), {(PARENT, PARENT, 0), (CHILD, CHILD, 0)})
+
+    def test_ultimate_parent_without_direct_parent(self):
+        load(f"{PARENT},Parent,,\n", f"{CHILD},Child,,{PARENT}\n")
+
+        self.assertIn((CHILD, PARENT, 1), closure())
+
+    def test_missing_direct_parent_under_ultimate_parent(self):
+        load(f"{PARENT},Parent,,\n", f"{GRANDCHILD},Grandchild,{CHILD},{PARENT}\n")
+
+        self.assertEquals(
+            closure(),
+            {
+                (PARENT, PARENT, 0),
+                (CHILD, CHILD, 0),
+                (CHILD, PARENT, 1),
+                (GRANDCHILD, GRANDCHILD, 0),
+                (GRANDCHILD, CHILD, 1),
+                (GRANDCHILD, PARENT, 2),
+            },
+        )
+
+        # the direct parent's own record replaces the placeholder's parent
+        load(f"{CHILD},Child,{OTHER},{OTHER}\n")
+
+        self.assertIn((GRANDCHILD, OTHER, 2), closure())
+        self.assertNotIn((GRANDCHILD, PARENT, 2), closure())
+
+    def test_cycle_loads_nothing(self):
+        load(f"{PARENT},Parent,,\n", f"{CHILD},Child,{PARENT},{PARENT}\n")
+
+        with self.assertRaises(hierarchy.HierarchyFileError) as e_ctx:
+            load(f"{OTHER},Other,,\n", f"{PARENT},Parent,{CHILD},{CHILD}\n")
+
+        self.assertEquals(
+            str(e_ctx.exception),
+            f"{CHILD} can't be the parent of {PARENT}: cycle",
+        )
+        self.assertFalse(LegalEntity.objects.filter(lei=OTHER).exists())
+        self.assertEquals(LegalEntity.objects.get(lei=PARENT).direct_parent_lei, "")
+
+    def test_invalid_lei(self):
+        with self.assertRaises(hierarchy.HierarchyFileError) as e_ctx:
+            load(f"{PARENT},Parent,,\n", f"{CHILD},Child,R0M123,\n")
+
+        self.assertEquals(str(e_ctx.exception), "Invalid LEI on line 3")
+        self.assertFalse(LegalEntity.objects.exists())
+
+    def test_missing_column(self):
+        with self.assertRaises(hierarchy.HierarchyFileError) as e_ctx:
+            hierarchy.load_entities(io.StringIO(f"lei,legal_name\n{PARENT},Parent\n"))
+
+        self.assertEquals(str(e_ctx.exception), "Invalid legal entity on line 2")
+
+    def test_load_legal_entities_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(HEADER + f"{PARENT},Parent,,\n{CHILD},Child,{PARENT},{PARENT}\n")
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+
+        call_command("load_legal_entities", f.name, stdout=out)
+
+        self.assertEquals(LegalEntity.objects.count(), 2)
+        self.assertIn(
+            "default: loaded 2 new and 0 known legal entities, 1 changed parent.",
+            out.getvalue(),
+        )
+
+    def test_load_legal_entities_command_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command("load_legal_entities", "/does/not/exist.csv")
+
+
+@override_settings(BONDS_SHARDS=["default", "shard_1"])
+class TestShardedLoadEntities(TestCase):
+    databases = {"default", "shard_1"}
+
+    def test_load_copies_on_each_shard(self):
+        counts = load(f"{PARENT},Parent,,\n", f"{CHILD},Child,{PARENT},{PARENT}\n")
+
+        self.assertEquals(
+            counts,
+            {
+                "default": {"created": 2, "updated": 0, "moved": 1},
+                "shard_1": {"created": 2, "updated": 0, "moved": 1},
+            },
+        )
+        self.assertEquals(len(closure("shard_1")), 3)
+        self.assertEquals(closure("shard_1"), closure("default"))
+
+
+class TestGroupExposure(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def setUp(self):
+        super().setUp()
+        FXRate.objects.create(currency="EUR", rate=Decimal("1.5"))
+        load(
+            f"{PARENT},Parent,,\n",
+            f"{CHILD},Child,{PARENT},{PARENT}\n",
+            f"{GRANDCHILD},Grandchild,{CHILD},{PARENT}\n",
+        )
+
+    def test_group_exposure(self):
+        create_bond(self.user, lei=PARENT, size=100, currency="USD")
+        create_bond(self.user, lei=CHILD, size=100)
+        create_bond(self.user, lei=GRANDCHILD, size=100, currency="JPY")
+        create_bond(self.user, "OTHER SA", lei=OTHER, size=300, currency="USD")
+        create_bond(get_user_model().objects.create_user(username="bob"), lei=CHILD)
+
+        response = self.client.get("/bonds/exposure/groups/")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            response.json(),
+            {
+                "base_currency": "USD",
+                "groups": [
+                    {
+                        "lei": OTHER,
+                        "legal_name": "OTHER SA",
+                        "base_total": "300.00",
+                        "bonds": 1,
+                        "unconverted_bonds": 0,
+                    },
+                    {
+                        "lei": PARENT,
+                        "legal_name": "Parent",
+                        "base_total": "250.00",
+                        "bonds": 3,
+                        "unconverted_bonds": 1,
+                    },
+                ],
+            },
+        )
+
+    def test_group_exposure_follows_hierarchy_changes(self):
+        create_bond(self.user, lei=GRANDCHILD)
+
+        load(f"{CHILD},Child,,\n")
+        response = self.client.get("/bonds/exposure/groups/")
+
+        self.assertEquals(response.json()["groups"][0]["lei"], CHILD)
+        self.assertEquals(response.json()["groups"][0]["legal_name"], "Child")
+
+    def test_group_exposure_missing_direct_parent(self):
+        load(f"{OTHER},Other,{MISSING},{PARENT}\n")
+        create_bond(self.user, lei=OTHER)
+
+        response = self.client.get("/bonds/exposure/groups/")
+
+        self.assertEquals(response.json()["groups"][0]["lei"], PARENT)
+        self.assertEquals(response.json()["groups"][0]["legal_name"], "Parent")
+
+    def test_group_exposure_unnamed_ultimate_parent(self):
+        # the ultimate parent is only known as a placeholder
+        load(f"{OTHER},Other,{MISSING},{MISSING}\n")
+        create_bond(self.user, "OTHER SA", lei=OTHER)
+
+        response = self.client.get("/bonds/exposure/groups/")
+
+        self.assertEquals(response.json()["groups"][0]["lei"], MISSING)
+        self.assertEquals(response.json()["groups"][0]["legal_name"], MISSING)
+
+    def test_group_exposure_no_bonds(self):
+        response = self.client.get("/bonds/exposure/groups/")
+
+        self.assertEquals(response.json(), {"base_currency": "USD", "groups": []})
@@ -0,0 +1,269 @@
+import io
+import json
+from datetime import date, datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds import history
+from bonds.archiving import archive_matured_bonds
+from bonds.models import Bond, BondHistory, PortfolioSnapshot
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+def at(day):
+    return timezone.make_aware(datetime(2024, 1, day))
+
+
+def set_recorded_at(day):
+    """Dates the history entries not dated yet"""
+    BondHistory.objects.filter(recorded_at__year__gt=2024).update(recorded_at=at(day))
+
+
+class TestRecordHistory(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="rob")
+
+    def test_creation_records_all_fields(self):
+        bond = create_bond(self.user)
+
+        entry = BondHistory.objects.get()
+        self.assertEquals(
+            (entry.bond_id, entry.user_id, entry.action),
+            (bond.pk, self.user.pk, BondHistory.CREATED),
+        )
+        self.assertEquals(
+            json.loads(entry.changes),
+            {
+                "isin": "FR0000131104",
+                "size": 100,
+                "currency": "EUR",
+                "maturity": "2025-03-27",
+                "lei": "R0MUWSFPU8MPRO8K5P83",
+                "legal_name": "BNP PARIBAS",
+            },
+        )
+
+    def test_update_records_changed_fields(self):
+        create_bond(self.user)
+        bond = Bond.objects.get()
+
+        bond.size = 200
+        bond.save(resolve_legal_name=False)
+        bond.maturity = date(2026, 1, 1)
+        bond.save(resolve_legal_name=False)
+
+        entries = BondHistory.objects.filter(action=BondHistory.UPDATED).order_by("id")
+        self.assertEquals(
+            [json.loads(entry.changes) for entry in entries],
+            [{"size": 200}, {"maturity": "2026-01-01"}],
+        )
+
+    def test_unchanged_save_records_nothing(self):
+        create_bond(self.user)
+
+        Bond.objects.get().save(resolve_legal_name=False)
+
+        self.assertEquals(BondHistory.objects.count(), 1)
+
+    def test_archiving_records_removal(self):
+        bond = create_bond(self.user, maturity=date(2020, 1, 1))
+
+        archive_matured_bonds(before=date(2021, 1, 1))
+
+        entry = BondHistory.objects.latest("id")
+        self.assertEquals((entry.bond_id, entry.action), (bond.pk, BondHistory.REMOVED))
+
+    def test_deletion_records_removal(self):
+        bond_ids = [create_bond(self.user).pk for _ in range(2)]
+
+        Bond.objects.get(pk=bond_ids[0]).delete()
+        Bond.objects.filter(pk=bond_ids[1]).delete()
+
+        self.assertEquals(
+            list(
+                BondHistory.objects.filter(action=BondHistory.REMOVED)
+                .order_by("id")
+                .values_list("bond_id", flat=True)
+            ),
+            bond_ids,
+        )
+
+    def test_user_deletion_leaves_no_entries(self):
+        create_bond(self.user)
+
+        self.user.delete()
+
+        self.assertFalse(BondHistory.objects.exists())
+
+
+class TestBondsAsOf(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="rob")
+
+    def sizes_as_of(self, day):
+        return [
+            (bond.pk, bond.size) for bond in history.get_bonds_as_of(self.user, at(day))
+        ]
+
+    def test_replays_history(self):
+        first = create_bond(self.user, size=100)
+        set_recorded_at(1)
+        second = create_bond(self.user, size=200)
+        set_recorded_at(5)
+        first = Bond.objects.get(pk=first.pk)
+        first.size = 150
+        first.save(resolve_legal_name=False)
+        set_recorded_at(10)
+        Bond.objects.filter(pk=second.pk).delete()
+        set_recorded_at(15)
+
+        self.assertEquals(self.sizes_as_of(2), [(first.pk, 100)])
+        self.assertEquals(self.sizes_as_of(6), [(first.pk, 100), (second.pk, 200)])
+        self.assertEquals(self.sizes_as_of(11), [(first.pk, 150), (second.pk, 200)])
+        self.assertEquals(self.sizes_as_of(20), [(first.pk, 150)])
+
+    def test_starts_from_latest_snapshot(self):
+        bond = create_bond(self.user, size=100)
+        set_recorded_at(1)
+        PortfolioSnapshot.objects.filter(
+            pk=history.take_snapshot(self.user.pk, "default").pk
+        ).update(taken_at=at(2))
+        bond = Bond.objects.get(pk=bond.pk)
+        bond.size = 300
+        bond.save(resolve_legal_name=False)
+        set_recorded_at(3)
+        # entries covered by the snapshot aren't replayed
+        BondHistory.objects.filter(action=BondHistory.CREATED).delete()
+
+        with self.assertNumQueries(2):  # snapshot, entries since
+            self.assertEquals(self.sizes_as_of(2), [(bond.pk, 100)])
+        self.assertEquals(self.sizes_as_of(4), [(bond.pk, 300)])
+        self.assertEquals(self.sizes_as_of(1), [])
+
+    def test_first_snapshot_includes_bonds_without_history(self):
+        bond = create_bond(self.user)
+        BondHistory.objects.all().delete()
+
+        snapshot = history.take_snapshot(self.user.pk, "default")
+
+        self.assertEquals(snapshot.bond_count, 1)
+        self.assertEquals(
+            [b.pk for b in history.get_bonds_as_of(self.user, timezone.now())],
+            [bond.pk],
+        )
+
+    def test_snapshot_built_from_previous_one(self):
+        create_bond(self.user, size=100)
+        first = history.take_snapshot(self.user.pk, "default")
+        create_bond(self.user, size=200)
+
+        second = history.take_snapshot(self.user.pk, "default")
+
+        self.assertEquals(second.bond_count, 2)
+        self.assertEquals(second.last_history_id, BondHistory.objects.latest("id").pk)
+        self.assertGreaterEqual(second.taken_at, first.taken_at)
+        self.assertIsNone(history.take_snapshot(self.user.pk, "default"))
+
+
+class TestSnapshotPortfolios(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="rob")
+        self.other_user = get_user_model().objects.create_user(username="bob")
+
+    def test_users_due_for_snapshot(self):
+        for _ in range(3):
+            create_bond(self.user)
+        create_bond(self.other_user)
+        history.take_snapshot(self.user.pk, "default")
+        history.take_snapshot(self.other_user.pk, "default")
+        create_bond(self.user)
+        create_bond(self.user)
+        create_bond(self.other_user)
+
+        self.assertEquals(history.users_due_for_snapshot("default", 2), [self.user.pk])
+        self.assertEquals(
+            history.users_due_for_snapshot("default", 1),
+            [self.user.pk, self.other_user.pk],
+        )
+
+    def test_users_without_snapshot_are_due(self):
+        create_bond(self.user)
+        BondHistory.objects.all().delete()
+
+        self.assertEquals(history.users_due_for_snapshot("default"), [self.user.pk])
+
+    def test_command(self):
+        create_bond(self.user)
+        out = io.StringIO()
+
+        call_command("snapshot_portfolios", stdout=out)
+        call_command("snapshot_portfolios", "--all", stdout=out)
+        create_bond(self.user)
+        call_command("snapshot_portfolios", "--all", stdout=out)
+
+        self.assertEquals(
+            out.getvalue().splitlines(),
+            ["Took 1 snapshots.", "Took 0 snapshots.", "Took 1 snapshots."],
+        )
+        self.assertEquals(PortfolioSnapshot.objects.latest("id").bond_count, 2)
+
+
+class TestListAsOf(QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def test_list_as_of_date(self):
+        create_bond(self.user, size=100)
+        set_recorded_at(31)
+        create_bond(self.user, size=200)
+
+        response = self.client.get("/bonds/?as_of=2024-01-31")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            response.json(),
+            [
+                {
+                    "isin": "FR0000131104",
+                    "size": 100,
+                    "currency": "EUR",
+                    "maturity": "2025-03-27",
+                    "lei": "R0MUWSFPU8MPRO8K5P83",
+                    "legal_name": "BNP PARIBAS",
+                }
+            ],
+        )
+
+    def test_list_as_of_datetime(self):
+        create_bond(self.user)
+        set_recorded_at(15)
+
+        response = self.client.get("/bonds/?as_of=2024-01-14T23:00:00Z")
+
+        self.assertEquals(response.json(), [])
+
+    def test_list_as_of_invalid(self):
+        response = self.client.get("/bonds/?as_of=2024-02-30")
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(
+            response.json(),
+            {"as_of": ["Enter a date (YYYY-MM-DD) or an ISO 8601 datetime."]},
+        )
+
+    def test_list_as_of_with_filters(self):
+        response = self.client.get("/bonds/?as_of=2024-01-31&ordering=size")
+
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(
+            response.json(), {"as_of": ["as_of can't be used with ['ordering']."]}
+        )
@@ -0,0 +1,117 @@
+import asyncio
+import io
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, TestCase
+
+from bonds import load_testing
+from bonds.models import Bond
+
+
+class TestLoadTestingHelpers(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEquals(load_testing.percentile(values, 50), 50)
+        self.assertEquals(load_testing.percentile(values, 99), 99)
+        self.assertEquals(load_testing.percentile([3], 90), 3)
+        self.assertIsNone(load_testing.percentile([], 90))
+
+    def test_parse_mix(self):
+        self.assertEquals(
+            load_testing.parse_mix("create=1,list=0.5"), {"create": 1, "list": 0.5}
+        )
+
+    def test_parse_mix_invalid(self):
+        with self.assertRaises(ValueError):
+            load_testing.parse_mix("delete=1")
+        with self.assertRaises(ValueError):
+            load_testing.parse_mix("list=0")
+
+    def test_provision_users(self):
+        tokens = load_testing.provision_users(3)
+        self.assertEquals(len(load_testing.provision_users(3)), 3)
+
+        self.assertEquals(len(set(tokens)), 3)
+        self.assertEquals(
+            get_user_model().objects.filter(username__startswith="loadtest-").count(),
+            3,
+        )
+
+    def test_report(self):
+        result = load_testing.LoadTestResult()
+        result.record("list", 0.01, True)
+        result.record("list", 0.03, False)
+        result.duration = 2
+
+        report = result.report()
+
+        self.assertEquals(report["total"]["requests"], 2)
+        self.assertEquals(report["operations"]["list"]["errors"], 1)
+        self.assertEquals(report["operations"]["list"]["error_rate"], 0.5)
+        self.assertEquals(report["operations"]["list"]["throughput"], 1)
+        self.assertEquals(report["operations"]["list"]["p50_ms"], 10)
+        self.assertEquals(report["operations"]["list"]["max_ms"], 30)
+
+    def test_latency_measured_from_schedule(self):
+        async def slow_request(*args):
+            await asyncio.sleep(0.1)
+            return 200
+
+        generator = load_testing.LoadGenerator(
+            "http://testserver", ["token"], 20, 0.2, 1, {"list": 1}
+        )
+        with mock.patch("bonds.load_testing.http_request", side_effect=slow_request):
+            result = asyncio.run(generator.run())
+
+        # with one request in flight, the 4th one due at 0.15s is sent at
+        # 0.3s, its latency includes that wait
+        self.assertGreater(max(result.latencies["list"]), 0.2)
+
+    def test_command_invalid_mix(self):
+        with self.assertRaises(CommandError):
+            call_command("load_test", "--mix", "delete=1")
+
+
+class TestLoadTest(LiveServerTestCase):
+    """Runs a short load test against the app served by a live test server"""
+
+    @mock.patch("bonds.views.get_legal_name", return_value="BNP PARIBAS")
+    def test_load_test(self, lei_lookup_mock):
+        tokens = load_testing.provision_users(2)
+
+        report = load_testing.run_load_test(
+            self.live_server_url,
+            tokens,
+            rate=50,
+            duration=0.2,
+            mix={"create": 1, "list": 1, "filter": 1},
+            seed=1,
+        )
+
+        self.assertEquals(report["total"]["requests"], 10)
+        self.assertEquals(report["total"]["errors"], 0)
+        self.assertEquals(
+            Bond.objects.count(), report["operations"]["create"]["requests"]
+        )
+
+    @mock.patch("bonds.views.get_legal_name", return_value="BNP PARIBAS")
+    def test_load_test_command(self, lei_lookup_mock):
+        out = io.StringIO()
+
+        call_command(
+            "load_test",
+            "--url",
+            self.live_server_url,
+            "--users",
+            "1",
+            "--rate",
+            "20",
+            "--duration",
+            "0.1",
+            stdout=out,
+        )
+
+        self.assertEquals(json.loads(out.getvalue())["total"]["requests"], 2)
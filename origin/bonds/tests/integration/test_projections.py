@@ -0,0 +1,111 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds import projections
+from bonds.models import Bond
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+TODAY = date(2020, 6, 15)
+
+
+@override_settings(BONDS_LADDER_BUCKET_YEARS=(1, 5))
+class TestProjections(CacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="rob")
+
+    def test_ladder_buckets(self):
+        self.assertEquals(
+            projections.ladder_buckets(TODAY),
+            [
+                ("matured", TODAY),
+                ("0-1y", date(2021, 6, 15)),
+                ("1-5y", date(2025, 6, 15)),
+                ("5y+", None),
+            ],
+        )
+
+    def test_ladder_buckets_leap_day(self):
+        buckets = projections.ladder_buckets(date(2020, 2, 29))
+        self.assertEquals(buckets[1][1], date(2021, 2, 28))
+
+    def test_maturity_ladder(self):
+        create_bond(self.user, maturity=date(2020, 1, 1), size=1)
+        create_bond(self.user, maturity=date(2020, 6, 15), size=10)
+        create_bond(self.user, maturity=date(2021, 6, 14), size=20)
+        create_bond(self.user, maturity=date(2030, 1, 1), size=300, currency="USD")
+
+        ladder = projections.maturity_ladder(Bond.objects.filter(user=self.user), TODAY)
+
+        self.assertEquals(
+            ladder,
+            {
+                "EUR": [
+                    {"bucket": "matured", "total": 1, "count": 1},
+                    {"bucket": "0-1y", "total": 30, "count": 2},
+                    {"bucket": "1-5y", "total": 0, "count": 0},
+                    {"bucket": "5y+", "total": 0, "count": 0},
+                ],
+                "USD": [
+                    {"bucket": "matured", "total": 0, "count": 0},
+                    {"bucket": "0-1y", "total": 0, "count": 0},
+                    {"bucket": "1-5y", "total": 0, "count": 0},
+                    {"bucket": "5y+", "total": 300, "count": 1},
+                ],
+            },
+        )
+
+    def test_repayment_schedule(self):
+        create_bond(self.user, maturity=date(2021, 1, 1), size=1)
+        create_bond(self.user, maturity=date(2021, 12, 31), size=2)
+        create_bond(self.user, maturity=date(2023, 1, 1), size=4)
+
+        schedule = projections.repayment_schedule(Bond.objects.filter(user=self.user))
+
+        self.assertEquals(
+            schedule,
+            {
+                "EUR": [
+                    {"year": 2021, "total": 3, "count": 2},
+                    {"year": 2023, "total": 4, "count": 1},
+                ]
+            },
+        )
+
+    def test_projection_cached_until_bonds_change(self):
+        create_bond(self.user, maturity=date(2021, 1, 1))
+        projections.get_projection(self.user, TODAY)
+
+        with self.assertNumQueries(0):
+            projections.get_projection(self.user, TODAY)
+
+        create_bond(self.user, maturity=date(2021, 1, 1))
+        projection = projections.get_projection(self.user, TODAY)
+        self.assertEquals(projection["repayments"]["EUR"][0]["total"], 200)
+
+
+class TestProjectionEndpoint(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def test_projection_only_user_entries(self):
+        create_bond(self.user, maturity=date(2021, 1, 1))
+        user2 = get_user_model().objects.create_user(username="pat")
+        create_bond(user2, maturity=date(2021, 1, 1), currency="USD")
+
+        response = self.client.get("/bonds/projection/")
+        response_json = response.json()
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(list(response_json["ladder"].keys()), ["EUR"])
+        self.assertEquals(list(response_json["repayments"].keys()), ["EUR"])
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetExceeded, QueryBudgetMixin, query_budget
+from bonds.models import Bond
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+class TestQueryBudget(TestCase):
+    databases = {"default", "shard_1"}
+
+    def test_within_budget(self):
+        with query_budget(1):
+            get_user_model().objects.count()
+
+    def test_budget_exceeded_lists_queries(self):
+        with self.assertRaises(QueryBudgetExceeded) as e_ctx:
+            with query_budget(1, label="counts"):
+                get_user_model().objects.count()
+                Bond.objects.count()
+
+        message = str(e_ctx.exception)
+        self.assertTrue(message.startswith("counts ran 2 queries, budget is 1:"))
+        self.assertIn('1. SELECT COUNT(*) AS "__count" FROM "users_user"', message)
+        self.assertIn('2. SELECT COUNT(*) AS "__count" FROM "bonds_bond"', message)
+
+    @query_budget(0)
+    def test_decorator(self):
+        pass
+
+    @override_settings(BONDS_SHARDS=["default", "shard_1"])
+    def test_queries_on_shards_counted(self):
+        with self.assertRaises(QueryBudgetExceeded) as e_ctx:
+            with query_budget(1):
+                Bond.objects.count()
+                Bond.objects.using("shard_1").count()
+
+        self.assertIn(
+            '2. [shard_1] SELECT COUNT(*) AS "__count" FROM "bonds_bond"',
+            str(e_ctx.exception),
+        )
+
+
+class TestEndpointsQueryBudgets(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    """Ensures endpoints run the same queries whatever the number of bonds"""
+
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def test_budgets_independent_of_result_size(self):
+        for _ in range(25):
+            create_bond(self.user)
+
+        for path in [
+            "/bonds/?include_archived=1&ordering=base_size",
+            "/bonds/?search=bnp&fuzzy=1",
+            "/bonds/changes/",
+            "/bonds/projection/",
+            "/bonds/exposure/",
+            "/bonds/exposure/groups/",
+        ]:
+            response = self.client.get(path)
+            self.assertEquals(response.status_code, 200)
+
+    def test_undeclared_endpoint(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get("/bonds/unknown/")
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from origin.testing import QueryBudgetMixin
+from bonds import search
+from bonds.models import Bond, LegalNameToken
+from bonds.tests.utilities import (
+    BONDS_QUERY_BUDGETS,
+    AuthenticatedClientMixin,
+    CacheMixin,
+    create_bond,
+)
+
+
+class TestLegalNameSearch(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="rob")
+        self.bnp = create_bond(self.user, "BNP PARIBAS")
+        self.socgen = create_bond(self.user, "SOCIÉTÉ GÉNÉRALE")
+        self.bonds = Bond.objects.filter(user=self.user)
+
+    def search(self, query, fuzzy=False):
+        return list(search.search_legal_name(self.bonds, self.user, query, fuzzy))
+
+    def test_tokens_indexed_on_save(self):
+        self.assertEquals(
+            list(
+                LegalNameToken.objects.filter(bond=self.bnp).values_list(
+                    "token", flat=True
+                )
+            ),
+            ["bnp", "paribas"],
+        )
+
+    def test_tokens_reindexed_on_update(self):
+        with mock.patch("bonds.models.get_legal_name", return_value="BNP"):
+            self.bnp.save()
+
+        self.assertEquals(
+            list(self.bnp.legal_name_tokens.values_list("token", flat=True)), ["bnp"]
+        )
+
+    def test_tokens_kept_when_legal_name_unchanged(self):
+        bond = Bond.objects.get(pk=self.bnp.pk)
+        token_ids = set(bond.legal_name_tokens.values_list("id", flat=True))
+        bond.size = 200
+
+        bond.save(resolve_legal_name=False)
+
+        self.assertEquals(
+            set(bond.legal_name_tokens.values_list("id", flat=True)), token_ids
+        )
+
+    def test_search_case_and_accent_insensitive(self):
+        self.assertEquals(self.search("societe generale"), [self.socgen])
+
+    def test_search_prefix(self):
+        self.assertEquals(self.search("Par"), [self.bnp])
+        self.assertEquals(self.search("bnp par"), [self.bnp])
+
+    def test_search_all_words_required(self):
+        self.assertEquals(self.search("bnp generale"), [])
+
+    def test_search_typo_requires_fuzzy(self):
+        self.assertEquals(self.search("parbas"), [])
+        self.assertEquals(self.search("parbas", fuzzy=True), [self.bnp])
+
+    def test_search_fuzzy_threshold(self):
+        self.assertEquals(self.search("pxxxxas", fuzzy=True), [])
+
+    def test_search_only_user_entries(self):
+        user2 = get_user_model().objects.create_user(username="pat")
+        create_bond(user2, "BNP PARIBAS")
+
+        self.assertEquals(self.search("bnp"), [self.bnp])
+
+
+class TestSearchEndpoint(
+    QueryBudgetMixin, CacheMixin, AuthenticatedClientMixin, APITestCase
+):
+    query_budgets = BONDS_QUERY_BUDGETS
+
+    def setUp(self):
+        super().setUp()
+        create_bond(self.user, "BNP PARIBAS")
+        create_bond(self.user, "SOCIETE GENERALE")
+
+    def test_list_search(self):
+        response = self.client.get("/bonds/?search=paribas")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            [bond["legal_name"] for bond in response.json()], ["BNP PARIBAS"]
+        )
+
+    def test_list_fuzzy_search(self):
+        self.client.get("/bonds/?search=generle")
+
+        response = self.client.get("/bonds/?search=generle&fuzzy=1")
+
+        self.assertEquals(
+            [bond["legal_name"] for bond in response.json()], ["SOCIETE GENERALE"]
+        )
@@ -1,12 +1,22 @@
 import io
 import json
+import threading
+from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+import requests
 import responses
 
 from origin import constants
-from bonds.tests.utilities import ResponsesMixin, mock_lei_lookup_response
-from bonds.services import get_legal_name, LEILookupError
+from bonds import metrics, services
+from bonds.tests.utilities import CacheMixin, ResponsesMixin, mock_lei_lookup_response
+from bonds.services import (
+    LEI_LOOKUPS,
+    LEI_LOOKUPS_COALESCED,
+    get_legal_name,
+    LEILookupError,
+)
 
 
 class TestLegalNameService(ResponsesMixin, TestCase):
@@ -35,6 +45,16 @@ class TestLegalNameService(ResponsesMixin, TestCase):
             get_legal_name("123")
         assert str(e_ctx.exception) == constants.ERR_LEI_LOOKUP_UNREACHABLE
 
+    @override_settings(LEI_LOOKUP_TIMEOUT=3)
+    def test_lookup_server_timeout(self):
+        with mock.patch(
+            "requests.get", side_effect=requests.exceptions.ReadTimeout
+        ) as get_mock:
+            with self.assertRaises(LEILookupError) as e_ctx:
+                get_legal_name("123")
+        assert str(e_ctx.exception) == constants.ERR_LEI_LOOKUP_TIMEOUT
+        self.assertEquals(get_mock.call_args[1], {"timeout": 3})
+
     def test_lookup_invalid_response_no_json(self):
         server_response = "non-json text here"
         mock_lei_lookup_response("123", server_response)
@@ -80,3 +100,127 @@ class TestLegalNameService(ResponsesMixin, TestCase):
         with self.assertRaises(LEILookupError) as e_ctx:
             get_legal_name("123")
         assert str(e_ctx.exception) == constants.ERR_LEI_LOOKUP_NO_LEGAL_NAME
+
+
+class TestLookupCoalescing(CacheMixin, TestCase):
+    """Ensures concurrent lookups of a LEI result in a single gleif.org request"""
+
+    def run_concurrent_lookups(self, count, lookup_side_effect):
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def blocking_lookup(lei):
+            started.set()
+            release.wait(5)
+            return lookup_side_effect(lei)
+
+        def lookup():
+            try:
+                results.append(get_legal_name("123"))
+            except LEILookupError as e:
+                results.append(e)
+
+        with mock.patch(
+            "bonds.services._lookup_legal_name", side_effect=blocking_lookup
+        ) as lookup_mock:
+            threads = [threading.Thread(target=lookup) for _ in range(count)]
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            # let waiting threads reach the in-flight lookup before releasing it
+            while metrics.get_count(LEI_LOOKUPS_COALESCED) < count - 1:
+                threading.Event().wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        return lookup_mock, results
+
+    def test_concurrent_lookups_coalesced(self):
+        lookup_mock, results = self.run_concurrent_lookups(5, lambda lei: "AAA BANK")
+
+        lookup_mock.assert_called_once_with("123")
+        self.assertEquals(results, ["AAA BANK"] * 5)
+        self.assertEquals(metrics.get_count(LEI_LOOKUPS_COALESCED), 4)
+
+    def test_concurrent_lookups_share_error(self):
+        def failing_lookup(lei):
+            raise LEILookupError(constants.ERR_LEI_LOOKUP_NO_MATCH)
+
+        lookup_mock, results = self.run_concurrent_lookups(3, failing_lookup)
+
+        lookup_mock.assert_called_once_with("123")
+        self.assertEquals(
+            [str(result) for result in results],
+            [constants.ERR_LEI_LOOKUP_NO_MATCH] * 3,
+        )
+
+    @override_settings(LEI_LOOKUP_COALESCE_TIMEOUT=0.05)
+    def test_waiting_for_stuck_lookup_times_out(self):
+        release = threading.Event()
+
+        def stuck_lookup(lei):
+            release.wait(5)
+            return "AAA BANK"
+
+        with mock.patch("bonds.services._lookup_legal_name", side_effect=stuck_lookup):
+            leader = threading.Thread(target=get_legal_name, args=["123"])
+            leader.start()
+            while "123" not in services._in_flight:
+                threading.Event().wait(0.01)
+
+            with self.assertRaises(LEILookupError) as e_ctx:
+                get_legal_name("123")
+            release.set()
+            leader.join(5)
+
+        self.assertEquals(str(e_ctx.exception), constants.ERR_LEI_LOOKUP_TIMEOUT)
+
+    @mock.patch("bonds.services._lookup_legal_name", return_value="AAA BANK")
+    def test_sequential_lookups_not_coalesced(self, lookup_mock):
+        get_legal_name("123")
+        get_legal_name("123")
+
+        self.assertEquals(lookup_mock.call_count, 2)
+
+    @override_settings(
+        LEI_LOOKUP_COALESCE_ACROSS_PROCESSES=True,
+        LEI_LOOKUP_COALESCE_POLL_INTERVAL=0.01,
+    )
+    @mock.patch("bonds.services._lookup_legal_name")
+    def test_lookup_coalesced_across_processes(self, lookup_mock):
+        """Ensures a lookup in flight in another process is waited for"""
+        # another process holds the lock and publishes its result
+        cache.set("bonds:lei:lock:123", 1)
+        publish = threading.Timer(
+            0.05, cache.set, args=["bonds:lei:result:123", ("AAA BANK", None)]
+        )
+        publish.start()
+
+        self.assertEquals(get_legal_name("123"), "AAA BANK")
+        lookup_mock.assert_not_called()
+        publish.join()
+
+    @override_settings(
+        LEI_LOOKUP_COALESCE_ACROSS_PROCESSES=True,
+        LEI_LOOKUP_COALESCE_POLL_INTERVAL=0.01,
+    )
+    @mock.patch("bonds.services._lookup_legal_name", return_value="AAA BANK")
+    def test_lookup_across_processes_lock_released(self, lookup_mock):
+        """Ensures the lock holder publishes its result and releases the lock"""
+        self.assertEquals(get_legal_name("123"), "AAA BANK")
+
+        lookup_mock.assert_called_once_with("123")
+        self.assertIsNone(cache.get("bonds:lei:lock:123"))
+        self.assertEquals(cache.get("bonds:lei:result:123"), ("AAA BANK", None))
+
+
+class TestLookupMetrics(CacheMixin, ResponsesMixin, TestCase):
+    def test_lookups_counted(self):
+        mock_lei_lookup_response("123", "[]")
+
+        with self.assertRaises(LEILookupError):
+            get_legal_name("123")
+
+        self.assertEquals(metrics.get_count(LEI_LOOKUPS), 1)
@@ -0,0 +1,359 @@
+import io
+from datetime import date
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Max
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from bonds import fx, history, sharding
+from bonds.archiving import archive_matured_bonds
+from bonds.feed import get_changes
+from bonds.models import (
+    ArchivedBond,
+    Bond,
+    BondChange,
+    BondHistory,
+    LegalNameToken,
+    PortfolioSnapshot,
+    UserShard,
+)
+from bonds.tests.utilities import AuthenticatedClientMixin, CacheMixin, create_bond
+
+SHARDS = ["default", "shard_1"]
+
+
+@override_settings(BONDS_SHARDS=SHARDS)
+class TestShardedAPI(CacheMixin, AuthenticatedClientMixin, APITestCase):
+    databases = set(SHARDS)
+
+    def setUp(self):
+        super().setUp()
+        self.bond_data = {
+            "isin": "FR0000131104",
+            "size": 100000000,
+            "currency": "EUR",
+            "maturity": "2025-03-27",
+            "lei": "R0MUWSFPU8MPRO8K5P83",
+        }
+
+    @mock.patch("bonds.sharding.hash_shard", return_value="shard_1")
+    @mock.patch("bonds.views.get_legal_name", return_value="BNP PARIBAS")
+    def test_new_user_placed_by_hash(self, lei_lookup_mock, hash_mock):
+        response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 201)
+        self.assertEquals(UserShard.objects.get(user=self.user).shard, "shard_1")
+        bond = Bond.objects.using("shard_1").get()
+        self.assertEquals(bond.user_id, self.user.pk)
+        # bond ids are allocated from the default database, other ids from
+        # the shard's range
+        self.assertLess(bond.pk, settings.BONDS_SHARD_ID_RANGE)
+        self.assertGreaterEqual(bond.changes.get().pk, settings.BONDS_SHARD_ID_RANGE)
+        self.assertEquals(BondChange.objects.using("shard_1").count(), 1)
+        self.assertEquals(LegalNameToken.objects.using("shard_1").count(), 2)
+        self.assertFalse(Bond.objects.using("default").exists())
+
+        response = self.client.get("/bonds/?search=paribas")
+        self.assertEquals(len(response.json()), 1)
+        response = self.client.get("/bonds/changes/")
+        self.assertEquals(response.data["cursor"], bond.changes.get().pk)
+        response = self.client.post("/bonds/batch/", {"ids": [bond.pk]}, format="json")
+        self.assertTrue(response.data["results"][0]["found"])
+
+    @mock.patch("bonds.views.get_legal_name", return_value="BNP PARIBAS")
+    def test_create_while_moving(self, lei_lookup_mock):
+        sharding.set_shard(self.user.pk, "default", moving=True)
+
+        response = self.client.post("/bonds/", self.bond_data, format="json")
+
+        self.assertEquals(response.status_code, 503)
+        self.assertFalse(Bond.objects.using("default").exists())
+
+    def test_bond_ids_unique_across_shards(self):
+        sharding.set_shard(self.user.pk, "shard_1")
+        other_user = get_user_model().objects.create_user(username="bob")
+
+        ids = [
+            create_bond(self.user, using="shard_1").pk,
+            create_bond(other_user).pk,
+            create_bond(self.user, using="shard_1").pk,
+        ]
+
+        self.assertEquals(ids, sorted(set(ids)))
+
+    @mock.patch("bonds.sharding.hash_shard", return_value="shard_1")
+    def test_user_with_bonds_before_sharding_stays(self, hash_mock):
+        create_bond(self.user)
+
+        self.assertEquals(sharding.assign_shard(self.user.pk), "default")
+        self.assertEquals(UserShard.objects.get(user=self.user).shard, "default")
+
+    def test_exposure_uses_shard_rates(self):
+        sharding.set_shard(self.user.pk, "shard_1")
+        create_bond(self.user, using="shard_1")
+        fx.load_rates(io.StringIO("currency,rate\nEUR,1.5\n"))
+
+        response = self.client.get("/bonds/exposure/")
+
+        self.assertEquals(response.data["total"], "150.00")
+
+    def test_user_deletion_deletes_sharded_bonds(self):
+        sharding.set_shard(self.user.pk, "shard_1")
+        create_bond(self.user, using="shard_1")
+
+        self.user.delete()
+
+        self.assertFalse(Bond.objects.using("shard_1").exists())
+        self.assertFalse(BondChange.objects.using("shard_1").exists())
+        self.assertFalse(BondHistory.objects.using("shard_1").exists())
+
+
+@override_settings(BONDS_SHARDS=SHARDS)
+class TestMoveUser(CacheMixin, TestCase):
+    databases = set(SHARDS)
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="rob")
+        self.other_user = get_user_model().objects.create_user(username="bob")
+        # waits for processes to see the directory changes
+        patcher = mock.patch("bonds.sharding.time.sleep")
+        self.sleep_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_move_user(self):
+        bonds = [create_bond(self.user, f"BNP {number}") for number in range(3)]
+        other_bond = create_bond(self.other_user)
+
+        moved = sharding.move_user(self.user.pk, "shard_1", batch_size=2)
+
+        self.assertEquals(
+            moved,
+            {
+                "Bond": 3,
+                "ArchivedBond": 0,
+                "BondChange": 3,
+                "LegalNameToken": 6,
+                "BondHistory": 3,
+                "PortfolioSnapshot": 0,
+            },
+        )
+        self.assertEquals(sharding.get_shard(self.user.pk), "shard_1")
+        self.assertFalse(UserShard.objects.get(user=self.user).moving)
+        self.assertEquals(self.sleep_mock.call_count, 2)
+        # bonds keep their ids, other rows take ids from the new shard's range
+        self.assertEquals(
+            [
+                (bond.pk, bond.legal_name)
+                for bond in Bond.objects.for_user(self.user).order_by("id")
+            ],
+            [(bond.pk, bond.legal_name) for bond in bonds],
+        )
+        self.assertTrue(
+            all(
+                change.pk >= settings.BONDS_SHARD_ID_RANGE
+                for change in BondChange.objects.for_user(self.user)
+            )
+        )
+        self.assertEquals(
+            set(LegalNameToken.objects.for_user(self.user).values_list("bond_id")),
+            {(bond.pk,) for bond in bonds},
+        )
+        self.assertFalse(
+            BondChange.objects.for_user(self.user)
+            .filter(action=BondChange.REMOVED)
+            .exists()
+        )
+        # moved bonds aren't removed from the book
+        self.assertEquals(list(Bond.objects.using("default")), [other_bond])
+        self.assertEquals(BondChange.objects.using("default").count(), 1)
+        self.assertEquals(BondHistory.objects.using("default").count(), 1)
+        self.assertEquals(LegalNameToken.objects.using("default").count(), 2)
+
+    def test_move_user_back(self):
+        create_bond(self.user)
+        sharding.move_user(self.user.pk, "shard_1")
+
+        sharding.move_user(self.user.pk, "default")
+
+        self.assertEquals(
+            list(Bond.objects.for_user(self.user).values_list("legal_name")),
+            [("BNP PARIBAS",)],
+        )
+        self.assertFalse(Bond.objects.using("shard_1").exists())
+
+    def test_move_user_back_and_forth(self):
+        sharding.set_shard(self.user.pk, "shard_1")
+        first_bond = create_bond(self.user, "FIRST", using="shard_1")
+        history.take_snapshot(self.user.pk, "shard_1")
+        cursor = BondChange.objects.for_user(self.user).get().id
+
+        sharding.move_user(self.user.pk, "default")
+        other_bond = create_bond(self.other_user)
+        create_bond(self.user, "SECOND")
+        sharding.move_user(self.user.pk, "shard_1")
+        create_bond(self.other_user, using="shard_1")
+        sharding.move_user(self.user.pk, "default")
+
+        # moved rows didn't take ids from the range of another shard
+        self.assertLess(other_bond.pk, settings.BONDS_SHARD_ID_RANGE)
+        self.assertLess(
+            Bond.objects.for_user(self.user).aggregate(Max("id"))["id__max"],
+            settings.BONDS_SHARD_ID_RANGE,
+        )
+        bonds = list(Bond.objects.for_user(self.user).order_by("id"))
+        self.assertEquals([bond.legal_name for bond in bonds], ["FIRST", "SECOND"])
+        self.assertEquals(bonds[0].pk, first_bond.pk)
+        # history entries keep their order and snapshots follow them
+        entries = BondHistory.objects.for_user(self.user).order_by("id")
+        self.assertEquals(
+            [entry.bond_id for entry in entries], [bond.pk for bond in bonds]
+        )
+        self.assertEquals(
+            PortfolioSnapshot.objects.for_user(self.user).get().last_history_id,
+            entries[0].id,
+        )
+        self.assertEquals(
+            [
+                bond.legal_name
+                for bond in history.get_bonds_as_of(self.user, timezone.now())
+            ],
+            ["FIRST", "SECOND"],
+        )
+        # the cursor from before the moves lists changes from the start
+        changes = get_changes(self.user, cursor)[0]
+        self.assertEquals(
+            [change.bond_id for change in changes], [bond.pk for bond in bonds]
+        )
+
+    def test_writes_blocked_during_move(self):
+        create_bond(self.user)
+
+        def check_blocked(seconds):
+            self.assertEquals(seconds, settings.BONDS_SHARD_CACHE_TIMEOUT)
+            with self.assertRaises(sharding.UserMovingError):
+                sharding.assign_shard(self.user.pk)
+
+        self.sleep_mock.side_effect = check_blocked
+        sharding.move_user(self.user.pk, "shard_1")
+
+        self.assertEquals(self.sleep_mock.call_count, 2)
+        self.assertEquals(sharding.assign_shard(self.user.pk), "shard_1")
+
+    def test_rows_written_during_move_kept(self):
+        bond = create_bond(self.user)
+
+        def write(seconds):
+            if self.sleep_mock.call_count == 2:
+                # written by a process not checking the move flag, after the
+                # copy
+                create_bond(self.user, "LATE", using="default")
+
+        self.sleep_mock.side_effect = write
+        sharding.move_user(self.user.pk, "shard_1")
+
+        self.assertEquals(
+            list(Bond.objects.for_user(self.user).values_list("id", flat=True)),
+            [bond.pk],
+        )
+        self.assertEquals(
+            list(Bond.objects.using("default").values_list("legal_name", flat=True)),
+            ["LATE"],
+        )
+        self.assertEquals(LegalNameToken.objects.using("default").count(), 1)
+
+    def test_interrupted_move_rerun(self):
+        bonds = [create_bond(self.user, f"BNP {number}") for number in range(2)]
+        copy_rows = sharding._copy_rows
+
+        def interrupt(model, *args, **kwargs):
+            if model is BondChange:
+                raise RuntimeError("Connection lost")
+            return copy_rows(model, *args, **kwargs)
+
+        with mock.patch("bonds.sharding._copy_rows", side_effect=interrupt):
+            with self.assertRaises(RuntimeError):
+                sharding.move_user(self.user.pk, "shard_1")
+        self.assertTrue(UserShard.objects.get(user=self.user).moving)
+        self.assertEquals(Bond.objects.using("shard_1").count(), 2)
+
+        moved = sharding.move_user(self.user.pk, "shard_1")
+
+        self.assertEquals(moved["Bond"], 2)
+        self.assertFalse(UserShard.objects.get(user=self.user).moving)
+        self.assertEquals(
+            list(
+                Bond.objects.using("shard_1")
+                .order_by("id")
+                .values_list("id", flat=True)
+            ),
+            [bond.pk for bond in bonds],
+        )
+        self.assertEquals(BondChange.objects.using("shard_1").count(), 2)
+        self.assertEquals(LegalNameToken.objects.using("shard_1").count(), 4)
+        self.assertFalse(Bond.objects.using("default").exists())
+
+    def test_interrupted_move_back(self):
+        create_bond(self.user)
+        sharding.set_shard(self.user.pk, "default", moving=True)
+
+        self.assertEquals(sharding.move_user(self.user.pk, "default"), {})
+
+        self.assertFalse(UserShard.objects.get(user=self.user).moving)
+        self.assertEquals(Bond.objects.using("default").count(), 1)
+
+    @override_settings(BONDS_SHARD_CACHE_TIMEOUT=0)
+    def test_directory_cache_expires(self):
+        sharding.set_shard(self.user.pk, "shard_1")
+        # moved by another process, whose cache this one doesn't share
+        UserShard.objects.filter(user=self.user).update(shard="default")
+
+        self.assertEquals(sharding.get_shard(self.user.pk), "default")
+
+    def test_archive_on_shards(self):
+        sharding.set_shard(self.user.pk, "shard_1")
+        create_bond(self.user, using="shard_1", maturity=date(2020, 1, 1))
+        create_bond(self.other_user, maturity=date(2020, 1, 1))
+
+        self.assertEquals(archive_matured_bonds(before=date(2021, 1, 1)), 2)
+        self.assertEquals(ArchivedBond.objects.for_user(self.user).count(), 1)
+        self.assertFalse(Bond.objects.using("shard_1").exists())
+
+    def test_rebalance_command_user(self):
+        create_bond(self.user)
+        out = io.StringIO()
+
+        call_command(
+            "rebalance_shards", "--user", self.user.pk, "--to", "shard_1", stdout=out
+        )
+
+        self.assertEquals(Bond.objects.using("shard_1").count(), 1)
+        self.assertIn(f"User {self.user.pk}: default -> shard_1", out.getvalue())
+        self.assertIn("1 users moved.", out.getvalue())
+
+    def test_rebalance_command_plan(self):
+        for _ in range(3):
+            create_bond(self.user)
+        create_bond(self.other_user)
+        out = io.StringIO()
+
+        call_command("rebalance_shards", "--dry-run", stdout=out)
+
+        self.assertIn(f"User {self.user.pk}: default -> shard_1", out.getvalue())
+        self.assertIn("1 users to move.", out.getvalue())
+        self.assertEquals(Bond.objects.using("shard_1").count(), 0)
+
+        call_command("rebalance_shards", stdout=out)
+
+        self.assertEquals(Bond.objects.using("shard_1").count(), 3)
+
+    def test_rebalance_command_invalid_arguments(self):
+        with self.assertRaises(CommandError):
+            call_command("rebalance_shards", "--user", self.user.pk)
+        with self.assertRaises(CommandError):
+            call_command("rebalance_shards", "--user", self.user.pk, "--to", "nope")
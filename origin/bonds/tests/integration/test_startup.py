@@ -0,0 +1,57 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from origin.importtime import LAZY_MODULES, profile_startup
+
+# generous, this is about catching a dependency making start up several times
+# slower, not small variations
+STARTUP_BUDGET_MS = 10000
+
+
+class TestStartup(SimpleTestCase):
+    """Starts the WSGI application in a new interpreter, as a worker does"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # optional lazy modules may not be installed, empty stand-ins make them
+        # importable so that importing them at start up is caught
+        stubs_dir = tempfile.mkdtemp()
+        for name in LAZY_MODULES:
+            if importlib.util.find_spec(name) is None:
+                open(os.path.join(stubs_dir, f"{name}.py"), "w").close()
+        python_path = os.pathsep.join(
+            filter(None, [stubs_dir, os.environ.get("PYTHONPATH")])
+        )
+        try:
+            with mock.patch.dict(os.environ, {"PYTHONPATH": python_path}):
+                cls.startup_ms, cls.lazy_modules, cls.imports = profile_startup()
+        finally:
+            shutil.rmtree(stubs_dir)
+
+    def test_lazy_modules_not_imported(self):
+        self.assertEquals(self.lazy_modules, [])
+
+    def test_startup_time(self):
+        self.assertLess(self.startup_ms, STARTUP_BUDGET_MS)
+
+    def test_imports_are_profiled(self):
+        imported = {name for name, _, _, _ in self.imports}
+        self.assertIn("bonds.services", imported)
+
+
+class TestImportProfileCommand(SimpleTestCase):
+    def test_report(self):
+        out = StringIO()
+        call_command("import_profile", top=3, budget_ms=STARTUP_BUDGET_MS, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("Started in "))
+        self.assertTrue(lines[1].startswith("Imported "))
+        self.assertEquals(len(lines), 5)
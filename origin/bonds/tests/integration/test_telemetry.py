@@ -0,0 +1,159 @@
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+import responses
+
+from origin import constants
+from bonds import telemetry
+from bonds.services import LEILookupError, get_legal_name
+from bonds.tests.utilities import CacheMixin, ResponsesMixin, mock_lei_lookup_response
+
+LEI = "R0MUWSFPU8MPRO8K5P83"
+LEI_RECORD = json.dumps([{"Entity": {"LegalName": {"$": "BNP PARIBAS"}}}])
+
+
+@override_settings(LEI_LOOKUP_DURATION_BUCKETS=[100, 500])
+class TestLookupTelemetry(CacheMixin, ResponsesMixin, TestCase):
+    def test_success(self):
+        mock_lei_lookup_response(LEI, LEI_RECORD)
+
+        with self.assertLogs("bonds.telemetry", "INFO") as logs:
+            get_legal_name(LEI)
+
+        report = telemetry.get_report()
+        self.assertEquals(report["lookups"], 1)
+        self.assertEquals(report["outcomes"][constants.LEI_LOOKUP_OK], 1)
+        self.assertEquals(report["duration_ms"]["count"], 1)
+        self.assertEquals(report["calls_by_endpoint"], {telemetry.BACKGROUND: 1})
+        record = logs.records[0]
+        self.assertEquals(
+            (record.lei, record.outcome, record.endpoint),
+            (LEI, constants.LEI_LOOKUP_OK, telemetry.BACKGROUND),
+        )
+
+    def test_outcome_per_error(self):
+        mock_lei_lookup_response(LEI, "[]")
+        mock_lei_lookup_response("123", "Bad request", status_code=400)
+
+        for lei in (LEI, "123"):
+            with self.assertRaises(LEILookupError):
+                get_legal_name(lei)
+
+        outcomes = telemetry.get_report()["outcomes"]
+        self.assertEquals(outcomes[constants.LEI_LOOKUP_NO_MATCH], 1)
+        self.assertEquals(outcomes[constants.LEI_LOOKUP_SERVER_ERROR], 1)
+        self.assertEquals(outcomes[constants.LEI_LOOKUP_OK], 0)
+
+    def test_unreachable(self):
+        responses.add(responses.GET, "http://testdomain.com")
+
+        with self.assertRaises(LEILookupError):
+            get_legal_name(LEI)
+
+        outcomes = telemetry.get_report()["outcomes"]
+        self.assertEquals(outcomes[constants.LEI_LOOKUP_UNREACHABLE], 1)
+
+    def test_duration_histogram(self):
+        for duration in (0.05, 0.2, 0.3, 2):
+            telemetry.record_lookup(LEI, constants.LEI_LOOKUP_OK, duration)
+
+        duration = telemetry.get_report()["duration_ms"]
+        self.assertEquals(duration["buckets"], [[100.0, 1], [500.0, 3], ["+Inf", 4]])
+        self.assertEquals(duration["count"], 4)
+        self.assertEquals(duration["sum"], 2550)
+        self.assertEquals(duration["p50"], 300)
+        self.assertEquals(duration["p99"], 500)
+
+    def test_reset(self):
+        mock_lei_lookup_response(LEI, LEI_RECORD)
+        get_legal_name(LEI)
+
+        telemetry.reset()
+
+        report = telemetry.get_report()
+        self.assertEquals(report["lookups"], 0)
+        self.assertEquals(report["duration_ms"]["count"], 0)
+        self.assertEquals(report["calls_by_endpoint"], {})
+
+    def test_report_command(self):
+        mock_lei_lookup_response(LEI, LEI_RECORD)
+        mock_lei_lookup_response("123", "[]")
+        get_legal_name(LEI)
+        with self.assertRaises(LEILookupError):
+            get_legal_name("123")
+        out = io.StringIO()
+
+        call_command("lei_lookup_report", "--reset", stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEquals(lines[0], "gleif.org requests: 2, coalesced lookups: 0")
+        self.assertEquals(lines[2].split(), ["ok", "1", "50.0%"])
+        self.assertEquals(lines[3].split(), ["no_match", "1", "50.0%"])
+        self.assertEquals(lines[-1].split(), ["background", "2"])
+        self.assertEquals(telemetry.get_report()["lookups"], 0)
+
+    def test_report_command_json(self):
+        out = io.StringIO()
+
+        call_command("lei_lookup_report", "--json", stdout=out)
+
+        self.assertEquals(json.loads(out.getvalue())["lookups"], 0)
+
+
+class TestMetricsEndpoint(CacheMixin, ResponsesMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="rob")
+        self.staff = get_user_model().objects.create_user(
+            username="admin", is_staff=True
+        )
+
+    def authenticate(self, user):
+        token = Token.objects.get(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_lookups_counted_per_endpoint(self):
+        mock_lei_lookup_response(LEI, LEI_RECORD)
+        self.authenticate(self.user)
+        bond_data = {
+            "isin": "FR0000131104",
+            "size": 100,
+            "currency": "EUR",
+            "maturity": "2025-03-27",
+            "lei": LEI,
+        }
+        for _ in range(2):
+            self.client.post("/bonds/", bond_data, format="json")
+        # counters aren't culled along with cached lists
+        cache.clear()
+
+        self.authenticate(self.staff)
+        response = self.client.get("/metrics/")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        lines = response.content.decode().splitlines()
+        self.assertIn('bonds_lei_lookups_total{outcome="ok"} 2', lines)
+        self.assertIn(
+            'bonds_lei_lookup_calls_total{endpoint="POST bonds-list"} 2', lines
+        )
+
+    def test_json_format(self):
+        self.authenticate(self.staff)
+
+        response = self.client.get("/metrics/?format=json")
+
+        self.assertEquals(response.json()["lookups"], 0)
+
+    def test_staff_only(self):
+        self.authenticate(self.user)
+
+        response = self.client.get("/metrics/")
+
+        self.assertEquals(response.status_code, 403)
@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+
+from origin.importtime import parse_importtime, summarize
+
+OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     urllib3
+import time:       300 |        400 |   requests
+import time:        50 |        450 | bonds.services
+import time:       400 |        400 | django.db
+"""
+
+
+class TestImportTime(SimpleTestCase):
+    def test_parse_importtime(self):
+        imports = parse_importtime(OUTPUT)
+        self.assertEquals(len(imports), 4)
+        self.assertEquals(imports[1], ("requests", 300, 400, 1))
+        self.assertEquals(imports[2], ("bonds.services", 50, 450, 0))
+
+    def test_summarize(self):
+        summary = summarize(parse_importtime(OUTPUT), top=2)
+        self.assertEquals(summary["imports_ms"], 0.8)
+        self.assertEquals(summary["modules"], 4)
+        self.assertEquals(
+            summary["packages"],
+            [{"package": "django", "ms": 0.4}, {"package": "requests", "ms": 0.3}],
+        )
@@ -0,0 +1,16 @@
+from django.test import TestCase
+
+from bonds.normalization import normalize, tokenize
+
+
+class TestNormalization(TestCase):
+    def test_normalize(self):
+        self.assertEquals(normalize("Société GÉNÉRALE"), "societe generale")
+
+    def test_tokenize(self):
+        self.assertEquals(
+            tokenize("BNP PARIBAS S.A. - bnp"), ["bnp", "paribas", "s", "a"]
+        )
+
+    def test_tokenize_empty(self):
+        self.assertEquals(tokenize(" - "), [])
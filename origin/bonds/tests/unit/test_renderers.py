@@ -0,0 +1,36 @@
+import json
+
+from django.test import TestCase
+
+from origin.middleware import parse_accept_encoding
+from bonds.renderers import ColumnarJSONRenderer
+
+
+class TestColumnarJSONRenderer(TestCase):
+    def render(self, data):
+        return json.loads(ColumnarJSONRenderer().render(data))
+
+    def test_render_list(self):
+        data = [{"isin": "A", "size": 1}, {"isin": "B", "size": 2}]
+
+        self.assertEquals(
+            self.render(data),
+            {"columns": ["isin", "size"], "rows": [["A", 1], ["B", 2]]},
+        )
+
+    def test_render_empty_list(self):
+        self.assertEquals(self.render([]), {"columns": [], "rows": []})
+
+    def test_render_other_data(self):
+        self.assertEquals(self.render({"cursor": 1}), {"cursor": 1})
+
+
+class TestAcceptEncoding(TestCase):
+    def test_parse_accept_encoding(self):
+        self.assertEquals(
+            parse_accept_encoding("gzip, deflate;q=0.5, br;q=0, identity;q=x"),
+            {"gzip", "deflate"},
+        )
+
+    def test_parse_empty_accept_encoding(self):
+        self.assertEquals(parse_accept_encoding(""), set())
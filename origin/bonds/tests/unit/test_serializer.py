@@ -65,6 +65,16 @@ class TestBondSerializer(TestCase):
         serializer = BondSerializer(data=self.data)
         self.assertFalse(serializer.is_valid())
 
+    def test_isin_checksum(self):
+        self.data["isin"] = "FR0000131105"
+        serializer = BondSerializer(data=self.data)
+        self.assertFalse(serializer.is_valid())
+
+    def test_lei_checksum(self):
+        self.data["lei"] = "R0MUWSFPU8MPRO8K5P84"
+        serializer = BondSerializer(data=self.data)
+        self.assertFalse(serializer.is_valid())
+
     def test_lei_required(self):
         self.data["lei"] = ""
         serializer = BondSerializer(data=self.data)
@@ -0,0 +1,47 @@
+from django.test import SimpleTestCase, override_settings
+
+from bonds.sharding import ShardRouter, hash_shard, plan_rebalance, shard_number
+
+
+class TestPlanRebalance(SimpleTestCase):
+    def test_balanced(self):
+        loads = {"default": {1: 10}, "shard_1": {2: 10}}
+
+        self.assertEquals(plan_rebalance(loads), [])
+
+    def test_new_shard(self):
+        loads = {"default": {1: 10, 2: 6, 3: 4, 4: 1}, "shard_1": {}}
+
+        moves = plan_rebalance(loads)
+
+        # leaves 11 bonds on default and 10 on shard_1
+        self.assertEquals(moves, [(1, "default", "shard_1")])
+
+    def test_user_larger_than_gap_not_moved(self):
+        loads = {"default": {1: 12}, "shard_1": {2: 3}}
+
+        self.assertEquals(plan_rebalance(loads), [])
+
+
+class TestSharding(SimpleTestCase):
+    @override_settings(BONDS_SHARDS=["default", "shard_1", "shard_2"])
+    def test_hash_shard(self):
+        shards = {hash_shard(user_id) for user_id in range(100)}
+
+        self.assertEquals(shards, {"default", "shard_1", "shard_2"})
+        self.assertEquals(hash_shard(42), hash_shard(42))
+
+    def test_shard_number(self):
+        self.assertEquals(shard_number("default"), 0)
+        self.assertEquals(shard_number("shard_12"), 12)
+
+    def test_allow_migrate(self):
+        router = ShardRouter()
+
+        self.assertIsNone(router.allow_migrate("default", "users", "user"))
+        self.assertTrue(router.allow_migrate("shard_1", "bonds", "bond"))
+        self.assertTrue(router.allow_migrate("shard_1", "bonds", "fxrate"))
+        self.assertFalse(router.allow_migrate("shard_1", "bonds", "usershard"))
+        self.assertFalse(router.allow_migrate("shard_1", "users", "user"))
+        # data migrations
+        self.assertFalse(router.allow_migrate("shard_1", "bonds"))
@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase
+
+from bonds.telemetry import estimate_percentile, to_prometheus
+
+INF = float("inf")
+
+
+class TestEstimatePercentile(SimpleTestCase):
+    def test_interpolates_within_bucket(self):
+        buckets = [(100, 0), (200, 10), (500, 20), (INF, 20)]
+
+        self.assertEquals(estimate_percentile(buckets, 50), 200)
+        self.assertEquals(estimate_percentile(buckets, 25), 150)
+        self.assertEquals(estimate_percentile(buckets, 75), 350)
+
+    def test_infinite_bucket(self):
+        buckets = [(100, 1), (INF, 10)]
+
+        self.assertEquals(estimate_percentile(buckets, 99), 100)
+
+    def test_no_values(self):
+        self.assertIsNone(estimate_percentile([(100, 0), (INF, 0)], 50))
+
+
+class TestToPrometheus(SimpleTestCase):
+    def test_format(self):
+        report = {
+            "outcomes": {"ok": 2, "no_match": 1},
+            "coalesced": 4,
+            "duration_ms": {
+                "buckets": [[50, 1], [250, 3], ["+Inf", 3]],
+                "sum": 300.5,
+                "count": 3,
+            },
+            "calls_by_endpoint": {"POST bonds-list": 7},
+        }
+
+        lines = to_prometheus(report).splitlines()
+
+        self.assertIn('bonds_lei_lookups_total{outcome="ok"} 2', lines)
+        self.assertIn('bonds_lei_lookups_total{outcome="no_match"} 1', lines)
+        self.assertIn("bonds_lei_lookups_coalesced_total 4", lines)
+        self.assertIn('bonds_lei_lookup_duration_seconds_bucket{le="0.05"} 1', lines)
+        self.assertIn('bonds_lei_lookup_duration_seconds_bucket{le="0.25"} 3', lines)
+        self.assertIn('bonds_lei_lookup_duration_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("bonds_lei_lookup_duration_seconds_sum 0.3005", lines)
+        self.assertIn("bonds_lei_lookup_duration_seconds_count 3", lines)
+        self.assertIn(
+            'bonds_lei_lookup_calls_total{endpoint="POST bonds-list"} 7', lines
+        )
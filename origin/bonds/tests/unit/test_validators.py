@@ -0,0 +1,39 @@
+from django.test import TestCase
+from parameterized import parameterized
+
+from bonds.validators import is_valid_isin, is_valid_lei
+
+
+class TestISINValidation(TestCase):
+    @parameterized.expand(["FR0000131104", "US0378331005", "GB0002634946"])
+    def test_valid_isin(self, isin):
+        self.assertTrue(is_valid_isin(isin))
+
+    @parameterized.expand(
+        [
+            "FR0000131105",  # wrong check digit
+            "fr0000131104",  # lowercase
+            "FR000013110",  # too short
+            "120000131104",  # no country code
+            "FR000013110A",  # check digit isn't a digit
+        ]
+    )
+    def test_invalid_isin(self, isin):
+        self.assertFalse(is_valid_isin(isin))
+
+
+class TestLEIValidation(TestCase):
+    @parameterized.expand(["R0MUWSFPU8MPRO8K5P83", "353800279ADEFGKNTV65"])
+    def test_valid_lei(self, lei):
+        self.assertTrue(is_valid_lei(lei))
+
+    @parameterized.expand(
+        [
+            "R0MUWSFPU8MPRO8K5P84",  # wrong check digits
+            "r0muwsfpu8mpro8k5p83",  # lowercase
+            "R0M123",  # too short
+            "R0MUWSFPU8MPRO8K5PAB",  # check digits aren't digits
+        ]
+    )
+    def test_invalid_lei(self, lei):
+        self.assertFalse(is_valid_lei(lei))
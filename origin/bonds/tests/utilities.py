@@ -1,6 +1,46 @@
+from datetime import date
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
 import responses
 
-from origin import constants
+from bonds.models import Bond
+
+# SQL queries allowed per bonds API call, whatever the number of bonds involved
+BONDS_QUERY_BUDGETS = {
+    # token, live bonds, archived bonds
+    "GET /bonds/": 3,
+    # token, savepoint, existing bond (ISIN upserts), bond, change log,
+    # history, previous legal name tokens (updates), legal name tokens,
+    # savepoint release
+    "POST /bonds/": 9,
+    # token, changes, cursor check, changes again once done waiting
+    "GET /bonds/changes/": 4,
+    # token, maturity ladder, repayments
+    "GET /bonds/projection/": 3,
+    # token, totals per currency
+    "GET /bonds/exposure/": 2,
+    # token, totals per ultimate parent
+    "GET /bonds/exposure/groups/": 2,
+    # token, bonds
+    "POST /bonds/batch/": 2,
+}
+
+
+class AuthenticatedClientMixin:
+    """
+    Mixin creating a `self.user` and authenticating the test client with
+    their token
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(username="rob")
+        token = Token.objects.get(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
 
 
 class ResponsesMixin:
@@ -19,13 +59,54 @@ class ResponsesMixin:
         responses.reset()
 
 
+class CacheMixin:
+    """
+    Mixin clearing the caches before each test
+
+    Cached entries outlive the test database transaction, this ensures no
+    test sees data cached by another one. The test transaction is never
+    committed, so cache invalidations waiting for commits run right away.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        on_commit = mock.patch(
+            "django.db.transaction.on_commit", lambda func, using=None: func()
+        )
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+
+
 def mock_lei_lookup_response(
     lei, body, content_type="application/json", status_code=200
 ):
     responses.add(
         responses.GET,
-        constants.LEI_LOOKUP_URL_F.format(lei=lei),
+        settings.LEI_LOOKUP_URL_F.format(lei=lei),
         body=body,
         content_type=content_type,
         status=status_code,
     )
+
+
+def create_bond(user, legal_name="BNP PARIBAS", using=None, **fields):
+    """
+    Creates a bond of `user` with `legal_name` rather than looking it up,
+    `fields` override the defaults below.
+
+    The bond is saved on the shard of `user` unless `using` is given.
+    """
+    fields = {
+        "isin": "FR0000131104",
+        "size": 100,
+        "currency": "EUR",
+        "maturity": date(2025, 3, 27),
+        "lei": "R0MUWSFPU8MPRO8K5P83",
+        **fields,
+    }
+    bond = Bond(user=user, **fields)
+    with mock.patch("bonds.models.get_legal_name", return_value=legal_name):
+        bond.save(using=using)
+    return bond
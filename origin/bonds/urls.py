@@ -1,7 +1,10 @@
+from django.urls import path
 from rest_framework import routers
 from bonds import views
 
 router = routers.SimpleRouter()
 router.register("bonds", views.BondViewSet, "bonds")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
+]
@@ -0,0 +1,53 @@
+import re
+
+from rest_framework import serializers
+
+from origin import constants
+
+ISIN_RE = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]$")
+LEI_RE = re.compile(r"^[A-Z0-9]{18}[0-9]{2}$")
+
+
+def _to_digits(value):
+    # letters are converted to numbers, A=10 ... Z=35
+    return "".join(str(int(char, 36)) for char in value)
+
+
+def is_valid_isin(value):
+    """
+    Checks an ISIN (ISO 6166) format and check digit.
+
+    The check digit is the Luhn checksum of the first 11 characters converted
+    to digits.
+    """
+    if not ISIN_RE.match(value):
+        return False
+    digits = _to_digits(value)
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        digit = int(digit)
+        if position % 2 == 1:
+            digit *= 2
+        total += digit // 10 + digit % 10
+    return total % 10 == 0
+
+
+def is_valid_lei(value):
+    """
+    Checks a LEI (ISO 17442) format and check digits.
+
+    A valid LEI converted to digits is equal to 1 modulo 97 (ISO 7064 MOD 97-10).
+    """
+    if not LEI_RE.match(value):
+        return False
+    return int(_to_digits(value)) % 97 == 1
+
+
+def validate_isin(value):
+    if not is_valid_isin(value):
+        raise serializers.ValidationError(constants.ERR_INVALID_ISIN)
+
+
+def validate_lei(value):
+    if not is_valid_lei(value):
+        raise serializers.ValidationError(constants.ERR_INVALID_LEI)
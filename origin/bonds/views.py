@@ -1,13 +1,58 @@
+import heapq
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework import permissions
 from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.views import APIView
 
 from origin.authentication import QueryStringTokenAuthentication
-from bonds.models import Bond
-from bonds.services import LEILookupError
-from bonds.serializers import BondSerializer
+from bonds import cache
+from bonds import feed
+from bonds import fx
+from bonds import history
+from bonds import projections
+from bonds import search
+from bonds import sharding
+from bonds import telemetry
+from bonds.models import ArchivedBond, Bond
+from bonds.renderers import ColumnarJSONRenderer, PrometheusRenderer
+from bonds.services import LEILookupError, get_legal_name
+from bonds.serializers import (
+    ArchivedBondSerializer,
+    BondAsOfQuerySerializer,
+    BondBatchQuerySerializer,
+    BondChangeSerializer,
+    BondChangesQuerySerializer,
+    BondSerializer,
+)
+
+
+def merge_ordered(bonds, archived, ordering):
+    """
+    Merges the serialized rows of live and `archived` bonds, both lists of
+    `(bond, data)` sorted by `ordering`, into a single sorted list.
+    """
+    field = ordering.lstrip("-")
+    descending = ordering.startswith("-")
+
+    def key(row):
+        value = getattr(row[0], field)
+        # nulls last in both directions, as in `get_list_queryset`
+        return ((value is None) != descending, value)
+
+    # stable, live bonds come first among equal values
+    return [
+        data for _, data in heapq.merge(bonds, archived, key=key, reverse=descending)
+    ]
 
 
 class BondViewSet(viewsets.ViewSet):
@@ -15,23 +60,223 @@ class BondViewSet(viewsets.ViewSet):
     authentication_classes = [QueryStringTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [JSONParser]
+    renderer_classes = [JSONRenderer, ColumnarJSONRenderer]
+
+    # values accepted by the `ordering` query parameter of `list`, with an
+    # optional "-" prefix for descending order
+    ordering_fields = ["size", "base_size", "maturity"]
 
     def create(self, request):
         serializer = BondSerializer(data=request.data)
-        if serializer.is_valid():
-            try:
-                serializer.save(user=request.user)
-            except LEILookupError as e:
-                return Response(
-                    {"lei_lookup_error": str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # before the bond's transaction, so that slow gleif.org responses
+            # don't hold its locks
+            legal_name = get_legal_name(serializer.validated_data["lei"])
+        except LEILookupError as e:
+            return Response(
+                {"lei_lookup_error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        try:
+            shard = sharding.assign_shard(request.user.pk)
+        except sharding.UserMovingError as e:
+            return Response(
+                {"detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        upsert = settings.BONDS_UNIQUE_ISIN_PER_USER
+        try:
+            return self.create_bond(request, shard, upsert, legal_name)
+        except IntegrityError:
+            if not upsert:
+                raise
+            # a concurrent request created a bond with that ISIN first, the
+            # unique constraint rejected this one, which now updates it
+            return self.create_bond(request, shard, upsert, legal_name)
+
+    def create_bond(self, request, shard, upsert, legal_name):
+        with transaction.atomic(using=shard):
+            existing = None
+            if upsert:
+                # a bond with a known ISIN replaces the existing one, the
+                # latest one for ISINs held several times before upserts
+                existing = (
+                    Bond.objects.for_user(request.user)
+                    .select_for_update()
+                    .filter(isin=request.data["isin"])
+                    .order_by("-unique_isin", "-id")
+                    .first()
                 )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            serializer = BondSerializer(existing, data=request.data)
+            # validated by `create`, validation doesn't query the database
+            serializer.is_valid(raise_exception=True)
+            serializer.save(
+                user=request.user, unique_isin=upsert, legal_name=legal_name
+            )
+        return Response(
+            serializer.data,
+            status=status.HTTP_200_OK if existing else status.HTTP_201_CREATED,
+        )
 
     def list(self, request):
-        filters = {"user": request.user}
+        # rendered bytes are cached per user and filters, and invalidated
+        # whenever one of the user's bonds is saved or deleted
+        cache_key = cache.list_cache_key(
+            request.user.pk, request.query_params, request.accepted_media_type
+        )
+        content = cache.get_list(cache_key)
+        if content is None:
+            if "as_of" in request.query_params:
+                data = BondSerializer(self.get_as_of_bonds(request), many=True).data
+            else:
+                bonds = self.get_list_queryset(request)
+                data = BondSerializer(bonds, many=True).data
+            if request.query_params.get("include_archived") in ("1", "true"):
+                archived = self.get_list_queryset(request, ArchivedBond)
+                archived_data = ArchivedBondSerializer(archived, many=True).data
+                if "ordering" in request.query_params:
+                    data = merge_ordered(
+                        zip(bonds, data),
+                        zip(archived, archived_data),
+                        request.query_params["ordering"],
+                    )
+                else:
+                    # archived bonds come after live ones
+                    data += archived_data
+            content = request.accepted_renderer.render(
+                data,
+                request.accepted_media_type,
+                self.get_renderer_context(),
+            )
+            cache.set_list(cache_key, content)
+        return HttpResponse(content, content_type=request.accepted_media_type)
+
+    def get_as_of_bonds(self, request):
+        """Lists the user's bonds as they were at the `as_of` date."""
+        unsupported = {"legal_name", "search", "ordering", "include_archived"}
+        unsupported &= set(request.query_params)
+        if unsupported:
+            raise ValidationError(
+                {"as_of": [f"as_of can't be used with {sorted(unsupported)}."]}
+            )
+        query = BondAsOfQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return history.get_bonds_as_of(request.user, query.validated_data["as_of"])
+
+    def get_list_queryset(self, request, model=Bond):
+        bonds = model.objects.for_user(request.user)
         if "legal_name" in request.query_params:
-            filters.update({"legal_name__exact": request.query_params["legal_name"]})
-        serializer = BondSerializer(Bond.objects.filter(**filters), many=True)
-        return Response(serializer.data)
+            bonds = bonds.filter(legal_name__exact=request.query_params["legal_name"])
+
+        if request.query_params.get("search"):
+            if model is ArchivedBond:
+                raise ValidationError(
+                    {"search": ["Search isn't supported on archived bonds."]}
+                )
+            bonds = search.search_legal_name(
+                bonds,
+                request.user,
+                request.query_params["search"],
+                fuzzy=request.query_params.get("fuzzy") in ("1", "true"),
+            )
+
+        if "ordering" in request.query_params:
+            ordering = request.query_params["ordering"]
+            if ordering.lstrip("-") not in self.ordering_fields:
+                raise ValidationError(
+                    {"ordering": [f"Ordering must be one of {self.ordering_fields}."]}
+                )
+            field = ordering.lstrip("-")
+            if field == "base_size":
+                bonds = fx.annotate_base_size(bonds)
+            # bonds without a rate come last whatever the database
+            if ordering.startswith("-"):
+                bonds = bonds.order_by(F(field).desc(nulls_last=True), "id")
+            else:
+                bonds = bonds.order_by(F(field).asc(nulls_last=True), "id")
+        return bonds
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Lists bonds created or updated after the `cursor` query parameter.
+
+        With `wait`, the request is held open up to that many seconds until a
+        change happens.
+        """
+        query = BondChangesQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        changes, cursor = feed.get_changes(
+            request.user, query.validated_data["cursor"], query.validated_data["wait"]
+        )
+        return Response(
+            {
+                "cursor": cursor,
+                "changes": BondChangeSerializer(changes, many=True).data,
+            }
+        )
+
+    @action(detail=False, methods=["get"])
+    def projection(self, request):
+        """Lists the user's maturity ladder and principal repayments per currency."""
+        return Response(projections.get_projection(request.user))
+
+    @action(detail=False, methods=["get"])
+    def exposure(self, request):
+        """Sums the user's bond sizes converted to the base currency."""
+        return Response(fx.get_exposure(Bond.objects.for_user(request.user)))
+
+    @action(detail=False, methods=["get"], url_path="exposure/groups")
+    def group_exposure(self, request):
+        """
+        Sums the user's bond sizes converted to the base currency per ultimate
+        parent of their issuer.
+        """
+        return Response(fx.get_group_exposure(Bond.objects.for_user(request.user)))
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Looks up the user's bonds by `ids` or `isins`, in a single query.
+
+        Results are listed in the requested order, with `found` set to false
+        for unknown keys.
+        """
+        query = BondBatchQuerySerializer(data=request.data)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if "ids" in query.validated_data:
+            ids = query.validated_data["ids"]
+            bonds = Bond.objects.for_user(request.user).filter(pk__in=set(ids))
+            by_id = {bond.pk: BondSerializer(bond).data for bond in bonds}
+            results = [
+                {"id": id, "found": id in by_id, "bond": by_id.get(id)} for id in ids
+            ]
+        else:
+            isins = query.validated_data["isins"]
+            bonds = Bond.objects.for_user(request.user).filter(isin__in=set(isins))
+            by_isin = {}
+            for bond in bonds.order_by("id"):
+                by_isin.setdefault(bond.isin, []).append(BondSerializer(bond).data)
+            results = [
+                {"isin": isin, "found": isin in by_isin, "bonds": by_isin.get(isin, [])}
+                for isin in isins
+            ]
+        return Response({"results": results})
+
+
+class MetricsView(APIView):
+    """
+    Exports the LEI lookups telemetry to staff users, in the Prometheus text
+    format by default or as JSON with `format=json`.
+    """
+
+    authentication_classes = [QueryStringTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [PrometheusRenderer, JSONRenderer]
+
+    def get(self, request):
+        return Response(telemetry.get_report())
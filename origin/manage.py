@@ -3,6 +3,8 @@ import os
 import sys
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["test"]:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "origin.test_settings")
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "origin.settings")
     try:
         from django.core.management import execute_from_command_line
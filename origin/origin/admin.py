@@ -0,0 +1,110 @@
+"""
+Admin helpers for tables too large for the admin defaults.
+"""
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def estimate_count(model, using):
+    """
+    Returns the number of rows of a model's table estimated by the database
+    statistics, or None when there are none.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == "sqlite":
+            # statistics are only gathered by ANALYZE
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            # the first number of a stat is the number of rows
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0].split(".")[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the database's estimated row count of unfiltered large tables, an
+    exact COUNT(*) scans the whole table.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+            ):
+                return estimate
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """
+    ModelAdmin mixin avoiding full table scans on changelists:
+
+    - row counts of unfiltered lists are estimated, and filtered lists don't
+      count all rows as well.
+    - searches only match `indexed_search_fields` lookups, which must be
+      served by an index, rather than `icontains` on every search field.
+      Lookups across a relation are resolved to the ids of the related rows
+      first, on the database of the related model, so they don't join tables
+      other databases may not have.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    indexed_search_fields = ()
+
+    def get_search_fields(self, request):
+        return self.indexed_search_fields
+
+    def get_search_lookups(self, search_term):
+        """
+        Returns the `(lookup, value)` pairs of a search, rows matching any of
+        them are found.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return []
+        lookups = []
+        for lookup in self.indexed_search_fields:
+            name, _, related_lookup = lookup.partition("__")
+            field = self.model._meta.get_field(name)
+            if field.is_relation and related_lookup:
+                related = field.related_model._default_manager.filter(
+                    **{related_lookup: search_term}
+                )
+                lookups.append(
+                    (f"{field.attname}__in", list(related.values_list("pk", flat=True)))
+                )
+            else:
+                lookups.append((lookup, search_term))
+        return lookups
+
+    def get_search_results(self, request, queryset, search_term):
+        lookups = self.get_search_lookups(search_term)
+        if not lookups:
+            return queryset, False
+        query = Q()
+        for lookup, value in lookups:
+            query |= Q(**{lookup: value})
+        return queryset.filter(query), False
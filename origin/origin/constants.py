@@ -3,8 +3,27 @@
 LEI_LOOKUP_URL_F = "https://leilookup.gleif.org/api/v2/leirecords?lei={lei}"
 
 ERR_LEI_LOOKUP_UNREACHABLE = "LEI lookup server unreachable"
+ERR_LEI_LOOKUP_TIMEOUT = "LEI lookup server timed out"
 ERR_LEI_LOOKUP_ERROR_F = "LEI lookup server error [{status_code}]"
 ERR_LEI_LOOKUP_INVALID_JSON_RESPONSE = "LEI lookup server invalid response format"
 ERR_LEI_LOOKUP_NO_MATCH = "LEI lookup server did not find matching record"
 ERR_LEI_LOOKUP_MULTIPLE_MATCHES = "LEI lookup server found multiple matching records"
 ERR_LEI_LOOKUP_NO_LEGAL_NAME = "LEI lookup server did not return legal name data"
+
+# LEI lookup outcomes recorded by `bonds.telemetry`, one per error above
+
+LEI_LOOKUP_OK = "ok"
+LEI_LOOKUP_UNREACHABLE = "unreachable"
+LEI_LOOKUP_TIMEOUT = "timeout"
+LEI_LOOKUP_SERVER_ERROR = "server_error"
+LEI_LOOKUP_INVALID_JSON_RESPONSE = "invalid_json_response"
+LEI_LOOKUP_NO_MATCH = "no_match"
+LEI_LOOKUP_MULTIPLE_MATCHES = "multiple_matches"
+LEI_LOOKUP_NO_LEGAL_NAME = "no_legal_name"
+# any other exception
+LEI_LOOKUP_FAILED = "failed"
+
+# Bond identifiers validation errors
+
+ERR_INVALID_ISIN = "Invalid ISIN, expected 12 characters with a valid check digit"
+ERR_INVALID_LEI = "Invalid LEI, expected 20 characters with valid check digits"
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+# modules only needed by some requests, they must not be imported when a
+# worker starts
+LAZY_MODULES = ("requests", "brotli")
+
+# what a worker does when it starts, the URLconf is only loaded on the first
+# request
+STARTUP_CODE = """
+import json, sys, time
+started = time.perf_counter()
+import {wsgi_module}
+print(json.dumps({{
+    "ms": (time.perf_counter() - started) * 1000,
+    "lazy_modules": [name for name in {lazy_modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def profile_startup():
+    """
+    Starts the project's WSGI application in a new interpreter, with
+    `-X importtime`.
+
+    Returns the start up time (ms), the `LAZY_MODULES` imported and
+    `(module, self µs, cumulative µs, depth)` tuples, in import order.
+    """
+    code = STARTUP_CODE.format(
+        wsgi_module=settings.WSGI_APPLICATION.rsplit(".", 1)[0],
+        lazy_modules=LAZY_MODULES,
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=settings.BASE_DIR,
+        env=dict(os.environ),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    result = json.loads(completed.stdout.splitlines()[-1])
+    return result["ms"], result["lazy_modules"], parse_importtime(completed.stderr)
+
+
+def parse_importtime(output):
+    """
+    Parses `-X importtime` output lines.
+
+    Modules imported with `importlib.import_module()`, as Django does with
+    apps and middlewares, are not listed, only the modules they import.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def summarize(imports, top=15):
+    """
+    Summarizes an import profile.
+
+    Import times are grouped by top level package, as the same package is
+    usually imported by several modules.
+    """
+    packages = defaultdict(int)
+    for name, self_us, _, _ in imports:
+        packages[name.split(".")[0]] += self_us
+    return {
+        "imports_ms": round(sum(self_us for _, self_us, _, _ in imports) / 1000, 1),
+        "modules": len(imports),
+        "packages": [
+            {"package": package, "ms": round(us / 1000, 1)}
+            for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+    }
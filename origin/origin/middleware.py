@@ -0,0 +1,78 @@
+import functools
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+
+@functools.lru_cache(maxsize=None)
+def get_brotli():
+    """Returns the `brotli` module, or None when it isn't installed."""
+    # imported on first use, the middleware is loaded when workers start
+    try:
+        import brotli
+    except ImportError:  # optional dependency, only gzip is offered without it
+        return None
+    return brotli
+
+
+def is_json(response):
+    """Tells whether a response is JSON, including `+json` media types."""
+    media_type = response.get("Content-Type", "").partition(";")[0].strip()
+    return media_type == "application/json" or media_type.endswith("+json")
+
+
+def parse_accept_encoding(header):
+    """Returns the encodings accepted by an `Accept-Encoding` header."""
+    accepted = set()
+    for part in header.split(","):
+        encoding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if encoding and quality > 0:
+            accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses JSON responses larger than `API_COMPRESSION_MIN_SIZE` bytes.
+
+    Brotli is used when the client accepts it and the `brotli` package is
+    installed, Django's gzip compression otherwise. Other responses, such as
+    the HTML pages of the admin and sign up, are left as is: they embed CSRF
+    tokens next to reflected input, which compression would expose to BREACH.
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or not is_json(response)
+            or len(response.content) < settings.API_COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        accepted = parse_accept_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if "br" not in accepted or response.has_header("Content-Encoding"):
+            return super().process_response(request, response)
+        brotli = get_brotli()
+        if brotli is None:
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        content = brotli.compress(response.content)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = "br"
+        # compressed content isn't byte-identical, see RFC 7232 section 2.1
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 
 import os
 
+from origin import constants
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -45,10 +47,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "origin.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "bonds.telemetry.EndpointMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -86,6 +90,122 @@ DATABASES = {
     }
 }
 
+# Bonds data is spread by user across the databases listed in BONDS_SHARDS,
+# see `bonds.sharding`. Shards other than "default" are named
+# "shard_<number>", ids of rows created on a shard start at
+# <number> * BONDS_SHARD_ID_RANGE so that they stay unique across shards.
+# Bond ids are the exception: they are all taken from the default database,
+# so that bonds keep them when moved to another shard.
+BONDS_SHARD_COUNT = int(os.environ.get("BONDS_SHARD_COUNT", 1))
+BONDS_SHARDS = ["default"] + [
+    f"shard_{number}" for number in range(1, BONDS_SHARD_COUNT)
+]
+BONDS_SHARD_ID_RANGE = 10**12
+for alias in BONDS_SHARDS[1:]:
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, f"db_{alias}.sqlite3"),
+    }
+DATABASE_ROUTERS = ["bonds.sharding.ShardRouter"]
+
+# number of rows copied or deleted per transaction when moving a user
+# between shards
+BONDS_SHARD_MOVE_BATCH_SIZE = 1000
+# seconds a user's shard stays cached. With a per process cache backend such
+# as LocMemCache, other processes go on using a moved user's previous shard
+# for up to that long.
+BONDS_SHARD_CACHE_TIMEOUT = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "origin",
+        # bounds memory used by cached bonds lists, oldest entries get culled
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # `bonds.metrics` counters, apart from cached lists so they aren't culled
+    # with them. Processes only add their counts up with a shared backend
+    # (memcached, Redis), each process keeps its own with LocMemCache.
+    "metrics": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "metrics",
+        "OPTIONS": {"MAX_ENTRIES": 1000000},
+    },
+}
+
+# seconds a rendered `GET /bonds/` response stays cached
+BONDS_LIST_CACHE_TIMEOUT = 300
+
+# `GET /bonds/changes/` feed: max changes per response, max seconds a request
+# can be held open and seconds between database queries while it is. A held
+# request keeps its worker busy, size the number of workers (or threads) for
+# the clients waiting at the same time.
+BONDS_CHANGES_PAGE_SIZE = 500
+BONDS_CHANGES_MAX_WAIT = 30
+BONDS_CHANGES_POLL_INTERVAL = 1
+# seconds a change is held back from the feed, so that changes committed out
+# of id order by concurrent transactions aren't skipped by cursors. SQLite
+# commits writes one at a time so none is needed, on PostgreSQL it should be
+# longer than the longest transaction writing bonds.
+BONDS_CHANGES_SETTLE_TIME = 0
+
+# `GET /bonds/projection/`: upper bounds in years of the maturity ladder
+# buckets, and seconds a computed projection stays cached
+BONDS_LADDER_BUCKET_YEARS = (1, 2, 3, 5, 7, 10, 20, 30)
+BONDS_PROJECTION_CACHE_TIMEOUT = 3600
+
+# max ids or ISINs looked up by a `POST /bonds/batch/` request
+BONDS_BATCH_MAX_SIZE = 5000
+
+# number of matured bonds moved to the archive table per transaction
+BONDS_ARCHIVE_BATCH_SIZE = 1000
+
+# bulk actions started from the admin (`bonds.jobs`): bonds processed per
+# transaction, and seconds between checks for new jobs by `run_bond_jobs --loop`
+BONDS_JOB_BATCH_SIZE = 500
+BONDS_JOB_POLL_INTERVAL = 5
+
+# history entries recorded per user before `snapshot_portfolios` snapshots
+# their book, bounding the entries replayed by `GET /bonds/?as_of=`
+BONDS_HISTORY_SNAPSHOT_INTERVAL = 1000
+
+# admin changelists of tables with more rows than this show the row count
+# estimated by the database rather than counting rows
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# minimum similarity ratio (0 to 1) of words matched by `GET /bonds/?fuzzy=1`
+BONDS_SEARCH_FUZZY_THRESHOLD = 0.8
+
+# when enabled, creating a bond with the ISIN of one of the user's bonds
+# updates it rather than creating a duplicate
+BONDS_UNIQUE_ISIN_PER_USER = False
+
+# gleif.org records URL, can point to a local stand-in server, see the
+# `gleif_stub_server` management command
+LEI_LOOKUP_URL_F = os.environ.get("LEI_LOOKUP_URL_F", constants.LEI_LOOKUP_URL_F)
+
+# seconds a gleif.org request waits to connect, and between bytes of the
+# response, before the lookup fails
+LEI_LOOKUP_TIMEOUT = 5
+
+# concurrent gleif.org lookups of a LEI are coalesced within a process, and
+# across processes sharing the cache backend when enabled. The timeout is the
+# longest time a process waits for another one's lookup.
+LEI_LOOKUP_COALESCE_ACROSS_PROCESSES = False
+LEI_LOOKUP_COALESCE_TIMEOUT = 10
+LEI_LOOKUP_COALESCE_POLL_INTERVAL = 0.05
+
+# upper bounds, in milliseconds, of the gleif.org requests duration histogram
+# buckets (`bonds.telemetry`)
+LEI_LOOKUP_DURATION_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# currency FX rates (`bonds.models.FXRate`) convert bond sizes to
+BONDS_BASE_CURRENCY = "USD"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -133,6 +253,9 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 
+# responses smaller than this many bytes aren't worth compressing
+API_COMPRESSION_MIN_SIZE = 1024
+
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
         "rest_framework.renderers.JSONRenderer",
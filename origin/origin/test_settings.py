@@ -0,0 +1,18 @@
+"""
+Settings of the test suite, used by `python manage.py test`.
+"""
+
+import os
+
+from origin.settings import *  # noqa: F401,F403
+from origin.settings import BASE_DIR, DATABASES
+
+# the sharding tests spread users across the default database and shard_1,
+# whatever BONDS_SHARD_COUNT is
+DATABASES.setdefault(
+    "shard_1",
+    {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db_shard_1.sqlite3"),
+    },
+)
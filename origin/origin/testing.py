@@ -0,0 +1,97 @@
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def format_queries(queries):
+    return "\n".join(
+        f"{position}. {query['sql']}" for position, query in enumerate(queries, 1)
+    )
+
+
+class query_budget(ContextDecorator):
+    """
+    Fails when more than `max_queries` SQL queries run in its block, on the
+    `using` database or on any of `settings.BONDS_SHARDS` by default.
+
+    Usable as a context manager or a test method decorator, the error lists
+    the queries which ran:
+    ```
+    with query_budget(2):
+        self.client.get("/bonds/")
+    ```
+    """
+
+    def __init__(self, max_queries, label="block", using=None):
+        self.max_queries = max_queries
+        self.label = label
+        self.using = using
+
+    def __enter__(self):
+        aliases = [self.using] if self.using else settings.BONDS_SHARDS
+        self.contexts = {
+            alias: CaptureQueriesContext(connections[alias]) for alias in aliases
+        }
+        for context in self.contexts.values():
+            context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for context in self.contexts.values():
+            context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self) > self.max_queries:
+            raise QueryBudgetExceeded(
+                f"{self.label} ran {len(self)} queries, "
+                f"budget is {self.max_queries}:\n"
+                f"{format_queries(self.captured_queries)}"
+            )
+
+    def __len__(self):
+        return sum(len(context) for context in self.contexts.values())
+
+    @property
+    def captured_queries(self):
+        """
+        Queries run on every captured database, prefixed by their alias but
+        for the default one.
+        """
+        return [
+            (
+                query
+                if alias == DEFAULT_DB_ALIAS
+                else {**query, "sql": f"[{alias}] {query['sql']}"}
+            )
+            for alias, context in self.contexts.items()
+            for query in context.captured_queries
+        ]
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin enforcing a query budget on every test client request.
+
+    Budgets are declared per endpoint in `query_budgets`, keyed by method and
+    path without query string, such as `"GET /bonds/"`. Requests to endpoints
+    without a declared budget fail, so new endpoints can't be left out.
+    """
+
+    query_budgets = {}
+
+    def setUp(self):
+        super().setUp()
+        request = self.client.request
+
+        def request_within_budget(**kwargs):
+            endpoint = f"{kwargs['REQUEST_METHOD']} {kwargs['PATH_INFO']}"
+            if endpoint not in self.query_budgets:
+                raise QueryBudgetExceeded(f"No query budget declared for {endpoint}")
+            with query_budget(self.query_budgets[endpoint], label=endpoint):
+                return request(**kwargs)
+
+        self.client.request = request_within_budget
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth import admin as auth_admin
+
+from origin.admin import LargeTableAdminMixin
 from users.models import User
 
-admin.site.register(User, UserAdmin)
+
+@admin.register(User)
+class UserAdmin(LargeTableAdminMixin, auth_admin.UserAdmin):
+    # prefix searches use the username unique index
+    indexed_search_fields = ["username__startswith"]
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from rest_framework.authtoken.models import Token
 
+from origin.testing import QueryBudgetMixin
 from users.models import User
 
 
@@ -15,3 +16,45 @@ class TestUser(TestCase):
         except Token.DoesNotExist:
             api_key = None
         self.assertIsNotNone(api_key)
+
+
+class TestHomeView(QueryBudgetMixin, TestCase):
+    # session, user, api key
+    query_budgets = {"GET /": 3}
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username="joe@test.com")
+        self.client.force_login(self.user)
+
+    def test_home_shows_api_key(self):
+        response = self.client.get("/")
+
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, Token.objects.get(user=self.user).key)
+
+
+class TestUserAdmin(QueryBudgetMixin, TestCase):
+    # session, user, row count statistics, users count, users
+    query_budgets = {"GET /admin/users/user/": 5}
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser("admin", "admin@test.com", "pw")
+        self.client.force_login(self.admin)
+        User.objects.create(username="joe@test.com")
+        User.objects.create(username="jane@test.com")
+
+    def test_search_username_prefix(self):
+        response = self.client.get("/admin/users/user/?q=jo")
+
+        self.assertEquals(
+            [user.username for user in response.context["cl"].result_list],
+            ["joe@test.com"],
+        )
+        self.assertIsNone(response.context["cl"].full_result_count)
+
+    def test_search_not_substring(self):
+        response = self.client.get("/admin/users/user/?q=test.com")
+
+        self.assertEquals(response.context["cl"].result_count, 0)
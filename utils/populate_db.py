@@ -13,7 +13,7 @@ BONDS = [
         "lei": "R0MUWSFPU8MPRO8K5P83",
     },
     {
-        "isin": "FR0000131104",
+        "isin": "US0378331005",
         "size": 200000000,
         "currency": "USD",
         "maturity": "2023-08-23",